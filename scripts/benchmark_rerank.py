@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+"""Micro-benchmark del re-ranking MMR sobre candidatos sintéticos"""
+
+import argparse
+import time
+from pathlib import Path
+import sys
+
+import numpy as np
+
+# Añadir src al path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.services.reranking import mmr_select
+
+def make_candidates(rng, n: int, dim: int, sources: int):
+    """Candidatos normalizados con grupos de casi-duplicados, como chunks de una misma FAQ"""
+    base = rng.standard_normal((max(n // 3, 1), dim)).astype(np.float32)
+    vectors = base[rng.integers(0, len(base), n)] + 0.1 * rng.standard_normal((n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    query = vectors[0] + 0.5 * rng.standard_normal(dim).astype(np.float32)
+    query /= np.linalg.norm(query)
+    groups = [f"doc-{i}" for i in rng.integers(0, sources, n)]
+    return vectors @ query, vectors, groups
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del re-ranking MMR")
+    parser.add_argument("--candidates", type=int, nargs="+", default=[10, 20, 50, 100])
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--sources", type=int, default=5)
+    parser.add_argument("--lambda-mult", type=float, default=0.7)
+    parser.add_argument("--max-per-source", type=int, default=None)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'N':>5} {'p50 (µs)':>10} {'p99 (µs)':>10} {'max (µs)':>10}")
+    for n in args.candidates:
+        relevance, vectors, groups = make_candidates(rng, n, args.dim, args.sources)
+        timings = []
+        for _ in range(args.iterations):
+            start = time.perf_counter()
+            mmr_select(relevance, vectors, args.k,
+                       lambda_mult=args.lambda_mult,
+                       groups=groups,
+                       max_per_group=args.max_per_source)
+            timings.append((time.perf_counter() - start) * 1e6)
+        timings = np.array(timings)
+        print(f"{n:>5} {np.percentile(timings, 50):>10.1f} "
+              f"{np.percentile(timings, 99):>10.1f} {timings.max():>10.1f}")
+
+if __name__ == "__main__":
+    main()
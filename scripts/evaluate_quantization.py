@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+"""Mide la pérdida de recall@k de la cuantización frente a float32.
+
+Usa los vectores de una colección del índice local y consultas reales
+(un fichero de texto, una consulta por línea) o, en su defecto, una
+muestra de los propios chunks como consultas.
+"""
+
+import argparse
+import os
+import time
+from pathlib import Path
+import sys
+
+import numpy as np
+
+# Añadir src al path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.services.vector_backends import LocalIndex, quantize, quantized_top_k, top_k
+from src.services.embeddings import get_embedding_model
+from src.core.config import settings
+
+def load_queries(args, index: LocalIndex):
+    if args.queries:
+        with open(args.queries, encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()]
+    rng = np.random.default_rng(0)
+    sample = rng.choice(len(index.texts), min(args.sample, len(index.texts)), replace=False)
+    return [index.texts[i][:200] for i in sample]
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k de la cuantización del índice local")
+    parser.add_argument("--collection", default=settings.FAQ_COLLECTION)
+    parser.add_argument("--index-dir", default=settings.LOCAL_INDEX_DIR)
+    parser.add_argument("--queries", help="Fichero con una consulta por línea")
+    parser.add_argument("--sample", type=int, default=200,
+                        help="Chunks usados como consultas si no se da --queries")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rescore-factor", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    index = LocalIndex(os.path.join(args.index_dir, args.collection))
+    full = index.vectors()
+    if full is None:
+        sys.exit(f"Colección vacía o inexistente: {args.collection}")
+
+    queries = load_queries(args, index)
+    embeddings = np.asarray(get_embedding_model().embed_documents(queries), dtype=np.float32)
+    expected = [set(top_k(full @ q, args.k)[0].tolist()) for q in embeddings]
+
+    print(f"{len(full)} vectores x {full.shape[1]} dims, {len(queries)} consultas, k={args.k}")
+    print(f"{'modo':>8} {'rescore':>8} {'recall@k':>9} {'bytes/vec':>10} {'ms/query':>9}")
+    print(f"{'float32':>8} {'-':>8} {1.0:>9.4f} {full.shape[1] * 4:>10} {'-':>9}")
+    for mode in ("float16", "int8"):
+        codes, scales = quantize(full, mode)
+        per_vector = codes.shape[1] * codes.itemsize + (4 if scales is not None else 0)
+        for factor in [0] + args.rescore_factor:
+            hits, started = 0, time.perf_counter()
+            for q, truth in zip(embeddings, expected):
+                positions, _ = quantized_top_k(
+                    q, args.k, codes, scales,
+                    full=full if factor else None,
+                    rescore_factor=factor or 1
+                )
+                hits += len(truth & set(positions.tolist()))
+            elapsed_ms = (time.perf_counter() - started) * 1000 / len(queries)
+            label = f"x{factor}" if factor else "no"
+            print(f"{mode:>8} {label:>8} {hits / (len(queries) * args.k):>9.4f} "
+                  f"{per_vector:>10} {elapsed_ms:>9.2f}")
+
+if __name__ == "__main__":
+    main()
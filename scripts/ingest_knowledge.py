@@ -3,6 +3,10 @@
 
 import asyncio
 import argparse
+import glob
+import json
+import os
+import time
 from pathlib import Path
 import sys
 
@@ -10,6 +14,9 @@ import sys
 sys.path.append(str(Path(__file__).parent.parent))
 
 from src.services.vector_store import vector_store_service
+from src.services.document_processing import DocumentParser, SUPPORTED_EXTENSIONS
+from src.services.embeddings import embedding_executor
+from src.services.ingest_manifest import ingest_manifest, file_digest
 from src.core.config import settings
 from src.core.logging import setup_logging, get_logger
 
@@ -19,42 +26,279 @@ logger = get_logger(__name__)
 async def ingest_file(file_path: str, collection: str):
     """Ingesta un archivo"""
     logger.info("ingesting_file", file=file_path, collection=collection)
-    
+
     result = await vector_store_service.ingest_document(
         file_path=file_path,
         collection_name=collection
     )
-    
+
     if result["status"] == "success":
-        logger.info("ingestion_complete", 
+        logger.info("ingestion_complete",
                    chunks=result["chunks_added"])
     else:
-        logger.error("ingestion_failed", 
+        logger.error("ingestion_failed",
                     error=result["message"])
 
+def expand_inputs(inputs):
+    """Expande archivos, directorios (recursivo) y patrones glob"""
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, names in os.walk(item):
+                files.extend(
+                    os.path.join(root, name) for name in names
+                    if name.lower().endswith(SUPPORTED_EXTENSIONS)
+                )
+        elif glob.has_magic(item):
+            files.extend(
+                path for path in glob.glob(item, recursive=True)
+                if path.lower().endswith(SUPPORTED_EXTENSIONS)
+            )
+        elif Path(item).exists():
+            files.append(item)
+        else:
+            logger.error("file_not_found", file=item)
+    return sorted(set(files))
+
+class IngestCheckpoint:
+    """Registro de archivos completados para reanudar una ingesta interrumpida"""
+
+    def __init__(self, path: str, collection: str):
+        self.path = path
+        self.collection = collection
+        self.done = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("collection") == collection:
+                self.done = data.get("done", {})
+
+    @staticmethod
+    def fingerprint(file_path: str) -> str:
+        stat = os.stat(file_path)
+        return f"{stat.st_size}:{int(stat.st_mtime)}"
+
+    def is_done(self, file_path: str) -> bool:
+        return self.done.get(file_path) == self.fingerprint(file_path)
+
+    def mark_done(self, file_path: str):
+        self.done[file_path] = self.fingerprint(file_path)
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"collection": self.collection, "done": self.done}, f)
+        os.replace(tmp, self.path)
+
+class Progress:
+    """Contadores de throughput (docs/s, chunks/s)"""
+
+    def __init__(self, total_files: int):
+        self.total_files = total_files
+        self.files = 0
+        self.failed = 0
+        self.chunks = 0
+        self.started = time.perf_counter()
+
+    def report(self, event: str = "ingest_progress"):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        logger.info(event,
+                   files=f"{self.files}/{self.total_files}",
+                   failed=self.failed,
+                   chunks=self.chunks,
+                   docs_per_s=round(self.files / elapsed, 2),
+                   chunks_per_s=round(self.chunks / elapsed, 1),
+                   elapsed_s=round(elapsed, 1))
+
+async def bulk_ingest(files, args):
+    """Pipeline parse (procesos) -> embeddings (lotes) -> escritura (lotes).
+
+    Las colas entre etapas están acotadas, así que una etapa lenta frena a
+    las anteriores (back-pressure) en vez de acumular chunks en memoria.
+    Las escrituras se acumulan en un BulkWriter y se aplican cada
+    `--flush-every` operaciones y al final; el checkpoint solo registra
+    archivos cuyas escrituras ya se aplicaron.
+    """
+    checkpoint = IngestCheckpoint(args.checkpoint, args.collection)
+    pending_files = [f for f in files if args.restart or not checkpoint.is_done(f)]
+    progress = Progress(len(pending_files))
+    logger.info("bulk_ingest_started",
+               files=len(files),
+               skipped=len(files) - len(pending_files),
+               workers=args.workers)
+
+    parsed: asyncio.Queue = asyncio.Queue(maxsize=args.queue_size)
+    embedded: asyncio.Queue = asyncio.Queue(maxsize=args.queue_size)
+    pending = {}  # archivo -> {"plan", "digest", "remaining"}
+    finished = []  # archivos completos desde el último flush
+    writer = vector_store_service.bulk_writer(args.collection)
+    loop = asyncio.get_running_loop()
+
+    async def flush_writes():
+        """Aplica las escrituras acumuladas y después guarda el checkpoint"""
+        done = list(finished)
+        finished.clear()
+        await writer.flush()
+        for file_path in done:
+            checkpoint.mark_done(file_path)
+        checkpoint.save()
+
+    async def finish_file(file_path):
+        """Encola borrados, metadatos de chunks movidos y manifiesto del archivo"""
+        info = pending.pop(file_path)
+        plan = info["plan"]
+        writer.delete(plan.stale)
+        writer.update_metadata(
+            [part_id for part_id, _ in plan.moved],
+            [part["text"] for _, part in plan.moved],
+            [part["metadata"] for _, part in plan.moved]
+        )
+        writer.set_manifest(file_path, info["digest"], plan.ids, plan.positions)
+        finished.append(file_path)
+        progress.files += 1
+        if writer.pending >= args.flush_every:
+            await flush_writes()
+
+    async def parse_stage():
+        in_flight = asyncio.Semaphore(args.workers * 2)
+
+        async def parse_one(file_path):
+            try:
+                digest = await loop.run_in_executor(None, file_digest, file_path)
+                previous = ingest_manifest.get(args.collection, file_path)
+                if previous and previous["digest"] == digest:
+                    # Sin cambios: nada que hacer
+                    finished.append(file_path)
+                    progress.files += 1
+                    return
+                parts = await document_parser.parse(
+                    file_path, args.chunk_size, args.chunk_overlap
+                )
+                await parsed.put((file_path, digest, parts))
+            except Exception as e:
+                progress.failed += 1
+                logger.error("ingestion_failed", file=file_path, error=str(e))
+            finally:
+                in_flight.release()
+
+        # Pool spawn (DocumentParser): un fork heredaría el modelo de
+        # embeddings y los hilos del ejecutor ya cargados en este proceso
+        document_parser = DocumentParser(
+            workers=args.workers,
+            pages_per_task=settings.PARSER_PDF_PAGES_PER_TASK,
+            max_memory_bytes=settings.PARSER_MAX_MEMORY_MB * 1024 * 1024,
+            max_tasks_per_child=settings.PARSER_MAX_TASKS_PER_CHILD,
+        )
+        try:
+            tasks = []
+            for file_path in pending_files:
+                await in_flight.acquire()
+                tasks.append(asyncio.create_task(parse_one(file_path)))
+            await asyncio.gather(*tasks)
+        finally:
+            document_parser.close()
+        await parsed.put(None)
+
+    async def embed_stage():
+        batch = []
+
+        async def flush():
+            vectors = await embedding_executor.embed_documents([item[2]["text"] for item in batch])
+            await embedded.put((list(batch), vectors))
+            batch.clear()
+
+        while (item := await parsed.get()) is not None:
+            file_path, digest, parts = item
+            # Ids por contenido: solo se calculan embeddings de chunks nuevos
+            plan = vector_store_service.plan_chunks(args.collection, file_path, parts)
+            pending[file_path] = {
+                "plan": plan, "digest": digest, "remaining": len(plan.new_parts)
+            }
+            if not plan.new_parts:
+                await finish_file(file_path)
+                continue
+            for part_id, part in plan.new_parts:
+                batch.append((file_path, part_id, part))
+                if len(batch) >= args.embed_batch:
+                    await flush()
+        if batch:
+            await flush()
+        await embedded.put(None)
+
+    async def write_stage():
+        last_report = time.perf_counter()
+        while (item := await embedded.get()) is not None:
+            batch, vectors = item
+            writer.add(
+                [part_id for _, part_id, _ in batch],
+                [part["text"] for _, _, part in batch],
+                [part["metadata"] for _, _, part in batch],
+                vectors
+            )
+            progress.chunks += len(batch)
+
+            # Un archivo se completa cuando todos sus chunks nuevos están encolados
+            for file_path, _, _ in batch:
+                pending[file_path]["remaining"] -= 1
+                if pending[file_path]["remaining"] == 0:
+                    await finish_file(file_path)
+            if writer.pending >= args.flush_every:
+                await flush_writes()
+
+            if time.perf_counter() - last_report >= args.report_every:
+                progress.report()
+                last_report = time.perf_counter()
+
+    try:
+        await asyncio.gather(parse_stage(), embed_stage(), write_stage())
+    finally:
+        await flush_writes()
+    progress.report("bulk_ingest_complete")
+
 async def main():
     parser = argparse.ArgumentParser(
-        description="Ingestar documentos en ChromaDB"
+        description="Ingestar documentos en la base de conocimiento"
     )
     parser.add_argument(
-        "files", 
-        nargs="+", 
-        help="Archivos a ingestar (PDF o Markdown)"
+        "files",
+        nargs="+",
+        help="Archivos, directorios o patrones glob (PDF o Markdown)"
     )
     parser.add_argument(
-        "--collection", 
+        "--collection",
         default=settings.FAQ_COLLECTION,
         help="Nombre de la colección"
     )
-    
+    parser.add_argument("--bulk", action="store_true",
+                        help="Pipeline paralelo para grandes volúmenes")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2,
+                        help="Procesos para parseo y división en chunks")
+    parser.add_argument("--embed-batch", type=int, default=256,
+                        help="Chunks por lote de embeddings")
+    parser.add_argument("--flush-every", type=int, default=2000,
+                        help="Operaciones acumuladas (chunks y archivos) entre escrituras "
+                             "al backend, índice BM25, manifiesto y checkpoint "
+                             "(cada chunk pendiente ocupa ~12 KB en memoria)")
+    parser.add_argument("--queue-size", type=int, default=8,
+                        help="Elementos máximos en cola entre etapas")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--checkpoint", default=".ingest_checkpoint.json",
+                        help="Fichero para reanudar una ingesta interrumpida")
+    parser.add_argument("--restart", action="store_true",
+                        help="Ignorar el checkpoint y procesar todo de nuevo")
+    parser.add_argument("--report-every", type=float, default=5.0,
+                        help="Segundos entre informes de progreso")
+
     args = parser.parse_args()
-    
-    for file_path in args.files:
-        if not Path(file_path).exists():
-            logger.error("file_not_found", file=file_path)
-            continue
-            
+    files = expand_inputs(args.files)
+
+    if args.bulk:
+        await bulk_ingest(files, args)
+        return
+
+    for file_path in files:
         await ingest_file(file_path, args.collection)
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
@@ -9,6 +9,15 @@ from src.services.vector_store import get_retriever
 from src.services.history_service import get_session_history
 from operator import itemgetter
 from langchain_core.runnables.history import RunnableWithMessageHistory
+from openai import APIConnectionError, APITimeoutError
+
+# Solo errores transitorios de red: los 429 no se reintentan aquí, los
+# gestiona el LLMGovernor (reduce la concurrencia) y la conmutación de proveedor
+RETRY_POLICY = {
+    "retry_if_exception_type": (APIConnectionError, APITimeoutError),
+    "stop_after_attempt": 2,
+    "wait_exponential_jitter": True,
+}
 
 
 def create_chat_chain(
@@ -38,7 +47,7 @@ def create_chat_chain(
     # 5) Añadir retry y timeout
     chain = (
         base_chain
-        .with_retry(max_retries=3, backoff="exponential")
+        .with_retry(**RETRY_POLICY)
         .with_config(timeout=60)
     )
     return chain
@@ -81,7 +90,7 @@ def create_rag_chain(collection_name: str) -> Runnable:
     # 6) Añadir retry y timeout
     rag_chain = (
         base_rag
-        .with_retry(max_retries=3, backoff="exponential")
+        .with_retry(**RETRY_POLICY)
         .with_config(timeout=60)
     )
     return rag_chain
@@ -109,7 +118,7 @@ def create_conversational_chain() -> Runnable:
     # 4) Proteger con retry y timeout
     safe_chain = (
         base_chain
-        .with_retry(max_retries=3, backoff="exponential")
+        .with_retry(**RETRY_POLICY)
         .with_config(timeout=60)
     )
 
@@ -0,0 +1,18 @@
+"""Caché de clasificaciones de intención"""
+
+import hashlib
+from typing import Tuple
+from src.core.config import settings
+from src.utils.cache import LRUCache
+from src.utils.text import normalize_text
+
+def intent_cache_key(message: str, history: str) -> Tuple[str, str]:
+    """Clave: mensaje normalizado + digest de la ventana de historial del clasificador"""
+    history_digest = hashlib.sha1(history.encode("utf-8")).hexdigest()
+    return normalize_text(message), history_digest
+
+# Instancia global
+intent_cache: LRUCache[str] = LRUCache(
+    max_entries=settings.INTENT_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.INTENT_CACHE_TTL_SECONDS,
+)
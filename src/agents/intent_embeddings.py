@@ -0,0 +1,138 @@
+"""Clasificador local de intenciones basado en embeddings"""
+
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from src.services.embeddings import embedding_executor
+from src.services.embedding_cache import query_embedding_cache
+from src.core.config import settings
+from src.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Ejemplos por defecto. Pueden sustituirse con un JSON en INTENT_EXAMPLES_PATH
+# con el formato {"intent": ["ejemplo 1", "ejemplo 2", ...]}
+DEFAULT_INTENT_EXAMPLES: Dict[str, List[str]] = {
+    "greeting": [
+        "hola", "buenos días", "buenas tardes", "qué tal", "hola, ¿cómo estás?",
+        "hey, buenas", "saludos",
+    ],
+    "faq_request": [
+        "quiero ver las preguntas frecuentes", "[FAQ]", "dónde están las FAQ",
+        "muéstrame las preguntas más comunes", "tienen una sección de ayuda",
+    ],
+    "agent_request": [
+        "quiero hablar con un agente", "[Agente]", "pásame con una persona",
+        "necesito hablar con alguien de soporte", "quiero un humano",
+        "contactar con un asesor",
+    ],
+    "support_query": [
+        "no puedo iniciar sesión en mi cuenta", "cómo cambio mi contraseña",
+        "cuánto cuesta el plan premium", "mi pedido no ha llegado",
+        "la aplicación me da un error al pagar", "cómo configuro el producto",
+        "quiero cancelar mi suscripción", "cuál es el precio del servicio",
+    ],
+    "out_of_scope": [
+        "cuál es el sentido de la vida", "cuéntame un chiste",
+        "qué tiempo hace hoy", "quién ganó el partido de ayer",
+        "recomiéndame una película", "escribe un poema",
+    ],
+}
+
+@dataclass
+class EmbeddingClassification:
+    intent: Optional[str]
+    score: float
+    margin: float
+
+class EmbeddingIntentClassifier:
+    """Puntúa mensajes contra centroides de ejemplos por intención"""
+
+    def __init__(self,
+                 examples: Optional[Dict[str, List[str]]] = None,
+                 min_score: float = 0.5,
+                 min_margin: float = 0.05):
+        self.examples = examples if examples is not None else DEFAULT_INTENT_EXAMPLES
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self.intents: List[str] = []
+        self.centroids: Optional[np.ndarray] = None
+        self.confident = 0
+        self.ambiguous = 0
+
+    @classmethod
+    def from_settings(cls) -> "EmbeddingIntentClassifier":
+        """Construye el clasificador con los ejemplos de INTENT_EXAMPLES_PATH"""
+        examples = None
+        if settings.INTENT_EXAMPLES_PATH:
+            with open(settings.INTENT_EXAMPLES_PATH, encoding="utf-8") as f:
+                examples = json.load(f)
+        return cls(
+            examples,
+            min_score=settings.INTENT_EMBEDDING_MIN_SCORE,
+            min_margin=settings.INTENT_EMBEDDING_MIN_MARGIN,
+        )
+
+    @property
+    def ready(self) -> bool:
+        return self.centroids is not None
+
+    async def warmup(self):
+        """Precalcula la matriz de centroides (una fila normalizada por intención)"""
+        intents = sorted(self.examples)
+        rows = []
+        for intent in intents:
+            vectors = np.asarray(
+                await embedding_executor.embed_documents(self.examples[intent]),
+                dtype=np.float32
+            )
+            centroid = vectors.mean(axis=0)
+            rows.append(centroid / np.linalg.norm(centroid))
+
+        self.intents = intents
+        self.centroids = np.vstack(rows)
+        logger.info("intent_centroids_ready",
+                   intents=len(intents),
+                   examples=sum(len(v) for v in self.examples.values()))
+
+    async def set_examples(self, examples: Dict[str, List[str]]):
+        """Reemplaza el conjunto de ejemplos y recalcula los centroides"""
+        self.examples = examples
+        await self.warmup()
+
+    def score(self, vector: np.ndarray) -> Tuple[str, float, float]:
+        """Devuelve (mejor intención, puntuación, margen sobre la segunda)"""
+        scores = self.centroids @ vector
+        top2 = np.argsort(scores)[-2:][::-1]
+        best = float(scores[top2[0]])
+        second = float(scores[top2[1]]) if len(top2) > 1 else -1.0
+        return self.intents[top2[0]], best, best - second
+
+    async def classify(self, message: str) -> EmbeddingClassification:
+        """Clasifica el mensaje; intent es None si el resultado es ambiguo"""
+        if not self.ready:
+            await self.warmup()
+
+        vector = await query_embedding_cache.embed_query(message)
+        intent, score, margin = self.score(vector)
+
+        if score >= self.min_score and margin >= self.min_margin:
+            self.confident += 1
+            return EmbeddingClassification(intent, score, margin)
+
+        self.ambiguous += 1
+        return EmbeddingClassification(None, score, margin)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Contadores de decisiones locales vs. derivadas al LLM"""
+        total = self.confident + self.ambiguous
+        return {
+            "ready": self.ready,
+            "confident": self.confident,
+            "ambiguous": self.ambiguous,
+            "local_rate": round(self.confident / total, 4) if total else 0.0,
+        }
+
+# Instancia global (los centroides se calculan en startup)
+intent_embedding_classifier = EmbeddingIntentClassifier.from_settings()
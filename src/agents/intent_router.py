@@ -0,0 +1,117 @@
+"""Clasificador determinista de intenciones (fast-path previo al LLM)"""
+
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Pattern
+from src.core.config import settings
+from src.core.logging import get_logger
+from src.utils.text import normalize_text
+
+logger = get_logger(__name__)
+
+# Tabla por defecto. Puede sustituirse con un JSON en INTENT_RULES_PATH
+# con el mismo formato: {"rules": [{"intent": ..., "exact": [...], "patterns": [...]}]}
+# ("when": <clave del estado> limita una regla a los turnos con esa clave activa)
+DEFAULT_INTENT_RULES: List[Dict[str, Any]] = [
+    {
+        "intent": "faq_request",
+        "exact": ["faq", "faqs", "preguntas frecuentes", "ver faq", "ver preguntas frecuentes"],
+        "patterns": [r"\[\s*faq\s*\]"],
+    },
+    {
+        "intent": "agent_request",
+        "exact": [
+            "agente", "hablar con un agente", "hablar con agente",
+            "hablar con una persona", "quiero hablar con un agente", "humano",
+        ],
+        "patterns": [r"\[\s*agente\s*\]"],
+    },
+    {
+        "intent": "greeting",
+        "exact": [
+            "hola", "hola hola", "holi", "buenas", "buenos dias", "buenas tardes",
+            "buenas noches", "hola buenos dias", "hola buenas tardes",
+            "hola buenas noches", "hey", "saludos", "hello", "hi",
+        ],
+    },
+]
+
+@dataclass
+class _CompiledRule:
+    intent: str
+    exact: frozenset
+    patterns: List[Pattern]
+    when: Optional[str] = None
+
+@dataclass
+class FastPathStats:
+    hits: int = 0
+    misses: int = 0
+    hits_by_intent: Dict[str, int] = field(default_factory=dict)
+
+class FastPathIntentRouter:
+    """Resuelve intenciones obvias con reglas compiladas, sin llamar al LLM"""
+
+    def __init__(self, rules: Optional[List[Dict[str, Any]]] = None):
+        self.rules = self._compile(rules if rules is not None else DEFAULT_INTENT_RULES)
+        self.stats = FastPathStats()
+
+    @classmethod
+    def from_settings(cls) -> "FastPathIntentRouter":
+        """Construye el router con la tabla configurada en INTENT_RULES_PATH"""
+        rules = None
+        if settings.INTENT_RULES_PATH:
+            with open(settings.INTENT_RULES_PATH, encoding="utf-8") as f:
+                data = json.load(f)
+            rules = data["rules"] if isinstance(data, dict) else data
+            logger.info("intent_rules_loaded",
+                       path=settings.INTENT_RULES_PATH,
+                       rules=len(rules))
+        return cls(rules)
+
+    @staticmethod
+    def _compile(rules: List[Dict[str, Any]]) -> List[_CompiledRule]:
+        return [
+            _CompiledRule(
+                intent=rule["intent"],
+                exact=frozenset(normalize_text(e) for e in rule.get("exact", [])),
+                patterns=[re.compile(p) for p in rule.get("patterns", [])],
+                when=rule.get("when"),
+            )
+            for rule in rules
+        ]
+
+    def match(self, message: str, state: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """Devuelve la intención si alguna regla coincide, o None para delegar al LLM"""
+        state = state or {}
+        normalized = normalize_text(message)
+        raw = message.strip().lower()
+
+        for rule in self.rules:
+            if rule.when and not state.get(rule.when, False):
+                continue
+            if normalized in rule.exact or any(
+                p.search(normalized) or p.search(raw) for p in rule.patterns
+            ):
+                self.stats.hits += 1
+                self.stats.hits_by_intent[rule.intent] = (
+                    self.stats.hits_by_intent.get(rule.intent, 0) + 1
+                )
+                return rule.intent
+
+        self.stats.misses += 1
+        return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Contadores de aciertos/fallos del fast-path"""
+        total = self.stats.hits + self.stats.misses
+        return {
+            "hits": self.stats.hits,
+            "misses": self.stats.misses,
+            "hit_rate": round(self.stats.hits / total, 4) if total else 0.0,
+            "hits_by_intent": dict(self.stats.hits_by_intent),
+        }
+
+# Instancia global
+fast_path_router = FastPathIntentRouter.from_settings()
@@ -3,12 +3,18 @@ from langchain_core.messages import AIMessage, HumanMessage
 from langchain_core.prompts import ChatPromptTemplate
 from src.agents.state import AgentState
 from src.agents.tools import (
-    search_faq_knowledge, 
+    retrieve_faq_context,
     redirect_to_faq_page,
     validate_email,
     initiate_agent_handoff
 )
-from src.llms.providers import get_llm_provider
+from src.agents.intent_router import fast_path_router
+from src.agents.intent_embeddings import intent_embedding_classifier
+from src.agents.intent_cache import intent_cache, intent_cache_key
+from src.agents.speculation import speculative_retrieval
+from src.llms.providers import get_profile_llm
+from src.services.answer_cache import answer_cache
+from src.services.embedding_cache import query_embedding_cache
 from src.utils.prompts import (
     INTENT_CLASSIFIER_PROMPT,
     GREETING_RESPONSE,
@@ -17,12 +23,38 @@ from src.utils.prompts import (
     EMAIL_REQUEST,
     EMAIL_VALIDATION_ERROR
 )
+from src.core.config import settings
 from src.core.logging import get_logger
 
 logger = get_logger(__name__)
 
-# LLM instance
-llm = get_llm_provider("cerebras")
+VALID_INTENTS = ["greeting", "faq_request", "agent_request",
+                 "support_query", "out_of_scope"]
+
+def _recent_history(state: AgentState) -> str:
+    """Historial reciente (últimos 4 mensajes) en el formato del clasificador"""
+    history = []
+    for msg in state["messages"][-5:-1]:  # Excluye el mensaje actual
+        role = "Usuario" if isinstance(msg, HumanMessage) else "Asistente"
+        history.append(f"{role}: {msg.content[:100]}...")
+    return "\n".join(history) if history else "Sin historial previo"
+
+async def _classify_with_llm(history: str, message: str) -> str:
+    """Clasifica la intención con el LLM"""
+    prompt = ChatPromptTemplate.from_template(INTENT_CLASSIFIER_PROMPT)
+    chain = prompt | get_profile_llm("classifier")
+    
+    result = await chain.ainvoke({
+        "history": history,
+        "message": message
+    })
+    
+    intent = result.content.strip().lower()
+    
+    # Validar intención
+    if intent not in VALID_INTENTS:
+        intent = "out_of_scope"
+    return intent
 
 async def classify_intent_node(state: AgentState) -> Dict[str, Any]:
     """Clasifica la intención del mensaje del usuario"""
@@ -32,32 +64,52 @@ async def classify_intent_node(state: AgentState) -> Dict[str, Any]:
         if not isinstance(last_message, HumanMessage):
             return {}
         
-        # Preparar historial reciente (últimos 4 mensajes)
-        history = []
-        for msg in state["messages"][-5:-1]:  # Excluye el mensaje actual
-            role = "Usuario" if isinstance(msg, HumanMessage) else "Asistente"
-            history.append(f"{role}: {msg.content[:100]}...")
+        # Fast-path determinista: evita el LLM en los casos obvios
+        intent = None
+        source = "llm"
+        if settings.INTENT_FAST_PATH_ENABLED:
+            intent = fast_path_router.match(last_message.content, state)
+            source = "fast_path"
         
-        # Clasificar intención
-        prompt = ChatPromptTemplate.from_template(INTENT_CLASSIFIER_PROMPT)
-        chain = prompt | llm
+        # Caché por mensaje normalizado + ventana de historial
+        history = _recent_history(state)
+        cache_key = None
+        if intent is None and settings.INTENT_CACHE_ENABLED:
+            cache_key = intent_cache_key(last_message.content, history)
+            intent = intent_cache.get(cache_key)
+            source = "cache"
         
-        result = await chain.ainvoke({
-            "history": "\n".join(history) if history else "Sin historial previo",
-            "message": last_message.content
-        })
+        # Recuperación especulativa mientras se clasifica
+        if intent is None and settings.SPECULATIVE_RETRIEVAL_ENABLED:
+            speculative_retrieval.start(
+                state["session_id"],
+                last_message.content,
+                retrieve_faq_context(last_message.content)
+            )
         
-        intent = result.content.strip().lower()
+        try:
+            # Clasificador local por embeddings: solo los casos ambiguos van al LLM
+            if intent is None and settings.INTENT_CLASSIFIER_MODE == "embedding":
+                classification = await intent_embedding_classifier.classify(
+                    last_message.content
+                )
+                intent = classification.intent
+                source = "embedding"
+            
+            if intent is None:
+                source = "llm"
+                intent = await _classify_with_llm(history, last_message.content)
+        finally:
+            if intent != "support_query":
+                speculative_retrieval.discard(state["session_id"], last_message.content)
         
-        # Validar intención
-        valid_intents = ["greeting", "faq_request", "agent_request", 
-                        "support_query", "out_of_scope"]
-        if intent not in valid_intents:
-            intent = "out_of_scope"
+        if cache_key is not None and source != "cache":
+            intent_cache.set(cache_key, intent)
         
         logger.info("intent_classified", 
                    session_id=state["session_id"],
-                   intent=intent)
+                   intent=intent,
+                   source=source)
         
         return {"current_intent": intent}
         
@@ -73,7 +125,7 @@ async def greeting_node(state: AgentState) -> Dict[str, Any]:
 
 async def faq_redirect_node(state: AgentState) -> Dict[str, Any]:
     """Redirige a FAQ"""
-    response = redirect_to_faq_page()
+    response = redirect_to_faq_page.invoke({})
     return {
         "messages": [AIMessage(content=response)]
     }
@@ -84,11 +136,15 @@ async def support_query_node(state: AgentState) -> Dict[str, Any]:
         last_message = state["messages"][-1]
         query = last_message.content
         
-        # Buscar en base de conocimiento
-        context = await search_faq_knowledge.ainvoke({"query": query})
+        # Buscar en base de conocimiento (o recoger la búsqueda especulativa)
+        speculative = speculative_retrieval.take(state["session_id"], query)
+        if speculative is not None:
+            context, documents = await speculative
+        else:
+            context, documents = await retrieve_faq_context(query)
         
         # Si no hay contexto relevante
-        if "No se encontró información" in context:
+        if not documents:
             response = (
                 "No encontré información específica sobre tu consulta en nuestra "
                 "base de conocimiento. Te sugiero:\n\n"
@@ -96,15 +152,38 @@ async def support_query_node(state: AgentState) -> Dict[str, Any]:
                 "• Escribir **[Agente]** para hablar con un especialista"
             )
         else:
-            # Generar respuesta basada en contexto
-            prompt = ChatPromptTemplate.from_template(SUPPORT_AGENT_PROMPT)
-            chain = prompt | llm
+            # Caché semántica: misma pregunta (aprox.) con los mismos chunks
+            chunk_ids = [doc.id for doc in documents]
+            cached = None
+            if settings.ANSWER_CACHE_ENABLED:
+                query_embedding = await query_embedding_cache.embed_query(query)
+                cached = answer_cache.lookup(
+                    query_embedding, settings.FAQ_COLLECTION, chunk_ids
+                )
             
-            result = await chain.ainvoke({
-                "context": context,
-                "question": query
-            })
-            response = result.content
+            if cached is not None:
+                response = cached.answer
+                logger.info("answer_cache_hit", session_id=state["session_id"])
+            else:
+                # Generar respuesta basada en contexto
+                prompt = ChatPromptTemplate.from_template(SUPPORT_AGENT_PROMPT)
+                chain = prompt | get_profile_llm("answerer")
+                
+                result = await chain.ainvoke({
+                    "context": context,
+                    "question": query
+                })
+                response = result.content
+                
+                if settings.ANSWER_CACHE_ENABLED:
+                    usage = getattr(result, "usage_metadata", None) or {}
+                    answer_cache.store(
+                        query_embedding,
+                        settings.FAQ_COLLECTION,
+                        chunk_ids,
+                        response,
+                        tokens=usage.get("total_tokens", 0)
+                    )
         
         return {
             "messages": [AIMessage(content=response)],
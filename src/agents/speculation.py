@@ -0,0 +1,64 @@
+"""Recuperación especulativa en paralelo a la clasificación de intención"""
+
+import asyncio
+from typing import Any, Awaitable, Dict, Optional, Tuple
+from src.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+class SpeculativeRetrieval:
+    """Registro de búsquedas lanzadas antes de conocer la intención.
+
+    Las tareas no pueden viajar en el estado del grafo (el checkpointer lo
+    serializa), así que se guardan aquí indexadas por (session_id, mensaje).
+    """
+
+    def __init__(self, max_pending: int = 256):
+        self.max_pending = max_pending
+        self._tasks: Dict[Tuple[str, str], asyncio.Task] = {}
+        self.started = 0
+        self.used = 0
+        self.wasted = 0
+
+    def start(self, session_id: str, query: str, coro: Awaitable[Any]):
+        """Lanza la búsqueda en segundo plano"""
+        key = (session_id, query)
+        if key in self._tasks:
+            coro.close()
+            return
+
+        # Evitar fugas si algún turno no llegó a consumir su tarea
+        while len(self._tasks) >= self.max_pending:
+            oldest = next(iter(self._tasks))
+            self.discard(*oldest)
+
+        self._tasks[key] = asyncio.create_task(coro)
+        self.started += 1
+
+    def take(self, session_id: str, query: str) -> Optional[asyncio.Task]:
+        """Entrega la tarea especulativa al nodo que la necesita"""
+        task = self._tasks.pop((session_id, query), None)
+        if task is not None:
+            self.used += 1
+        return task
+
+    def discard(self, session_id: str, query: str):
+        """Cancela una búsqueda que ya no se va a usar"""
+        task = self._tasks.pop((session_id, query), None)
+        if task is None:
+            return
+        task.cancel()
+        self.wasted += 1
+        logger.debug("speculative_retrieval_wasted", session_id=session_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Contadores de búsquedas especulativas"""
+        return {
+            "started": self.started,
+            "used": self.used,
+            "wasted": self.wasted,
+            "pending": len(self._tasks),
+        }
+
+# Instancia global
+speculative_retrieval = SpeculativeRetrieval()
@@ -6,11 +6,15 @@ from src.core.logging import get_logger
 
 logger = get_logger(__name__)
 
-def route_after_intent(state: AgentState) -> str:
-    """Enruta basado en la intención clasificada"""
-    intent = state.get("current_intent")
-    
-    # Si estamos esperando email, validar
+ANSWER_NODES = ["greeting", "faq_redirect", "support_query",
+                "request_email", "validate_email", "out_of_scope"]
+
+# Nodos cuya respuesta se genera con el LLM y se transmite token a token
+STREAMING_NODES = {"support_query"}
+
+def route_entry(state: AgentState) -> str:
+    """Enruta el inicio del turno según el estado de la conversación"""
+    # Si estamos esperando email, validar sin pasar por el clasificador
     if state.get("awaiting_email", False):
         return "validate_email"
     
@@ -18,6 +22,12 @@ def route_after_intent(state: AgentState) -> str:
     if state.get("conversation_ended", False):
         return END
     
+    return "classify_intent"
+
+def route_after_intent(state: AgentState) -> str:
+    """Enruta basado en la intención clasificada"""
+    intent = state.get("current_intent")
+    
     # Enrutar según intención
     routing = {
         "greeting": "greeting",
@@ -29,14 +39,12 @@ def route_after_intent(state: AgentState) -> str:
     
     return routing.get(intent, "out_of_scope")
 
-def should_end(state: AgentState) -> str:
-    """Determina si la conversación debe terminar"""
-    if state.get("conversation_ended", False):
-        return END
-    return "classify_intent"
+def create_support_graph(checkpointer=None):
+    """Crea el grafo del agente de soporte.
 
-def create_support_graph():
-    """Crea el grafo del agente de soporte"""
+    Cada turno de usuario es una única pasada:
+    entrada -> [classify_intent] -> nodo de respuesta -> END
+    """
     try:
         # Crear grafo
         graph = StateGraph(AgentState)
@@ -50,34 +58,26 @@ def create_support_graph():
         graph.add_node("validate_email", nodes.validate_email_node)
         graph.add_node("out_of_scope", nodes.out_of_scope_node)
         
-        # Definir flujo
-        graph.add_edge(START, "classify_intent")
+        # Enrutamiento de entrada basado en estado
+        graph.add_conditional_edges(
+            START,
+            route_entry,
+            ["classify_intent", "validate_email", END]
+        )
         
         # Enrutamiento condicional después de clasificar
         graph.add_conditional_edges(
             "classify_intent",
             route_after_intent,
-            ["greeting", "faq_redirect", "support_query", "request_email", "out_of_scope", "validate_email", END]
+            ["greeting", "faq_redirect", "support_query", "request_email", "out_of_scope"]
         )
         
-        # Edges de retorno a clasificación
-        for node in ["greeting", "faq_redirect", "support_query", "out_of_scope"]:
-            graph.add_conditional_edges(
-                node, 
-                should_end,
-                ["classify_intent", END]
-            )
-        
-        # Email flow
-        graph.add_edge("request_email", "classify_intent")
-        graph.add_conditional_edges(
-            "validate_email", 
-            should_end,
-            ["classify_intent", END]
-        )
+        # Un solo nodo de respuesta por turno
+        for node in ANSWER_NODES:
+            graph.add_edge(node, END)
         
         # Compilar con checkpointer
-        checkpointer = checkpointer_service.get_checkpointer()
+        checkpointer = checkpointer or checkpointer_service.get_checkpointer()
         compiled_graph = graph.compile(checkpointer=checkpointer)
         
         logger.info("support_graph_created")
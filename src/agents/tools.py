@@ -1,5 +1,8 @@
 from langchain.tools import tool
+from langchain_core.documents import Document
+from typing import List, Tuple
 from src.services.vector_store import vector_store_service
+from src.services.context_packing import context_packer
 from src.core.config import settings
 from src.core.logging import get_logger
 import re
@@ -7,9 +10,8 @@ import random
 
 logger = get_logger(__name__)
 
-@tool
-async def search_faq_knowledge(query: str) -> str:
-    """Busca en la base de conocimiento de preguntas frecuentes"""
+async def retrieve_faq_context(query: str) -> Tuple[str, List[Document]]:
+    """Busca en las FAQ y devuelve (contexto formateado, documentos recuperados)"""
     try:
         # Usar el método search del vector_store_service
         documents = await vector_store_service.search(
@@ -19,20 +21,29 @@ async def search_faq_knowledge(query: str) -> str:
         )
         
         if not documents:
-            return "No se encontró información relevante sobre esta consulta."
+            return "No se encontró información relevante sobre esta consulta.", []
         
         # Formatear contexto
+        if settings.CONTEXT_PACKING_ENABLED:
+            return context_packer.pack(documents), documents
+        
         context_parts = []
         for i, doc in enumerate(documents, 1):
             content = doc.page_content.strip()
             source = doc.metadata.get('source', 'Unknown')
             context_parts.append(f"[Fuente {i}: {source}]\n{content}")
         
-        return "\n\n---\n\n".join(context_parts)
+        return "\n\n---\n\n".join(context_parts), documents
         
     except Exception as e:
         logger.error("faq_search_failed", query=query, error=str(e))
-        return "Error al buscar en la base de conocimiento."
+        return "Error al buscar en la base de conocimiento.", []
+
+@tool
+async def search_faq_knowledge(query: str) -> str:
+    """Busca en la base de conocimiento de preguntas frecuentes"""
+    context, _ = await retrieve_faq_context(query)
+    return context
 
 @tool
 def redirect_to_faq_page() -> str:
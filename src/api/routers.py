@@ -1,30 +1,130 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Depends
+from fastapi import APIRouter, HTTPException, UploadFile, File, Depends, Request
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
+import os
 import uuid
 import json
 from typing import AsyncGenerator
 from datetime import datetime
 import asyncio
+import time
 
 from src.api.schemas import (
     ChatRequest, ChatResponse, 
-    DocumentUploadResponse, HealthResponse
+    DocumentUploadResponse, HealthResponse, MetricsResponse,
+    IngestionJobResponse, TokenUsageResponse, ClientUsageResponse, SessionUsageResponse
 )
 import src.agents.support_graph as graph_module
+from src.agents.intent_router import fast_path_router
+from src.agents.intent_embeddings import intent_embedding_classifier
+from src.agents.intent_cache import intent_cache
+from src.agents.speculation import speculative_retrieval
 from src.services.database import get_db, ConversationHistory
 from src.services.vector_store import vector_store_service
+from src.services.embeddings import embedding_executor
+from src.services.embedding_cache import query_embedding_cache
+from src.services.answer_cache import answer_cache
+from src.services.context_packing import context_packer
+from src.services.ingestion_jobs import ingestion_job_manager, IngestionQueueFull
+from src.services.document_processing import document_parser
 from src.services.checkpointer import checkpointer_service
+from src.llms.providers import provider_registry
+from src.llms.governor import llm_request_context, PRIORITY_INTERACTIVE
+from src.services.token_usage import token_usage_tracker, usage_context
+from src.middleware.rate_limiting import client_id_for
 from src.core.config import settings
 from src.core.logging import get_logger
-from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.messages import HumanMessage
 
 logger = get_logger(__name__)
 router = APIRouter(prefix="/api/v1")
 
+async def _cancel_on_disconnect(http_request: Request, task: asyncio.Task) -> bool:
+    """Cancela la tarea del turno si el cliente cierra la conexión.
+
+    La cancelación se propaga al nodo en curso (búsqueda y petición HTTP al
+    LLM). LangGraph ya ha persistido la entrada del turno (y cada superstep
+    terminado): hay que limpiar el turno con `_clean_up_cancelled_turn`.
+    """
+    while not task.done():
+        if await http_request.is_disconnected():
+            task.cancel()
+            return True
+        await asyncio.sleep(settings.DISCONNECT_POLL_INTERVAL_SECONDS)
+    return False
+
+async def _restore_last_complete_state(config: dict):
+    """Devuelve el hilo al estado anterior a un turno cancelado.
+
+    Sin reparar, el hilo conserva el mensaje del usuario sin respuesta (y
+    la intención clasificada), que contaminarían el historial y la clave
+    de la caché de intenciones del turno siguiente. Se bifurca desde el
+    último checkpoint anterior a la entrada del turno.
+    """
+    graph = graph_module.support_agent_graph
+    # Las APIs de estado interpretan checkpoint_ns como subgrafo: el grafo
+    # raíz guarda sus checkpoints en el espacio de nombres vacío
+    thread = {"configurable": {"thread_id": config["configurable"]["thread_id"]}}
+    try:
+        state = await graph.aget_state(thread)
+        if not state.next:
+            return  # El turno no llegó a persistirse o ya terminó
+        async for snapshot in graph.aget_state_history(thread):
+            if snapshot.metadata.get("source") == "input":
+                # El padre de la entrada es el final del turno anterior; el
+                # primer turno no tiene padre y se copia la entrada (vacía)
+                await graph.aupdate_state(snapshot.parent_config or snapshot.config,
+                                          None, as_node="__copy__")
+                return
+    except Exception as e:
+        logger.error("turn_state_restore_failed",
+                    thread_id=config["configurable"]["thread_id"],
+                    error=str(e))
+
+async def _clean_up_cancelled_turn(input_state: dict, config: dict):
+    """Deshace lo que deja a medias un turno cancelado"""
+    # classify_intent pudo lanzar una búsqueda especulativa que solo recoge
+    # support_query_node: si el turno no llegó a ese nodo, quedaría pendiente
+    speculative_retrieval.discard(input_state["session_id"],
+                                  input_state["messages"][-1].content)
+    await _restore_last_complete_state(config)
+
+# Reparaciones en segundo plano (referencia fuerte hasta que terminen)
+_state_repairs: set = set()
+
+def _clean_up_after(turn: asyncio.Task, input_state: dict, config: dict):
+    """Limpia el turno cuando la tarea cancelada termine (sin bloquear al llamante)"""
+    async def repair():
+        await asyncio.wait([turn])
+        await _clean_up_cancelled_turn(input_state, config)
+
+    task = asyncio.create_task(repair())
+    _state_repairs.add(task)
+    task.add_done_callback(_state_repairs.discard)
+
+def _log_turn_cancelled(session_id: str, reason: str, progress: dict):
+    logger.warning("turn_cancelled",
+                  session_id=session_id,
+                  reason=reason,
+                  nodes_completed=progress["nodes"],
+                  tokens_streamed=progress.get("tokens", 0))
+
+async def _run_turn(input_state: dict, config: dict, progress: dict) -> dict:
+    """Ejecuta un turno completo registrando los nodos completados"""
+    result = {}
+    async for mode, chunk in graph_module.support_agent_graph.astream(
+        input_state, config, stream_mode=["updates", "values"]
+    ):
+        if mode == "updates":
+            progress["nodes"].extend(node for node in chunk if not node.startswith("__"))
+        else:
+            result = chunk
+    return result
+
 @router.post("/chat", response_model=ChatResponse)
 async def chat_endpoint(
     request: ChatRequest,
+    http_request: Request,
     db: AsyncSession = Depends(get_db)
 ):
     """Endpoint principal del chat"""
@@ -47,8 +147,32 @@ async def chat_endpoint(
             "metadata": {"source": "api", "timestamp": str(datetime.utcnow())}
         }
         
-        # Ejecutar grafo
-        result = await graph_module.support_agent_graph.ainvoke(input_state, config)
+        # Ejecutar grafo (cancelable si el cliente se desconecta o se agota el tiempo)
+        progress = {"nodes": []}
+        # Las llamadas al LLM del turno tienen prioridad interactiva y su
+        # deadline; su consumo de tokens se atribuye a la sesión
+        with llm_request_context(
+            PRIORITY_INTERACTIVE,
+            deadline=time.monotonic() + settings.CHAT_TURN_TIMEOUT_SECONDS
+        ), usage_context(session_id=session_id):
+            turn = asyncio.create_task(_run_turn(input_state, config, progress))
+        watcher = asyncio.create_task(_cancel_on_disconnect(http_request, turn))
+        try:
+            result = await asyncio.wait_for(turn, timeout=settings.CHAT_TURN_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            _log_turn_cancelled(session_id, "timeout", progress)
+            await _clean_up_cancelled_turn(input_state, config)
+            raise HTTPException(status_code=504, detail="Tiempo de respuesta agotado")
+        except asyncio.CancelledError:
+            if not turn.cancelled() or asyncio.current_task().cancelling():
+                turn.cancel()
+                _clean_up_after(turn, input_state, config)
+                raise
+            _log_turn_cancelled(session_id, "client_disconnected", progress)
+            await _clean_up_cancelled_turn(input_state, config)
+            raise HTTPException(status_code=499, detail="Cliente desconectado")
+        finally:
+            watcher.cancel()
         
         # Extraer respuesta
         last_message = result["messages"][-1]
@@ -90,55 +214,105 @@ async def chat_endpoint(
             }
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error("chat_endpoint_error", error=str(e))
         raise HTTPException(status_code=500, detail="Error procesando mensaje")
 
+def _sse(payload: dict) -> str:
+    """Formatea un evento Server-Sent Events"""
+    return f"data: {json.dumps(payload)}\n\n"
+
 @router.post("/chat/stream")
-async def chat_stream_endpoint(request: ChatRequest):
-    """Endpoint de chat con streaming - Versión simplificada"""
+async def chat_stream_endpoint(request: ChatRequest, http_request: Request):
+    """Endpoint de chat con streaming de tokens del LLM"""
     session_id = request.session_id or f"session_{uuid.uuid4().hex}"
     
     async def generate() -> AsyncGenerator[str, None]:
-        try:
-            config = {
-                "configurable": {
-                    "thread_id": session_id,
-                    "checkpoint_ns": "support_agent"
-                }
-            }
-            
-            input_state = {
-                "messages": [HumanMessage(content=request.message)],
-                "session_id": session_id,
-                "metadata": {"source": "api_stream"}
+        config = {
+            "configurable": {
+                "thread_id": session_id,
+                "checkpoint_ns": "support_agent"
             }
+        }
+        
+        input_state = {
+            "messages": [HumanMessage(content=request.message)],
+            "session_id": session_id,
+            "metadata": {"source": "api_stream"}
+        }
+        
+        progress = {"nodes": [], "tokens": 0}
+        events: asyncio.Queue = asyncio.Queue()
+        
+        async def produce():
+            try:
+                async for event in graph_module.support_agent_graph.astream_events(
+                    input_state, config, version="v2"
+                ):
+                    await events.put(event)
+            finally:
+                events.put_nowait(None)
+        
+        with llm_request_context(PRIORITY_INTERACTIVE), usage_context(session_id=session_id):
+            producer = asyncio.create_task(produce())
+        watcher = asyncio.create_task(_cancel_on_disconnect(http_request, producer))
+        
+        try:
+            result = {}
+            streamed = False
             
-            # Ejecutar el grafo completo primero
-            result = await graph_module.support_agent_graph.ainvoke(input_state, config)
+            # Reenviar tokens del LLM a medida que llegan
+            while (event := await events.get()) is not None:
+                kind = event["event"]
+                node = event.get("metadata", {}).get("langgraph_node")
+                
+                if kind == "on_chat_model_stream" and node in graph_module.STREAMING_NODES:
+                    token = event["data"]["chunk"].content
+                    if token:
+                        streamed = True
+                        progress["tokens"] += 1
+                        yield _sse({'chunk': token})
+                
+                elif kind == "on_chain_end" and event["name"] == node:
+                    progress["nodes"].append(node)
+                
+                elif kind == "on_chain_end" and not event.get("parent_ids"):
+                    # Estado final del grafo (evento raíz)
+                    result = event["data"].get("output") or {}
             
-            # Extraer la respuesta final
-            last_message = result["messages"][-1]
-            response_text = last_message.content if hasattr(last_message, 'content') else str(last_message)
+            # Propaga errores (o la cancelación) del productor
+            await producer
             
-            # Simular streaming enviando palabra por palabra
-            if response_text:
-                words = response_text.split()
-                for word in words:
-                    yield f"data: {json.dumps({'chunk': word + ' '})}\n\n"
-                    await asyncio.sleep(0.05)
+            # Nodos con respuesta fija: un único chunk
+            if not streamed and result.get("messages"):
+                last_message = result["messages"][-1]
+                response_text = last_message.content if hasattr(last_message, 'content') else str(last_message)
+                if response_text:
+                    yield _sse({'chunk': response_text})
             
             # Enviar metadata final
-            yield f"data: {json.dumps({
+            yield _sse({
                 'done': True, 
                 'session_id': session_id,
                 'intent': result.get('current_intent'),
                 'conversation_ended': result.get('conversation_ended', False)
-            })}\n\n"
+            })
             
+        except asyncio.CancelledError:
+            # Cliente desconectado: detectado por el watcher o por Starlette
+            _log_turn_cancelled(session_id, "client_disconnected", progress)
+            producer.cancel()
+            _clean_up_after(producer, input_state, config)
+            if not producer.cancelled():
+                raise
         except Exception as e:
             logger.error("stream_error", error=str(e))
-            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+            yield _sse({'error': str(e)})
+        finally:
+            watcher.cancel()
+            producer.cancel()
     
     return StreamingResponse(
         generate(),
@@ -150,12 +324,27 @@ async def chat_stream_endpoint(request: ChatRequest):
         }
     )
 
-@router.post("/documents/upload", response_model=DocumentUploadResponse)
+async def _save_upload(file: UploadFile, dest_path: str) -> int:
+    """Escribe la subida en disco por bloques, sin cargarla entera en memoria"""
+    written = 0
+    with open(dest_path, "wb") as f:
+        while chunk := await file.read(settings.UPLOAD_CHUNK_SIZE):
+            written += len(chunk)
+            if written > settings.UPLOAD_MAX_BYTES:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Archivo demasiado grande (máximo {settings.UPLOAD_MAX_BYTES} bytes)"
+                )
+            await asyncio.to_thread(f.write, chunk)
+    return written
+
+@router.post("/documents/upload", response_model=DocumentUploadResponse, status_code=202)
 async def upload_document(
     file: UploadFile = File(...),
     collection: str = settings.FAQ_COLLECTION
 ):
-    """Carga un documento a la base de conocimiento"""
+    """Carga un documento y encola su ingesta en segundo plano"""
+    temp_path = None
     try:
         # Validar tipo de archivo
         allowed_types = [".pdf", ".md"]
@@ -167,38 +356,45 @@ async def upload_document(
                 detail=f"Tipo de archivo no soportado. Use: {allowed_types}"
             )
         
-        # Crear directorio temporal
-        import tempfile
-        os.makedirs("/tmp", exist_ok=True)
-        
-        # Guardar temporalmente
-        temp_path = f"/tmp/{uuid.uuid4()}{file_ext}"
-        with open(temp_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
-        
-        # Ingestar documento
-        result = await vector_store_service.ingest_document(
-            file_path=temp_path,
-            collection_name=collection
-        )
-        
-        # Limpiar archivo temporal
-        os.remove(temp_path)
+        # Guardar en disco por bloques
+        os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+        temp_path = os.path.join(settings.UPLOAD_DIR, f"{uuid.uuid4()}{file_ext}")
+        size = await _save_upload(file, temp_path)
         
-        if result["status"] == "error":
-            raise HTTPException(status_code=500, detail=result["message"])
+        # Encolar ingesta; el worker elimina el archivo al terminar
+        try:
+            job = ingestion_job_manager.submit(temp_path, file.filename, collection)
+        except IngestionQueueFull:
+            raise HTTPException(
+                status_code=503,
+                detail="Cola de ingesta llena, inténtalo más tarde",
+                headers={"Retry-After": "30"}
+            )
+        temp_path = None
         
+        logger.info("document_upload_queued", file=file.filename, bytes=size, job_id=job.id)
         return DocumentUploadResponse(
-            status="success",
-            message=f"Documento '{file.filename}' cargado exitosamente",
-            document_id=str(uuid.uuid4()),
-            chunks_created=result["chunks_added"]
+            status="queued",
+            message=f"Documento '{file.filename}' encolado para ingesta",
+            job_id=job.id
         )
-        
+    
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error("document_upload_error", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+
+@router.get("/documents/jobs/{job_id}", response_model=IngestionJobResponse)
+async def get_ingestion_job(job_id: str):
+    """Estado y progreso de un trabajo de ingesta"""
+    job = ingestion_job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return IngestionJobResponse(**job.to_dict())
 
 @router.get("/health", response_model=HealthResponse)
 async def health_check():
@@ -207,7 +403,7 @@ async def health_check():
     
     # Verificar ChromaDB
     try:
-        vector_store_service.client.heartbeat()
+        await vector_store_service.heartbeat()
         services_status["chromadb"] = "healthy"
     except:
         services_status["chromadb"] = "unhealthy"
@@ -223,4 +419,43 @@ async def health_check():
         version=settings.APP_VERSION,
         timestamp=datetime.utcnow(),
         services=services_status
-    )
\ No newline at end of file
+    )
+
+@router.get("/metrics", response_model=MetricsResponse)
+async def metrics():
+    """Métricas internas de los componentes del agente"""
+    return MetricsResponse(
+        timestamp=datetime.utcnow(),
+        components={
+            "intent_fast_path": fast_path_router.get_stats(),
+            "intent_embedding": intent_embedding_classifier.get_stats(),
+            "intent_cache": intent_cache.get_stats(),
+            "speculative_retrieval": speculative_retrieval.get_stats(),
+            "ingestion_jobs": ingestion_job_manager.get_stats(),
+            "document_parser": document_parser.get_stats(),
+            "embedding_executor": embedding_executor.get_stats(),
+            "query_embedding_cache": query_embedding_cache.get_stats(),
+            "answer_cache": answer_cache.get_stats(),
+            "context_packing": context_packer.get_stats(),
+            "llm_providers": provider_registry.get_stats(),
+            "token_usage": token_usage_tracker.get_stats(),
+        }
+    )
+
+@router.get("/usage", response_model=TokenUsageResponse)
+async def token_usage():
+    """Consumo de tokens de hoy por cliente y cuotas de los proveedores"""
+    return TokenUsageResponse(**token_usage_tracker.get_usage())
+
+@router.get("/usage/me", response_model=ClientUsageResponse)
+async def client_token_usage(http_request: Request):
+    """Consumo de tokens de hoy del cliente que hace la petición"""
+    return ClientUsageResponse(**token_usage_tracker.get_client(client_id_for(http_request)))
+
+@router.get("/usage/sessions/{session_id}", response_model=SessionUsageResponse)
+async def session_token_usage(session_id: str):
+    """Consumo de tokens acumulado de una sesión"""
+    usage = token_usage_tracker.get_session(session_id)
+    if usage is None:
+        raise HTTPException(status_code=404, detail="Session usage not found")
+    return SessionUsageResponse(session_id=session_id, **usage)
\ No newline at end of file
@@ -28,10 +28,57 @@ class DocumentUploadResponse(BaseModel):
     message: str
     document_id: Optional[str] = None
     chunks_created: Optional[int] = None
+    job_id: Optional[str] = None
+
+class IngestionJobResponse(BaseModel):
+    """Estado de un trabajo de ingesta en segundo plano"""
+    id: str
+    filename: str
+    collection: str
+    status: str
+    stage: Optional[str] = None
+    chunks_total: Optional[int] = None
+    chunks_added: Optional[int] = None
+    chunks_removed: Optional[int] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class SessionUsageResponse(BaseModel):
+    """Consumo de tokens de una sesión"""
+    session_id: str
+    prompt_tokens: int
+    completion_tokens: int
+    total_tokens: int
+    calls: int
+
+class ClientUsageResponse(BaseModel):
+    """Consumo de tokens de hoy de un cliente frente a su presupuesto"""
+    date: str
+    client_id: str
+    prompt_tokens: int
+    completion_tokens: int
+    total_tokens: int
+    calls: int
+    daily_budget: Optional[int] = None
+    remaining: Optional[int] = None
+
+class TokenUsageResponse(BaseModel):
+    """Consumo de tokens de hoy por cliente y cuotas upstream"""
+    date: str
+    daily_budget: Optional[int] = None
+    clients: Dict[str, Dict[str, int]]
+    upstream: Dict[str, Dict[str, Any]]
 
 class HealthResponse(BaseModel):
     """Response de health check"""
     status: str
     version: str
     timestamp: datetime
-    services: Dict[str, str]
\ No newline at end of file
+    services: Dict[str, str]
+
+class MetricsResponse(BaseModel):
+    """Response de métricas internas"""
+    timestamp: datetime
+    components: Dict[str, Any]
\ No newline at end of file
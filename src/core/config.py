@@ -1,7 +1,7 @@
 import os
 from pathlib import Path
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
 BASE_DIR = Path(__file__).parent.parent.parent
 
@@ -20,15 +20,147 @@ class Settings(BaseSettings):
     CEREBRAS_MODEL: str = "llama-3.3-70b"
     CEREBRAS_MAX_TOKENS: int = 2048
     CEREBRAS_TEMPERATURE: float = 0.1
+    CEREBRAS_BASE_URL: str = "https://api.cerebras.ai/v1"
+    
+    # OpenAI (fallback provider)
+    OPENAI_MODEL: str = "gpt-4o-mini"
+    OPENAI_BASE_URL: str = "https://api.openai.com/v1"
+    
+    # LLM provider registry / failover
+    LLM_PROVIDERS: List[str] = ["cerebras", "openai"]
+    LLM_MAX_CONNECTIONS: int = 20
+    LLM_KEEPALIVE_SECONDS: float = 120.0
+    LLM_MAX_RETRIES: int = 0
+    LLM_REQUEST_TIMEOUT_SECONDS: float = 30.0
+    LLM_FIRST_TOKEN_TIMEOUT_SECONDS: float = 10.0
+    LLM_SLOW_LATENCY_SECONDS: float = 5.0
+    LLM_LATENCY_EWMA_ALPHA: float = 0.2
+    LLM_FAILURE_THRESHOLD: int = 3
+    LLM_COOLDOWN_SECONDS: float = 30.0
+    
+    # LLM governor (per provider): adaptive concurrency, tokens/minute, queue
+    LLM_CONCURRENCY_INITIAL: int = 8
+    LLM_CONCURRENCY_MIN: int = 1
+    LLM_CONCURRENCY_MAX: int = 32
+    LLM_TOKENS_PER_MINUTE: int = 60000  # 0 = sin límite
+    LLM_QUEUE_MAX: int = 256
+    LLM_LATENCY_TARGET_SECONDS: float = 2.0
+    
+    # Single-flight: identical concurrent LLM calls share one upstream request
+    LLM_SINGLE_FLIGHT_ENABLED: bool = True
+    
+    # Per-task model profiles (model=None uses the provider default;
+    # provider="failover" tries every provider in LLM_PROVIDERS)
+    LLM_PROFILES: Dict[str, Dict[str, Any]] = {
+        "classifier": {
+            "provider": "failover",
+            "model": "llama3.1-8b",
+            "max_tokens": 8,
+            "temperature": 0.0,
+            "stop": ["\n"],
+            "timeout": 5.0,
+        },
+        "answerer": {
+            "provider": "failover",
+            "model": None,
+            "max_tokens": 1024,
+            "temperature": 0.1,
+            "timeout": 30.0,
+        },
+        "summarizer": {
+            "provider": "failover",
+            "model": "llama3.1-8b",
+            "max_tokens": 256,
+            "temperature": 0.0,
+            "timeout": 15.0,
+        },
+    }
     
     # Database
     SQLITE_DB_PATH: str = os.path.join(BASE_DIR, 'data', 'sqlite', 'sessions.db')
     CHROMA_HOST: str = "localhost"
     CHROMA_PORT: int = 8081
+    CHROMA_MAX_CONNECTIONS: int = 16
+    CHROMA_WRITE_BATCH_SIZE: int = 500
+    
+    # Vector store backend: "chroma" (servidor) | "local" (índice NumPy embebido)
+    VECTOR_BACKEND: str = "chroma"
+    LOCAL_INDEX_DIR: str = os.path.join(BASE_DIR, 'data', 'vector_index')
+    # Compact storage for the local index: "none" | "float16" | "int8"
+    LOCAL_INDEX_QUANTIZATION: str = "none"
+    LOCAL_INDEX_RESCORE: bool = True
+    LOCAL_INDEX_RESCORE_FACTOR: int = 4
+    
+    # Hybrid retrieval (BM25 + vectorial)
+    HYBRID_SEARCH_ENABLED: bool = True
+    HYBRID_CANDIDATES: int = 10
+    HYBRID_RRF_K: int = 60
+    LEXICAL_INDEX_DIR: str = os.path.join(BASE_DIR, 'data', 'lexical_index')
+    INGEST_MANIFEST_DIR: str = os.path.join(BASE_DIR, 'data', 'ingest_manifests')
+    
+    # MMR re-ranking (defaults; per-collection overrides in RETRIEVAL_PROFILES,
+    # e.g. {"faq_knowledge": {"fetch_k": 30, "lambda_mult": 0.5, "max_per_source": 1}})
+    RERANK_ENABLED: bool = True
+    RERANK_FETCH_K: int = 20
+    RERANK_LAMBDA: float = 0.7
+    RERANK_MAX_PER_SOURCE: Optional[int] = None  # no cap: a single-source collection still returns k
+    RETRIEVAL_PROFILES: Dict[str, Dict[str, Any]] = {}
+    
+    # Document uploads / background ingestion
+    UPLOAD_DIR: str = os.path.join(BASE_DIR, 'data', 'uploads')
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024
+    UPLOAD_MAX_BYTES: int = 100 * 1024 * 1024
+    INGEST_MAX_CONCURRENT_JOBS: int = 2
+    INGEST_MAX_QUEUED_JOBS: int = 32
+    
+    # Document parsing worker pool
+    PARSER_WORKERS: int = 2
+    PARSER_PDF_PAGES_PER_TASK: int = 20
+    PARSER_MAX_MEMORY_MB: int = 2048
+    PARSER_MAX_TASKS_PER_CHILD: Optional[int] = 100
+    
+    # RAG context packing
+    CONTEXT_PACKING_ENABLED: bool = True
+    CONTEXT_MAX_TOKENS: int = 1200
+    CONTEXT_MAX_OVERLAP: int = 200
+    CONTEXT_TOKENIZER: str = "sentence-transformers/all-MiniLM-L6-v2"
+    
+    # Semantic answer cache (support_query)
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_SIMILARITY: float = 0.95
+    ANSWER_CACHE_TTL_SECONDS: float = 3600
+    ANSWER_CACHE_MAX_BYTES: int = 16 * 1024 * 1024
     
     # Rate Limiting
     RATE_LIMIT_REQUESTS_PER_MINUTE: int = 50
-    RATE_LIMIT_TOKENS_PER_DAY: int = 900000
+    RATE_LIMIT_TOKENS_PER_DAY: int = 900000  # per client; 0 = no budget
+    TOKEN_USAGE_MAX_SESSIONS: int = 10000
+    TOKEN_USAGE_UPSTREAM_WARNING: int = 1000  # remaining upstream tokens/minute
+    
+    # Embeddings
+    EMBEDDING_BATCH_WINDOW_MS: float = 3.0
+    EMBEDDING_MAX_BATCH_SIZE: int = 32
+    EMBEDDING_MAX_QUEUE: int = 1024
+    EMBEDDING_WORKERS: int = 1
+    EMBEDDING_BULK_WORKERS: int = 1  # pool aparte para la ingesta
+    EMBEDDING_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    EMBEDDING_CACHE_PATH: Optional[str] = None  # p. ej. data/sqlite/embeddings.db
+    
+    # Intent Classification
+    INTENT_FAST_PATH_ENABLED: bool = True
+    INTENT_RULES_PATH: Optional[str] = None
+    INTENT_CLASSIFIER_MODE: str = "llm"  # "llm" | "embedding"
+    INTENT_EXAMPLES_PATH: Optional[str] = None
+    INTENT_EMBEDDING_MIN_SCORE: float = 0.5
+    INTENT_EMBEDDING_MIN_MARGIN: float = 0.05
+    INTENT_CACHE_ENABLED: bool = True
+    INTENT_CACHE_MAX_ENTRIES: int = 2048
+    INTENT_CACHE_TTL_SECONDS: float = 900
+    SPECULATIVE_RETRIEVAL_ENABLED: bool = False
+    
+    # Turn execution
+    CHAT_TURN_TIMEOUT_SECONDS: float = 60
+    DISCONNECT_POLL_INTERVAL_SECONDS: float = 0.5
     
     # Application
     APP_NAME: str = "Support Agent"
@@ -0,0 +1,258 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from src.utils.metrics import LatencyStats
+from src.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Prioridades (menor = antes)
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+_PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BATCH: "batch"}
+
+# Por defecto todo es trabajo batch; /chat marca sus turnos como interactivos
+_priority: ContextVar[int] = ContextVar("llm_priority", default=PRIORITY_BATCH)
+_deadline: ContextVar[Optional[float]] = ContextVar("llm_deadline", default=None)
+
+@contextmanager
+def llm_request_context(priority: int = PRIORITY_INTERACTIVE, deadline: Optional[float] = None):
+    """Prioridad y deadline (time.monotonic) de las llamadas al LLM en este contexto.
+
+    Las tareas creadas dentro del bloque heredan los valores.
+    """
+    priority_token = _priority.set(priority)
+    deadline_token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _priority.reset(priority_token)
+        _deadline.reset(deadline_token)
+
+class GovernorRejected(Exception):
+    """La llamada no se admite: cola llena o el deadline no se puede cumplir"""
+
+    def __init__(self, provider: str, reason: str):
+        super().__init__(f"LLM governor for '{provider}' rejected request: {reason}")
+        self.provider = provider
+        self.reason = reason
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    return getattr(error, "status_code", None) == 429 or type(error).__name__ == "RateLimitError"
+
+@dataclass
+class Permit:
+    """Plaza concedida; quien llama anota el resultado antes de liberarla"""
+    tokens: int
+    latency: Optional[float] = None
+    used_tokens: Optional[int] = None
+    rate_limited: bool = False
+
+    def fail(self, error: BaseException):
+        self.rate_limited = is_rate_limit_error(error)
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    tokens: int = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+class LLMGovernor:
+    """Limita las llamadas concurrentes a un proveedor de LLM.
+
+    - Concurrencia adaptativa (AIMD): sube poco a poco mientras la latencia
+      está por debajo del objetivo y se reduce a la mitad ante un 429.
+    - Cubo de tokens por minuto: cada llamada reserva su estimación
+      (prompt + max_tokens) y se ajusta con el uso real.
+    - Cola acotada por prioridad; una petición cuyo deadline no se puede
+      cumplir con la espera estimada se rechaza al llegar.
+    """
+
+    def __init__(self,
+                 name: str,
+                 initial_limit: int = 8,
+                 min_limit: int = 1,
+                 max_limit: int = 32,
+                 tokens_per_minute: int = 0,
+                 max_queue: int = 256,
+                 latency_target: float = 2.0):
+        self.name = name
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tokens_per_minute = tokens_per_minute
+        self.max_queue = max_queue
+        self.latency_target = latency_target
+        self.in_flight = 0
+        self.tokens = float(tokens_per_minute)
+        self.latency_ewma: Optional[float] = None
+        self._refilled_at = time.monotonic()
+        self._last_decrease = 0.0
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+        # Métricas
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {"queue_full": 0, "deadline": 0}
+        self.rate_limited = 0
+        self.wait = {name: LatencyStats() for name in _PRIORITY_NAMES.values()}
+
+    def _refill(self):
+        if not self.tokens_per_minute:
+            return
+        now = time.monotonic()
+        self.tokens = min(
+            self.tokens_per_minute,
+            self.tokens + (now - self._refilled_at) * self.tokens_per_minute / 60
+        )
+        self._refilled_at = now
+
+    def _can_admit(self, tokens: int) -> bool:
+        if self.in_flight >= int(self.limit):
+            return False
+        if self.tokens_per_minute:
+            self._refill()
+            return self.tokens >= min(tokens, self.tokens_per_minute)
+        return True
+
+    def _admit(self, tokens: int):
+        self.in_flight += 1
+        self.admitted += 1
+        if self.tokens_per_minute:
+            self.tokens -= tokens
+
+    def _queued(self) -> List[_Waiter]:
+        return [waiter for waiter in self._waiters if not waiter.future.done()]
+
+    def _dispatch(self):
+        """Despierta a los primeros de la cola mientras haya capacidad"""
+        while self._waiters:
+            waiter = self._waiters[0]
+            if waiter.future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if not self._can_admit(waiter.tokens):
+                self._schedule_refill(waiter.tokens)
+                return
+            heapq.heappop(self._waiters)
+            self._admit(waiter.tokens)
+            waiter.future.set_result(None)
+
+    def _schedule_refill(self, tokens: int):
+        # Si falta concurrencia, la próxima liberación volverá a despachar
+        if not self.tokens_per_minute or self.in_flight >= int(self.limit) or self._wakeup is not None:
+            return
+        deficit = min(tokens, self.tokens_per_minute) - self.tokens
+        delay = max(deficit / (self.tokens_per_minute / 60), 0.01)
+        self._wakeup = asyncio.get_running_loop().call_later(delay, self._on_wakeup)
+
+    def _on_wakeup(self):
+        self._wakeup = None
+        self._dispatch()
+
+    def expected_wait(self, ahead: int) -> float:
+        """Espera estimada con `ahead` peticiones por delante en la cola"""
+        latency = self.latency_ewma or self.latency_target
+        return (ahead + 1) / max(int(self.limit), 1) * latency
+
+    async def acquire(self, tokens: int) -> float:
+        """Espera una plaza; devuelve los segundos de espera en cola"""
+        priority = _priority.get()
+        deadline = _deadline.get()
+        started = time.monotonic()
+        queued = self._queued()
+
+        if not queued and self._can_admit(tokens):
+            self._admit(tokens)
+            self.wait[_PRIORITY_NAMES[priority]].observe(0.0)
+            return 0.0
+
+        if len(queued) >= self.max_queue:
+            self.rejected["queue_full"] += 1
+            raise GovernorRejected(self.name, "queue_full")
+        ahead = sum(1 for waiter in queued if waiter.priority <= priority)
+        if deadline is not None and started + self.expected_wait(ahead) > deadline:
+            self.rejected["deadline"] += 1
+            raise GovernorRejected(self.name, "deadline")
+
+        waiter = _Waiter(priority, next(self._seq), tokens, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._waiters, waiter)
+        self._dispatch()
+        try:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0.0)
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except asyncio.TimeoutError:
+            if not waiter.future.done():
+                waiter.future.cancel()
+                self.rejected["deadline"] += 1
+                raise GovernorRejected(self.name, "deadline")
+        except asyncio.CancelledError:
+            # Si la plaza ya se había concedido, devolverla
+            if waiter.future.done() and not waiter.future.cancelled():
+                self.release(Permit(tokens))
+            else:
+                waiter.future.cancel()
+            raise
+
+        waited = time.monotonic() - started
+        self.wait[_PRIORITY_NAMES[priority]].observe(waited)
+        return waited
+
+    def release(self, permit: Permit):
+        """Libera la plaza y adapta el límite según el resultado"""
+        self.in_flight -= 1
+        if self.tokens_per_minute and permit.used_tokens is not None:
+            self.tokens += permit.tokens - permit.used_tokens
+
+        now = time.monotonic()
+        # Como mucho una reducción por ventana de latencia: varios 429
+        # simultáneos son la misma señal
+        window = self.latency_ewma or self.latency_target
+        if permit.rate_limited:
+            self.rate_limited += 1
+            if now - self._last_decrease > window:
+                self.limit = max(self.min_limit, self.limit / 2)
+                self._last_decrease = now
+                logger.warning("llm_concurrency_decreased", provider=self.name, limit=int(self.limit))
+        elif permit.latency is not None:
+            self.latency_ewma = permit.latency if self.latency_ewma is None else (
+                0.2 * permit.latency + 0.8 * self.latency_ewma
+            )
+            if permit.latency > 2 * self.latency_target:
+                if now - self._last_decrease > window:
+                    self.limit = max(self.min_limit, self.limit * 0.9)
+                    self._last_decrease = now
+            elif permit.latency <= self.latency_target:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, tokens: int):
+        """`async with governor.slot(tokens) as permit:` alrededor de la llamada"""
+        await self.acquire(tokens)
+        permit = Permit(tokens)
+        try:
+            yield permit
+        except Exception as e:
+            permit.fail(e)
+            raise
+        finally:
+            self.release(permit)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "queued": len(self._queued()),
+            "tokens_available": int(self.tokens) if self.tokens_per_minute else None,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "rate_limited": self.rate_limited,
+            "queue_wait": {name: stats.get_stats() for name, stats in self.wait.items()},
+        }
@@ -1,45 +1,609 @@
-from langchain_core.language_models.chat_models import BaseChatModel
+import asyncio
+import hashlib
+import json
+import time
+from dataclasses import dataclass, fields
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+import httpx
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import (
+    BaseChatModel, agenerate_from_stream, generate_from_stream
+)
+from langchain_core.messages import BaseMessage, messages_to_dict
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
 from langchain_cerebras import ChatCerebras
 from src.core.config import settings
+from src.llms.governor import LLMGovernor, GovernorRejected
+from src.llms.singleflight import SingleFlight
+from src.services.token_usage import token_usage_callback, token_usage_tracker
+from src.utils.metrics import LatencyStats
 from src.core.logging import get_logger
-from functools import lru_cache
 
 logger = get_logger(__name__)
 
-@lru_cache(maxsize=1)
+@dataclass(frozen=True)
+class ProviderSpec:
+    """Endpoint compatible con la API de OpenAI"""
+    name: str
+    api_key: str
+    base_url: str
+    model: str
+
+def configured_providers() -> Dict[str, ProviderSpec]:
+    """Proveedores con API key configurada, en el orden de LLM_PROVIDERS"""
+    available = {
+        "cerebras": ProviderSpec(
+            name="cerebras",
+            api_key=settings.CEREBRAS_API_KEY,
+            base_url=settings.CEREBRAS_BASE_URL,
+            model=settings.CEREBRAS_MODEL,
+        ),
+    }
+    if settings.OPENAI_API_KEY:
+        available["openai"] = ProviderSpec(
+            name="openai",
+            api_key=settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL,
+            model=settings.OPENAI_MODEL,
+        )
+    return {name: available[name] for name in settings.LLM_PROVIDERS if name in available}
+
+class ProviderHealth:
+    """Salud observada de un proveedor: latencia (EWMA) y circuito de fallos"""
+
+    def __init__(self, alpha: float, failure_threshold: int, cooldown_seconds: float):
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.latency_ewma: Optional[float] = None
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.requests = 0
+        self.failures = 0
+
+    def _observe(self, latency: float):
+        self.latency_ewma = latency if self.latency_ewma is None else (
+            self.alpha * latency + (1 - self.alpha) * self.latency_ewma
+        )
+
+    def record_success(self, latency: float):
+        self.requests += 1
+        self.consecutive_failures = 0
+        self._observe(latency)
+
+    def record_failure(self, latency: Optional[float] = None):
+        self.requests += 1
+        self.failures += 1
+        self.consecutive_failures += 1
+        if latency is not None:
+            # Un timeout también cuenta como latencia observada
+            self._observe(latency)
+        if self.consecutive_failures >= self.failure_threshold:
+            self.open_until = time.monotonic() + self.cooldown_seconds
+
+    @property
+    def available(self) -> bool:
+        # Pasado el cooldown se permite una petición de prueba (half-open)
+        return time.monotonic() >= self.open_until
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "available": self.available,
+            "latency_ewma_ms": round(self.latency_ewma * 1000, 1) if self.latency_ewma is not None else None,
+            "consecutive_failures": self.consecutive_failures,
+            "requests": self.requests,
+            "failures": self.failures,
+        }
+
+@dataclass(frozen=True)
+class ModelProfile:
+    """Parámetros de modelo para una tarea (clasificar, responder, resumir...)"""
+    name: str
+    provider: str = "failover"
+    model: Optional[str] = None
+    max_tokens: Optional[int] = None
+    temperature: Optional[float] = None
+    stop: Optional[Tuple[str, ...]] = None
+    timeout: Optional[float] = None
+
+    @classmethod
+    def from_settings(cls, name: str) -> "ModelProfile":
+        config = settings.LLM_PROFILES.get(name)
+        if config is None:
+            raise ValueError(f"LLM profile '{name}' not configured")
+        known = {f.name for f in fields(cls)} - {"name"}
+        params = {key: value for key, value in config.items() if key in known}
+        if params.get("stop"):
+            params["stop"] = tuple(params["stop"])
+        return cls(name=name, **params)
+
+def estimate_tokens(messages: List[BaseMessage], model: BaseChatModel) -> int:
+    """Reserva para el cubo de tokens: prompt (~4 caracteres/token) + max_tokens"""
+    prompt_chars = sum(len(str(message.content)) for message in messages)
+    return prompt_chars // 4 + (getattr(model, "max_tokens", None) or 0)
+
+def _usage_tokens(result: ChatResult) -> Optional[int]:
+    usage = getattr(result.generations[0].message, "usage_metadata", None) if result.generations else None
+    return usage.get("total_tokens") if usage else None
+
+def _chunk_usage_tokens(chunk: ChatGenerationChunk) -> Optional[int]:
+    usage = getattr(chunk.message, "usage_metadata", None)
+    return usage.get("total_tokens") if usage else None
+
+def _call_generate(model: BaseChatModel, messages: List[BaseMessage], stop, **kwargs) -> ChatResult:
+    # Los clientes se crean con streaming=True; BaseChatModel resolvería eso
+    # en generate(), pero aquí se llama directamente al método interno
+    if getattr(model, "streaming", False):
+        return generate_from_stream(model._stream(messages, stop=stop, **kwargs))
+    return model._generate(messages, stop=stop, **kwargs)
+
+async def _call_agenerate(model: BaseChatModel, messages: List[BaseMessage], stop, **kwargs) -> ChatResult:
+    if getattr(model, "streaming", False):
+        return await agenerate_from_stream(model._astream(messages, stop=stop, **kwargs))
+    return await model._agenerate(messages, stop=stop, **kwargs)
+
+class FailoverChatModel(BaseChatModel):
+    """Modelo de chat que reparte entre proveedores según salud y latencia.
+
+    Se prueba primero el proveedor preferido que esté disponible y no sea
+    lento; si falla (o no responde dentro del timeout) se pasa al
+    siguiente. En streaming solo se conmuta antes del primer token.
+    Las llamadas asíncronas pasan por el LLMGovernor de cada proveedor y
+    las idénticas en curso se agrupan en una sola (single-flight).
+
+    Las síncronas (`invoke`, `stream`) NO están gestionadas: sin governor
+    (ni límites de concurrencia ni presupuesto de tokens) y sin
+    single-flight, porque ambos viven en el event loop de la API. Solo
+    para scripts y usos puntuales fuera de la API.
+    """
+
+    candidates: List[Tuple[str, BaseChatModel]]
+    registry: Any
+    profile: Optional[str] = None
+    stop: Optional[List[str]] = None
+    timeout: Optional[float] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "failover"
+
+    def _ordered(self) -> List[Tuple[str, BaseChatModel]]:
+        def rank(item):
+            position, (name, _) = item
+            health = self.registry.health_for(name)
+            slow = (health.latency_ewma or 0.0) > settings.LLM_SLOW_LATENCY_SECONDS
+            return (not health.available, slow, position)
+
+        return [item for _, item in sorted(enumerate(self.candidates), key=rank)]
+
+    def _flight_key(self, messages: List[BaseMessage], stop: Optional[List[str]], kwargs: Dict[str, Any]) -> str:
+        """Prompt renderizado + parámetros de modelo: iguales => misma respuesta"""
+        payload = {
+            "messages": messages_to_dict(messages),
+            "stop": stop or self.stop,
+            "models": [(name, model._identifying_params) for name, model in self.candidates],
+            "profile": self.profile,
+            "kwargs": kwargs,
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    def _generate(self,
+                  messages: List[BaseMessage],
+                  stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None,
+                  **kwargs: Any) -> ChatResult:
+        # Ruta síncrona no gestionada: sin governor ni single-flight (ver clase)
+        last_error: Optional[BaseException] = None
+        for name, model in self._ordered():
+            health = self.registry.health_for(name)
+            started = time.perf_counter()
+            try:
+                result = _call_generate(model, messages, stop or self.stop, **kwargs)
+            except Exception as e:
+                health.record_failure()
+                last_error = e
+                logger.warning("llm_provider_failed", provider=name, error=str(e))
+                continue
+            elapsed = time.perf_counter() - started
+            health.record_success(elapsed)
+            self.registry.record_latency(self.profile, "total", elapsed)
+            return result
+        raise last_error or RuntimeError("No LLM provider available")
+
+    async def _agenerate(self,
+                         messages: List[BaseMessage],
+                         stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                         **kwargs: Any) -> ChatResult:
+        if not settings.LLM_SINGLE_FLIGHT_ENABLED:
+            return await self._agenerate_upstream(messages, stop, **kwargs)
+        return await self.registry.single_flight.run(
+            self._flight_key(messages, stop, kwargs),
+            lambda: self._agenerate_upstream(messages, stop, **kwargs)
+        )
+
+    async def _agenerate_upstream(self,
+                                  messages: List[BaseMessage],
+                                  stop: Optional[List[str]] = None,
+                                  **kwargs: Any) -> ChatResult:
+        last_error: Optional[BaseException] = None
+        for name, model in self._ordered():
+            health = self.registry.health_for(name)
+            try:
+                async with self.registry.governor_for(name).slot(
+                    estimate_tokens(messages, model)
+                ) as permit:
+                    started = time.perf_counter()
+                    try:
+                        result = await asyncio.wait_for(
+                            _call_agenerate(model, messages, stop or self.stop, **kwargs),
+                            timeout=self.timeout or settings.LLM_REQUEST_TIMEOUT_SECONDS
+                        )
+                    except Exception as e:
+                        permit.fail(e)
+                        health.record_failure(time.perf_counter() - started)
+                        last_error = e
+                        logger.warning("llm_provider_failed", provider=name, error=repr(e))
+                        continue
+                    elapsed = time.perf_counter() - started
+                    permit.latency = elapsed
+                    permit.used_tokens = _usage_tokens(result)
+            except GovernorRejected as e:
+                last_error = e
+                logger.warning("llm_governor_rejected", provider=name, reason=e.reason)
+                continue
+            health.record_success(elapsed)
+            self.registry.record_latency(self.profile, "total", elapsed)
+            return result
+        raise last_error or RuntimeError("No LLM provider available")
+
+    def _stream(self,
+                messages: List[BaseMessage],
+                stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None,
+                **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        # Ruta síncrona no gestionada: sin governor ni single-flight (ver clase)
+        last_error: Optional[BaseException] = None
+        for name, model in self._ordered():
+            health = self.registry.health_for(name)
+            started = time.perf_counter()
+            stream = model._stream(messages, stop=stop or self.stop, **kwargs)
+            try:
+                first = next(stream)
+            except Exception as e:
+                health.record_failure()
+                last_error = e
+                logger.warning("llm_provider_failed", provider=name, error=str(e))
+                continue
+            elapsed = time.perf_counter() - started
+            health.record_success(elapsed)
+            self.registry.record_latency(self.profile, "first_token", elapsed)
+            yield first
+            yield from stream
+            self.registry.record_latency(self.profile, "total", time.perf_counter() - started)
+            return
+        raise last_error or RuntimeError("No LLM provider available")
+
+    async def _astream(self,
+                       messages: List[BaseMessage],
+                       stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        # Los callbacks de tokens los emite BaseChatModel.astream sobre este
+        # run; el modelo interno se llama sin run_manager para no duplicarlos
+        if not settings.LLM_SINGLE_FLIGHT_ENABLED:
+            stream = self._astream_upstream(messages, stop, **kwargs)
+        else:
+            stream = self.registry.single_flight.stream(
+                self._flight_key(messages, stop, kwargs),
+                lambda: self._astream_upstream(messages, stop, **kwargs)
+            )
+        try:
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await stream.aclose()
+
+    async def _astream_upstream(self,
+                                messages: List[BaseMessage],
+                                stop: Optional[List[str]] = None,
+                                **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        last_error: Optional[BaseException] = None
+        for name, model in self._ordered():
+            health = self.registry.health_for(name)
+            try:
+                # La plaza se mantiene hasta terminar el stream
+                async with self.registry.governor_for(name).slot(
+                    estimate_tokens(messages, model)
+                ) as permit:
+                    started = time.perf_counter()
+                    stream = model._astream(messages, stop=stop or self.stop, **kwargs)
+                    try:
+                        first = await asyncio.wait_for(
+                            stream.__anext__(),
+                            timeout=min(self.timeout or settings.LLM_FIRST_TOKEN_TIMEOUT_SECONDS,
+                                        settings.LLM_FIRST_TOKEN_TIMEOUT_SECONDS)
+                        )
+                    except Exception as e:
+                        await stream.aclose()
+                        permit.fail(e)
+                        health.record_failure(time.perf_counter() - started)
+                        last_error = e
+                        logger.warning("llm_provider_failed", provider=name, error=repr(e))
+                        continue
+                    # Latencia observada = tiempo hasta el primer token
+                    elapsed = time.perf_counter() - started
+                    permit.latency = elapsed
+                    health.record_success(elapsed)
+                    self.registry.record_latency(self.profile, "first_token", elapsed)
+                    # El consumo real llega en el último chunk (stream_usage)
+                    used_tokens = _chunk_usage_tokens(first)
+                    yield first
+                    async for chunk in stream:
+                        tokens = _chunk_usage_tokens(chunk)
+                        if tokens is not None:
+                            used_tokens = (used_tokens or 0) + tokens
+                        yield chunk
+                    permit.used_tokens = used_tokens
+                    self.registry.record_latency(self.profile, "total", time.perf_counter() - started)
+                    return
+            except GovernorRejected as e:
+                last_error = e
+                logger.warning("llm_governor_rejected", provider=name, reason=e.reason)
+                continue
+        raise last_error or RuntimeError("No LLM provider available")
+
+class ProviderRegistry:
+    """Clientes de LLM de larga vida, uno por (proveedor, modelo, parámetros).
+
+    Cada proveedor comparte un pool de conexiones HTTP (keep-alive), de modo
+    que crear variantes de un modelo no abre conexiones nuevas.
+    """
+
+    def __init__(self, providers: Optional[Dict[str, ProviderSpec]] = None):
+        self._providers = providers
+        self._models: Dict[Tuple, BaseChatModel] = {}
+        self._async_clients: Dict[str, httpx.AsyncClient] = {}
+        self._sync_clients: Dict[str, httpx.Client] = {}
+        self._health: Dict[str, ProviderHealth] = {}
+        self._latency: Dict[str, Dict[str, LatencyStats]] = {}
+        self._governors: Dict[str, LLMGovernor] = {}
+        self.single_flight = SingleFlight()
+
+    @property
+    def providers(self) -> Dict[str, ProviderSpec]:
+        if self._providers is None:
+            self._providers = configured_providers()
+        return self._providers
+
+    def spec(self, provider: str) -> ProviderSpec:
+        spec = self.providers.get(provider)
+        if spec is None:
+            raise ValueError(f"Provider '{provider}' not supported or not configured")
+        return spec
+
+    def health_for(self, provider: str) -> ProviderHealth:
+        health = self._health.get(provider)
+        if health is None:
+            health = ProviderHealth(
+                alpha=settings.LLM_LATENCY_EWMA_ALPHA,
+                failure_threshold=settings.LLM_FAILURE_THRESHOLD,
+                cooldown_seconds=settings.LLM_COOLDOWN_SECONDS,
+            )
+            self._health[provider] = health
+        return health
+
+    def governor_for(self, provider: str) -> LLMGovernor:
+        governor = self._governors.get(provider)
+        if governor is None:
+            governor = LLMGovernor(
+                provider,
+                initial_limit=settings.LLM_CONCURRENCY_INITIAL,
+                min_limit=settings.LLM_CONCURRENCY_MIN,
+                max_limit=settings.LLM_CONCURRENCY_MAX,
+                tokens_per_minute=settings.LLM_TOKENS_PER_MINUTE,
+                max_queue=settings.LLM_QUEUE_MAX,
+                latency_target=settings.LLM_LATENCY_TARGET_SECONDS,
+            )
+            self._governors[provider] = governor
+        return governor
+
+    def record_latency(self, profile: Optional[str], kind: str, seconds: float):
+        """Latencia observada por perfil ("first_token" o "total")"""
+        if profile is None:
+            return
+        stats = self._latency.setdefault(profile, {})
+        stats.setdefault(kind, LatencyStats()).observe(seconds)
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=settings.LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_MAX_CONNECTIONS,
+            keepalive_expiry=settings.LLM_KEEPALIVE_SECONDS,
+        )
+
+    def _async_client(self, provider: str) -> httpx.AsyncClient:
+        client = self._async_clients.get(provider)
+        if client is None:
+            async def on_response(response: httpx.Response):
+                token_usage_tracker.record_rate_limits(provider, response.headers)
+
+            client = httpx.AsyncClient(
+                limits=self._limits(),
+                timeout=httpx.Timeout(settings.LLM_REQUEST_TIMEOUT_SECONDS, connect=5.0),
+                event_hooks={"response": [on_response]},
+            )
+            self._async_clients[provider] = client
+        return client
+
+    def _sync_client(self, provider: str) -> httpx.Client:
+        client = self._sync_clients.get(provider)
+        if client is None:
+            client = httpx.Client(
+                limits=self._limits(),
+                timeout=httpx.Timeout(settings.LLM_REQUEST_TIMEOUT_SECONDS, connect=5.0),
+                event_hooks={"response": [
+                    lambda response: token_usage_tracker.record_rate_limits(provider, response.headers)
+                ]},
+            )
+            self._sync_clients[provider] = client
+        return client
+
+    def _build(self,
+               spec: ProviderSpec,
+               model: str,
+               temperature: float,
+               max_tokens: int,
+               timeout: Optional[float] = None) -> BaseChatModel:
+        params = {
+            "model": model,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "timeout": timeout or settings.LLM_REQUEST_TIMEOUT_SECONDS,
+            "api_key": spec.api_key,
+            "base_url": spec.base_url,
+            "streaming": True,
+            # Uso de tokens también en streaming (último chunk)
+            "stream_usage": True,
+            # Los reintentos los resuelve la conmutación entre proveedores
+            "max_retries": settings.LLM_MAX_RETRIES,
+            "http_client": self._sync_client(spec.name),
+            "http_async_client": self._async_client(spec.name),
+        }
+        if spec.name == "cerebras":
+            return ChatCerebras(**params)
+        if spec.name == "openai":
+            from langchain_openai import ChatOpenAI
+            return ChatOpenAI(**params)
+        raise ValueError(f"Provider '{spec.name}' not supported")
+
+    def get(self,
+            provider: str = "cerebras",
+            model_name: Optional[str] = None,
+            temperature: Optional[float] = None,
+            max_tokens: Optional[int] = None,
+            timeout: Optional[float] = None) -> BaseChatModel:
+        """Cliente cacheado para un proveedor concreto"""
+        spec = self.spec(provider)
+        model = model_name or spec.model
+        temperature = settings.CEREBRAS_TEMPERATURE if temperature is None else temperature
+        max_tokens = max_tokens or settings.CEREBRAS_MAX_TOKENS
+        key = (provider, model, temperature, max_tokens, timeout)
+        llm = self._models.get(key)
+        if llm is None:
+            llm = self._build(spec, model, temperature, max_tokens, timeout)
+            self._models[key] = llm
+            logger.info("llm_provider_created", provider=provider, model=model)
+        return llm
+
+    def get_failover(self,
+                     model_name: Optional[str] = None,
+                     temperature: Optional[float] = None,
+                     max_tokens: Optional[int] = None,
+                     *,
+                     timeout: Optional[float] = None,
+                     stop: Optional[Tuple[str, ...]] = None,
+                     profile: Optional[str] = None,
+                     providers: Optional[Tuple[str, ...]] = None) -> FailoverChatModel:
+        """Modelo que conmuta entre los proveedores configurados.
+
+        `model_name` solo aplica al proveedor principal; el resto usa su
+        modelo por defecto.
+        """
+        key = ("failover", model_name, temperature, max_tokens, timeout, stop, profile, providers)
+        llm = self._models.get(key)
+        if llm is None:
+            names = list(providers or self.providers)
+            if not names:
+                raise ValueError("No LLM provider configured")
+            candidates = [
+                (name, self.get(name, model_name if i == 0 else None, temperature, max_tokens, timeout))
+                for i, name in enumerate(names)
+            ]
+            llm = FailoverChatModel(
+                candidates=candidates,
+                registry=self,
+                callbacks=[token_usage_callback],
+                profile=profile,
+                stop=list(stop) if stop else None,
+                timeout=timeout,
+            )
+            self._models[key] = llm
+        return llm
+
+    def get_profile(self, name: str) -> FailoverChatModel:
+        """Modelo para un perfil de LLM_PROFILES (classifier, answerer, ...)"""
+        profile = ModelProfile.from_settings(name)
+        return self.get_failover(
+            profile.model,
+            profile.temperature,
+            profile.max_tokens,
+            timeout=profile.timeout,
+            stop=profile.stop,
+            profile=profile.name,
+            providers=None if profile.provider == "failover" else (profile.provider,),
+        )
+
+    async def warmup(self):
+        """Abre las conexiones (TCP + TLS) de cada proveedor antes del primer turno"""
+        async def warm(spec: ProviderSpec):
+            started = time.perf_counter()
+            try:
+                await self._async_client(spec.name).get(
+                    f"{spec.base_url.rstrip('/')}/models",
+                    headers={"Authorization": f"Bearer {spec.api_key}"}
+                )
+                logger.info("llm_connection_warmed",
+                           provider=spec.name,
+                           ms=round((time.perf_counter() - started) * 1000, 1))
+            except Exception as e:
+                self.health_for(spec.name).record_failure()
+                logger.warning("llm_warmup_failed", provider=spec.name, error=str(e))
+
+        await asyncio.gather(*[warm(spec) for spec in self.providers.values()])
+
+    async def aclose(self):
+        for client in self._async_clients.values():
+            await client.aclose()
+        for client in self._sync_clients.values():
+            client.close()
+        self._async_clients.clear()
+        self._sync_clients.clear()
+        self._models.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "clients": len(self._models),
+            "providers": {name: self.health_for(name).get_stats() for name in self.providers},
+            "governors": {name: governor.get_stats() for name, governor in self._governors.items()},
+            "single_flight": self.single_flight.get_stats(),
+            "profiles": {
+                profile: {kind: stats.get_stats() for kind, stats in latencies.items()}
+                for profile, latencies in self._latency.items()
+            },
+        }
+
+# Instancia global
+provider_registry = ProviderRegistry()
+
 def get_llm_provider(
     provider: str = "cerebras",
     model_name: str | None = None,
     temperature: float | None = None,
     max_tokens: int | None = None
 ) -> BaseChatModel:
-    """Factory para obtener instancia del LLM"""
-    
-    if provider == "cerebras":
-        if not settings.CEREBRAS_API_KEY:
-            raise ValueError("CEREBRAS_API_KEY not configured")
-        
-        # Configurar parámetros base
-        base_params = {
-            "model": model_name or settings.CEREBRAS_MODEL,
-            "temperature": temperature or settings.CEREBRAS_TEMPERATURE,
-            "max_tokens": max_tokens or settings.CEREBRAS_MAX_TOKENS,
-            "api_key": settings.CEREBRAS_API_KEY,
-            "streaming": True,
-        }
-        
-        # Añadir optimizaciones específicas de Cerebras a model_kwargs
-        base_params["model_kwargs"] = {
-            "warm_tcp_connection": True,  # Reduce TTFT
-        }
-        
-        model = ChatCerebras(**base_params)
-        
-        logger.info("llm_provider_created", 
-                   provider=provider, 
-                   model=model_name or settings.CEREBRAS_MODEL)
-        
-        return model
-    
-    else:
-        raise ValueError(f"Provider '{provider}' not supported")
\ No newline at end of file
+    """Factory para obtener instancia del LLM.
+
+    `provider="failover"` devuelve un modelo que conmuta entre los
+    proveedores de LLM_PROVIDERS; cualquier otro nombre, solo ese proveedor.
+    """
+    if provider == "failover":
+        return provider_registry.get_failover(model_name, temperature, max_tokens)
+    # Un solo candidato: sin conmutación, pero gobernado por el LLMGovernor
+    return provider_registry.get_failover(
+        model_name, temperature, max_tokens, providers=(provider,)
+    )
+
+def get_profile_llm(profile: str) -> BaseChatModel:
+    """Modelo configurado para una tarea (ver LLM_PROFILES)"""
+    return provider_registry.get_profile(profile)
@@ -0,0 +1,132 @@
+import asyncio
+import copy
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Fin de stream en las colas de los suscriptores
+_END = object()
+
+class _Call:
+    """Llamada en curso compartida por varios solicitantes"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class _Stream:
+    """Stream en curso: se guarda lo emitido para los que llegan tarde"""
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.buffer: List[Any] = []
+        self.subscribers: List[asyncio.Queue] = []
+        self.final: Any = None
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue()
+        for item in self.buffer:
+            queue.put_nowait(item)
+        if self.final is not None:
+            queue.put_nowait(self.final)
+        self.subscribers.append(queue)
+        return queue
+
+    def publish(self, item: Any):
+        self.buffer.append(item)
+        for queue in self.subscribers:
+            queue.put_nowait(item)
+
+    def finish(self, item: Any):
+        self.final = item
+        for queue in self.subscribers:
+            queue.put_nowait(item)
+
+class SingleFlight:
+    """Agrupa llamadas idénticas concurrentes en una sola petición upstream.
+
+    La primera llamada con una clave lanza la petición en una tarea propia;
+    las que llegan mientras sigue en curso esperan su resultado (o reciben
+    el stream desde el principio). La petición solo se cancela cuando ya no
+    queda nadie esperándola. Cada solicitante recibe su propia copia del
+    resultado, porque LangChain anota los mensajes al devolverlos.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._streams: Dict[Hashable, _Stream] = {}
+        self.stats = {
+            "invoke": {"upstream": 0, "coalesced": 0},
+            "stream": {"upstream": 0, "coalesced": 0},
+        }
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> T:
+        """Resultado de `factory()`, compartido con las llamadas de igual clave"""
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(factory()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(self._calls, key, call))
+            self.stats["invoke"]["upstream"] += 1
+        else:
+            self.stats["invoke"]["coalesced"] += 1
+
+        call.waiters += 1
+        try:
+            result = await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if not call.waiters and not call.task.done():
+                call.task.cancel()
+        return copy.deepcopy(result)
+
+    async def stream(self, key: Hashable, factory: Callable[[], AsyncIterator[T]]) -> AsyncIterator[T]:
+        """Reparte los elementos de `factory()` entre las llamadas de igual clave"""
+        flight = self._streams.get(key)
+        if flight is None:
+            flight = _Stream()
+            self._streams[key] = flight
+            flight.task = asyncio.ensure_future(self._pump(flight, factory()))
+            flight.task.add_done_callback(lambda _: self._forget(self._streams, key, flight))
+            self.stats["stream"]["upstream"] += 1
+        else:
+            self.stats["stream"]["coalesced"] += 1
+
+        queue = flight.subscribe()
+        try:
+            while True:
+                item = await queue.get()
+                if item is _END:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield copy.deepcopy(item)
+        finally:
+            flight.subscribers.remove(queue)
+            if not flight.subscribers and not flight.task.done():
+                flight.task.cancel()
+
+    async def _pump(self, flight: _Stream, stream: AsyncIterator[Any]):
+        try:
+            async for item in stream:
+                flight.publish(item)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            flight.finish(e)
+        else:
+            flight.finish(_END)
+        finally:
+            await stream.aclose()
+
+    @staticmethod
+    def _forget(flights: Dict[Hashable, Any], key: Hashable, flight: Any):
+        # Solo si sigue siendo la misma llamada (no una posterior con igual clave)
+        if flights.get(key) is flight:
+            del flights[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._calls) + len(self._streams),
+            **{kind: dict(counts) for kind, counts in self.stats.items()},
+        }
@@ -12,7 +12,13 @@ from src.core.logging import setup_logging, get_logger
 from src.middleware.rate_limiting import RateLimitMiddleware, TokenUsageMiddleware
 from src.services.database import init_db
 from src.services.checkpointer import checkpointer_service
+from src.services.embeddings import embedding_executor
+from src.services.embedding_cache import query_embedding_cache
+from src.services.ingestion_jobs import ingestion_job_manager
+from src.services.document_processing import document_parser
+from src.llms.providers import provider_registry
 from src.agents.support_graph import create_support_graph
+from src.agents.intent_embeddings import intent_embedding_classifier
 import src.agents.support_graph as graph_module
 import uuid 
 
@@ -41,6 +47,18 @@ async def lifespan(app: FastAPI):
         graph_module.support_agent_graph = create_support_graph()
         logger.info("agent_graph_ready")
         
+        # Precalcular centroides del clasificador local
+        if settings.INTENT_CLASSIFIER_MODE == "embedding":
+            await intent_embedding_classifier.warmup()
+            logger.info("intent_classifier_ready")
+        
+        # Precalentar conexiones con los proveedores de LLM
+        await provider_registry.warmup()
+        logger.info("llm_providers_ready")
+        
+        # Workers de ingesta en segundo plano
+        await ingestion_job_manager.start()
+        
         logger.info("app_startup_complete")
         
     except Exception as e:
@@ -51,7 +69,12 @@ async def lifespan(app: FastAPI):
     
     # Cleanup
     logger.info("app_shutdown_initiated")
+    await ingestion_job_manager.stop()
     await checkpointer_service.close()
+    await provider_registry.aclose()
+    embedding_executor.close()
+    document_parser.close()
+    query_embedding_cache.close()
     logger.info("app_shutdown_complete")
 
 # Crear aplicación FastAPI
@@ -1,30 +1,36 @@
-from fastapi import Request, Response, HTTPException
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 from collections import defaultdict
 from datetime import datetime, timedelta
 import asyncio
 from src.core.config import settings
 from src.core.logging import get_logger
+from src.services.token_usage import token_usage_tracker, usage_context, seconds_until_reset
 
 logger = get_logger(__name__)
 
+def client_id_for(request: Request) -> str:
+    """Identificador del cliente (por ahora, IP)"""
+    return request.client.host if request.client else "unknown"
+
 class RateLimitMiddleware(BaseHTTPMiddleware):
     """Middleware para rate limiting"""
-    
+
     def __init__(self, app):
         super().__init__(app)
         self.requests = defaultdict(list)
-        self.daily_tokens = defaultdict(int)
         self.lock = asyncio.Lock()
-    
+
     async def dispatch(self, request: Request, call_next):
         # Solo aplicar a endpoints de API
         if not request.url.path.startswith("/api/"):
             return await call_next(request)
-        
-        # Obtener identificador (por ahora, IP)
-        client_id = request.client.host if request.client else "unknown"
-        
+
+        client_id = client_id_for(request)
+
+        # Las excepciones lanzadas en un middleware no pasan por los handlers
+        # de FastAPI: los 429 se devuelven como respuesta
         async with self.lock:
             # Limpiar requests antiguos
             now = datetime.now()
@@ -33,41 +39,52 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
                 req_time for req_time in self.requests[client_id]
                 if req_time > minute_ago
             ]
-            
+
             # Verificar límite por minuto
             if len(self.requests[client_id]) >= settings.RATE_LIMIT_REQUESTS_PER_MINUTE:
                 logger.warning("rate_limit_exceeded", client_id=client_id)
-                raise HTTPException(
+                return JSONResponse(
+                    status_code=429,
+                    content={"detail": "Rate limit exceeded. Please try again later."},
+                    headers={"Retry-After": "60"}
+                )
+
+            # Verificar presupuesto diario de tokens
+            if not token_usage_tracker.within_budget(client_id):
+                logger.warning("token_budget_exceeded",
+                              client_id=client_id,
+                              used=token_usage_tracker.used_today(client_id))
+                return JSONResponse(
                     status_code=429,
-                    detail="Rate limit exceeded. Please try again later."
+                    content={"detail": "Daily token budget exceeded."},
+                    headers={"Retry-After": str(seconds_until_reset())}
                 )
-            
+
             # Registrar request
             self.requests[client_id].append(now)
-        
+
         # Procesar request
         response: Response = await call_next(request)
-        
-        # Extraer headers de Cerebras si existen
-        if "x-ratelimit-remaining" in response.headers:
-            remaining = response.headers.get("x-ratelimit-remaining")
-            reset_time = response.headers.get("x-ratelimit-reset")
-            
-            logger.info("cerebras_rate_limit_status",
-                       client_id=client_id,
-                       remaining=remaining,
-                       reset_time=reset_time)
-            
-            # Si estamos cerca del límite, añadir warning
-            if remaining and int(remaining) < 100:
-                response.headers["X-Warning"] = "Approaching API rate limit"
-        
         return response
 
 class TokenUsageMiddleware(BaseHTTPMiddleware):
-    """Middleware para tracking de uso de tokens"""
-    
+    """Middleware para tracking de uso de tokens.
+
+    Atribuye al cliente las llamadas al LLM de la petición y devuelve en
+    cabeceras su consumo del día.
+    """
+
     async def dispatch(self, request: Request, call_next):
-        # Añadir tracking de tokens aquí si es necesario
-        response = await call_next(request)
-        return response
\ No newline at end of file
+        if not request.url.path.startswith("/api/"):
+            return await call_next(request)
+
+        client_id = client_id_for(request)
+        with usage_context(client_id=client_id):
+            response = await call_next(request)
+
+        # En streaming, el consumo del turno en curso aún no está incluido
+        response.headers["X-Tokens-Used-Today"] = str(token_usage_tracker.used_today(client_id))
+        remaining = token_usage_tracker.remaining(client_id)
+        if remaining is not None:
+            response.headers["X-Token-Budget-Remaining"] = str(remaining)
+        return response
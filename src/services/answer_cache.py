@@ -0,0 +1,131 @@
+import itertools
+import time
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Sequence, Tuple
+import numpy as np
+from src.core.config import settings
+from src.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+@dataclass
+class CachedAnswer:
+    embedding: np.ndarray
+    collection: str
+    chunk_ids: Tuple[str, ...]
+    answer: str
+    tokens: int
+    created_at: float
+
+    @property
+    def nbytes(self) -> int:
+        return self.embedding.nbytes + len(self.answer.encode("utf-8"))
+
+class SemanticAnswerCache:
+    """Caché semántica de respuestas RAG.
+
+    Una respuesta se reutiliza si la nueva consulta supera el umbral de
+    similitud coseno y la recuperación devuelve exactamente los mismos chunks.
+    """
+
+    def __init__(self, threshold: float, ttl_seconds: float, max_bytes: int):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._ids = itertools.count()
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        # (colección, chunks) -> ids de entrada; la comparación coseno solo
+        # se hace contra respuestas generadas con el mismo contexto
+        self._by_context: Dict[Tuple[str, Tuple[str, ...]], set] = defaultdict(set)
+        self.hits = 0
+        self.misses = 0
+        self.saved_tokens = 0
+        self.invalidations = 0
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        self.bytes -= entry.nbytes
+        key = (entry.collection, entry.chunk_ids)
+        self._by_context[key].discard(entry_id)
+        if not self._by_context[key]:
+            del self._by_context[key]
+
+    def lookup(self,
+               embedding: np.ndarray,
+               collection: str,
+               chunk_ids: Sequence[str]) -> Optional[CachedAnswer]:
+        """Devuelve una respuesta cacheada equivalente, si existe"""
+        now = time.monotonic()
+        best_id, best_score = None, self.threshold
+        for entry_id in list(self._by_context.get((collection, tuple(chunk_ids)), ())):
+            entry = self._entries[entry_id]
+            if now - entry.created_at > self.ttl_seconds:
+                self._remove(entry_id)
+                continue
+            score = float(entry.embedding @ embedding)
+            if score >= best_score:
+                best_id, best_score = entry_id, score
+
+        if best_id is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(best_id)
+        entry = self._entries[best_id]
+        self.hits += 1
+        self.saved_tokens += entry.tokens
+        return entry
+
+    def store(self,
+              embedding: np.ndarray,
+              collection: str,
+              chunk_ids: Sequence[str],
+              answer: str,
+              tokens: int = 0):
+        """Guarda una respuesta, expulsando las menos usadas si se excede el presupuesto"""
+        entry = CachedAnswer(
+            embedding=np.asarray(embedding, dtype=np.float32),
+            collection=collection,
+            chunk_ids=tuple(chunk_ids),
+            answer=answer,
+            tokens=tokens,
+            created_at=time.monotonic(),
+        )
+        entry_id = next(self._ids)
+        self._entries[entry_id] = entry
+        self._by_context[(collection, entry.chunk_ids)].add(entry_id)
+        self.bytes += entry.nbytes
+        while self.bytes > self.max_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
+
+    def invalidate_collection(self, collection: str):
+        """Descarta las respuestas basadas en una colección modificada"""
+        stale = [i for i, entry in self._entries.items() if entry.collection == collection]
+        for entry_id in stale:
+            self._remove(entry_id)
+        if stale:
+            self.invalidations += len(stale)
+            logger.info("answer_cache_invalidated", collection=collection, entries=len(stale))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Tasa de aciertos y tokens ahorrados"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "saved_tokens": self.saved_tokens,
+            "invalidations": self.invalidations,
+        }
+
+# Instancia global
+answer_cache = SemanticAnswerCache(
+    threshold=settings.ANSWER_CACHE_SIMILARITY,
+    ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+    max_bytes=settings.ANSWER_CACHE_MAX_BYTES,
+)
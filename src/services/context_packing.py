@@ -0,0 +1,124 @@
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, List
+from langchain_core.documents import Document
+from src.core.config import settings
+from src.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n+")
+
+@lru_cache(maxsize=1)
+def get_token_counter() -> Callable[[str], int]:
+    """Contador de tokens con un tokenizer local (sin llamadas de red).
+
+    Si el tokenizer no está disponible se usa una estimación de ~4
+    caracteres por token.
+    """
+    try:
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(settings.CONTEXT_TOKENIZER)
+        return lambda text: len(tokenizer.encode(text, add_special_tokens=False))
+    except Exception as e:
+        logger.warning("context_tokenizer_unavailable",
+                      tokenizer=settings.CONTEXT_TOKENIZER,
+                      error=str(e))
+        return lambda text: (len(text) + 3) // 4
+
+def merge_overlap(left: str, right: str, max_overlap: int, min_overlap: int = 20) -> str:
+    """Une dos chunks consecutivos eliminando el solapamiento del splitter"""
+    limit = min(max_overlap, len(left), len(right))
+    for size in range(limit, min_overlap - 1, -1):
+        if left.endswith(right[:size]):
+            return left + right[size:]
+    return left + "\n" + right
+
+class ContextPacker:
+    """Empaqueta los chunks recuperados en un contexto compacto para el LLM.
+
+    Los chunks contiguos de un mismo documento se fusionan (sin repetir el
+    solapamiento) y el resultado se recorta a un presupuesto de tokens,
+    descartando primero el texto de las fuentes peor clasificadas.
+    """
+
+    def __init__(self, max_tokens: int, max_overlap: int = 200):
+        self.max_tokens = max_tokens
+        self.max_overlap = max_overlap
+        # Métricas
+        self.packed = 0
+        self.trimmed = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+
+    def _group(self, documents: List[Document]) -> List[Dict[str, Any]]:
+        """Agrupa por documento de origen conservando el orden de relevancia"""
+        groups: Dict[str, List[Document]] = {}
+        for doc in documents:
+            groups.setdefault(doc.metadata.get("source", "Unknown"), []).append(doc)
+
+        sections = []
+        for source, docs in groups.items():
+            docs = sorted(docs, key=lambda d: d.metadata.get("chunk_index", 0))
+            text = docs[0].page_content.strip()
+            previous = docs[0].metadata.get("chunk_index")
+            for doc in docs[1:]:
+                index = doc.metadata.get("chunk_index")
+                content = doc.page_content.strip()
+                if previous is not None and index == previous + 1:
+                    text = merge_overlap(text, content, self.max_overlap)
+                else:
+                    text = f"{text}\n[...]\n{content}"
+                previous = index
+            sections.append({"source": source, "text": text})
+        return sections
+
+    def pack(self, documents: List[Document]) -> str:
+        """Contexto formateado dentro del presupuesto de tokens"""
+        count_tokens = get_token_counter()
+        self.packed += 1
+        self.tokens_in += sum(count_tokens(doc.page_content) for doc in documents)
+
+        parts = []
+        budget = self.max_tokens
+        for i, section in enumerate(self._group(documents), 1):
+            header = f"[Fuente {i}: {section['source']}]\n"
+            available = budget - count_tokens(header)
+            text = section["text"]
+            tokens = count_tokens(text)
+            if tokens > available:
+                # Recortar por frases hasta caber en lo que queda
+                self.trimmed += 1
+                kept = ""
+                for sentence in _SENTENCE_BOUNDARY.split(text):
+                    candidate = f"{kept} {sentence}" if kept else sentence
+                    cost = count_tokens(candidate)
+                    if cost > available:
+                        break
+                    kept = candidate
+                if kept:
+                    parts.append(header + kept)
+                # Presupuesto agotado: las fuentes restantes se descartan
+                break
+            parts.append(header + text)
+            budget = available - tokens
+
+        context = "\n\n---\n\n".join(parts)
+        self.tokens_out += count_tokens(context)
+        return context
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "max_tokens": self.max_tokens,
+            "packed": self.packed,
+            "trimmed": self.trimmed,
+            "tokens_in": self.tokens_in,
+            "tokens_out": self.tokens_out,
+            "reduction": round(1 - self.tokens_out / self.tokens_in, 4) if self.tokens_in else 0.0,
+        }
+
+# Instancia global
+context_packer = ContextPacker(
+    max_tokens=settings.CONTEXT_MAX_TOKENS,
+    max_overlap=settings.CONTEXT_MAX_OVERLAP,
+)
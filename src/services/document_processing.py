@@ -0,0 +1,200 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional
+from langchain_community.document_loaders import UnstructuredMarkdownLoader
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from pypdf import PdfReader
+from src.core.config import settings
+from src.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+SUPPORTED_EXTENSIONS = (".pdf", ".md")
+
+def count_pdf_pages(file_path: str) -> int:
+    return len(PdfReader(file_path).pages)
+
+def load_pdf_pages(file_path: str,
+                   start: int = 0,
+                   stop: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Extrae el texto de las páginas [start, stop) de un PDF"""
+    reader = PdfReader(file_path)
+    stop = len(reader.pages) if stop is None else min(stop, len(reader.pages))
+    return [
+        {"text": reader.pages[i].extract_text(), "metadata": {"source": file_path, "page": i}}
+        for i in range(start, stop)
+    ]
+
+def split_parts(parts: List[Dict[str, Any]],
+                chunk_size: int = 1000,
+                chunk_overlap: int = 200) -> List[Dict[str, Any]]:
+    """Divide cada parte (página o documento) en chunks"""
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        separators=["\n\n", "\n", ". ", " ", ""]
+    )
+    chunks = []
+    for part in parts:
+        for text in text_splitter.split_text(part["text"]):
+            chunks.append({"text": text, "metadata": dict(part["metadata"])})
+    return chunks
+
+def split_pdf_pages(file_path: str,
+                    start: int,
+                    stop: Optional[int],
+                    chunk_size: int = 1000,
+                    chunk_overlap: int = 200) -> List[Dict[str, Any]]:
+    """Carga y divide un rango de páginas (unidad de trabajo del pool)"""
+    return split_parts(load_pdf_pages(file_path, start, stop), chunk_size, chunk_overlap)
+
+def split_markdown(file_path: str,
+                   chunk_size: int = 1000,
+                   chunk_overlap: int = 200) -> List[Dict[str, Any]]:
+    parts = [
+        {"text": doc.page_content, "metadata": dict(doc.metadata)}
+        for doc in UnstructuredMarkdownLoader(file_path).load()
+    ]
+    return split_parts(parts, chunk_size, chunk_overlap)
+
+def number_chunks(chunks: List[Dict[str, Any]], source: str) -> List[Dict[str, Any]]:
+    """Añade source, chunk_index y total_chunks a los chunks de un documento"""
+    for i, chunk in enumerate(chunks):
+        chunk["metadata"].update({
+            "source": source,
+            "chunk_index": i,
+            "total_chunks": len(chunks)
+        })
+    return chunks
+
+def load_and_split(file_path: str,
+                   chunk_size: int = 1000,
+                   chunk_overlap: int = 200,
+                   source: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Carga un documento y lo divide en chunks.
+
+    Función de nivel de módulo (picklable) para poder ejecutarse en un pool
+    de procesos. Devuelve dicts {"text", "metadata"}.
+    """
+    # Cargar documento según tipo
+    if file_path.endswith('.pdf'):
+        chunks = split_pdf_pages(file_path, 0, None, chunk_size, chunk_overlap)
+    elif file_path.endswith('.md'):
+        chunks = split_markdown(file_path, chunk_size, chunk_overlap)
+    else:
+        raise ValueError(f"Unsupported file type: {file_path}")
+    return number_chunks(chunks, source or file_path)
+
+def _limit_worker_memory(max_bytes: int):
+    """Inicializador del worker: limita su espacio de direcciones"""
+    if max_bytes <= 0:
+        return
+    try:
+        import resource
+    except ImportError:  # Windows
+        return
+    resource.setrlimit(resource.RLIMIT_AS, (max_bytes, max_bytes))
+
+class DocumentParser:
+    """Parseo y división de documentos en un pool de procesos dedicado.
+
+    El trabajo CPU-intensivo no comparte GIL con el proceso de la API; los
+    PDFs se reparten por rangos de páginas y solo vuelven los chunks.
+    Cada worker tiene un límite de memoria: un documento patológico falla
+    su trabajo en vez de tumbar la API.
+    """
+
+    def __init__(self,
+                 workers: int = 2,
+                 pages_per_task: int = 20,
+                 max_memory_bytes: int = 0,
+                 max_tasks_per_child: Optional[int] = None):
+        self.workers = workers
+        self.pages_per_task = pages_per_task
+        self.max_memory_bytes = max_memory_bytes
+        self.max_tasks_per_child = max_tasks_per_child
+        self._pool: Optional[ProcessPoolExecutor] = None
+        # Métricas
+        self.documents = 0
+        self.tasks = 0
+        self.failures = 0
+        self.pool_restarts = 0
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: los workers no heredan el modelo de embeddings ni los
+            # hilos del proceso de la API
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_limit_worker_memory,
+                initargs=(self.max_memory_bytes,),
+                max_tasks_per_child=self.max_tasks_per_child,
+            )
+        return self._pool
+
+    async def _submit(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        self.tasks += 1
+        try:
+            return await loop.run_in_executor(self._get_pool(), fn, *args)
+        except BrokenProcessPool:
+            # Un worker murió (p.ej. por el límite de memoria): recrear el pool
+            self.pool_restarts += 1
+            self.close()
+            raise
+
+    async def parse(self,
+                    file_path: str,
+                    chunk_size: int = 1000,
+                    chunk_overlap: int = 200,
+                    source: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Chunks de un documento, calculados fuera del proceso de la API"""
+        try:
+            if file_path.endswith('.pdf'):
+                pages = await self._submit(count_pdf_pages, file_path)
+                ranges = [
+                    (start, min(start + self.pages_per_task, pages))
+                    for start in range(0, pages, self.pages_per_task)
+                ]
+                results = await asyncio.gather(*[
+                    self._submit(split_pdf_pages, file_path, start, stop,
+                                 chunk_size, chunk_overlap)
+                    for start, stop in ranges
+                ])
+                chunks = [chunk for result in results for chunk in result]
+            elif file_path.endswith('.md'):
+                chunks = await self._submit(split_markdown, file_path, chunk_size, chunk_overlap)
+            else:
+                raise ValueError(f"Unsupported file type: {file_path}")
+        except Exception:
+            self.failures += 1
+            raise
+
+        self.documents += 1
+        return number_chunks(chunks, source or file_path)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "pages_per_task": self.pages_per_task,
+            "documents": self.documents,
+            "tasks": self.tasks,
+            "failures": self.failures,
+            "pool_restarts": self.pool_restarts,
+        }
+
+# Instancia global
+document_parser = DocumentParser(
+    workers=settings.PARSER_WORKERS,
+    pages_per_task=settings.PARSER_PDF_PAGES_PER_TASK,
+    max_memory_bytes=settings.PARSER_MAX_MEMORY_MB * 1024 * 1024,
+    max_tasks_per_child=settings.PARSER_MAX_TASKS_PER_CHILD,
+)
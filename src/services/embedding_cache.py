@@ -0,0 +1,103 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Optional
+import numpy as np
+from src.services.embeddings import embedding_executor
+from src.utils.cache import LRUCache
+from src.utils.text import normalize_text
+from src.core.config import settings
+from src.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+class DiskEmbeddingStore:
+    """Nivel persistente (SQLite) para que los vectores sobrevivan reinicios"""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS query_embeddings "
+            "(key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT vector FROM query_embeddings WHERE key = ?", (key,)
+            ).fetchone()
+        return np.frombuffer(row[0], dtype=np.float32) if row else None
+
+    def put(self, key: str, vector: np.ndarray):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO query_embeddings (key, vector) VALUES (?, ?)",
+                (key, vector.astype(np.float32).tobytes())
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class QueryEmbeddingCache:
+    """Caché de embeddings de consultas delante del EmbeddingExecutor"""
+
+    def __init__(self, max_bytes: int, disk_path: Optional[str] = None):
+        # El límite efectivo es el de bytes (un vector MiniLM ocupa 1536 B)
+        self.memory: LRUCache[np.ndarray] = LRUCache(
+            max_entries=max(1, max_bytes // 512),
+            max_bytes=max_bytes,
+            sizeof=lambda vector: vector.nbytes,
+        )
+        self.disk = DiskEmbeddingStore(disk_path) if disk_path else None
+        self.disk_hits = 0
+
+    @staticmethod
+    def key(query: str) -> str:
+        return hashlib.sha1(normalize_text(query).encode("utf-8")).hexdigest()
+
+    async def embed_query(self, query: str) -> np.ndarray:
+        """Devuelve el embedding (float32) de la consulta, usando la caché"""
+        key = self.key(query)
+        vector = self.memory.get(key)
+        if vector is not None:
+            return vector
+
+        if self.disk is not None:
+            vector = await asyncio.to_thread(self.disk.get, key)
+            if vector is not None:
+                self.disk_hits += 1
+                self.memory.set(key, vector)
+                return vector
+
+        vector = np.asarray(await embedding_executor.embed_query(query), dtype=np.float32)
+        vector.setflags(write=False)
+        self.memory.set(key, vector)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.put, key, vector)
+        return vector
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Métricas de aciertos en memoria y en disco"""
+        stats = self.memory.get_stats()
+        stats["max_bytes"] = self.memory.max_bytes
+        stats["disk_enabled"] = self.disk is not None
+        stats["disk_hits"] = self.disk_hits
+        return stats
+
+# Instancia global
+query_embedding_cache = QueryEmbeddingCache(
+    max_bytes=settings.EMBEDDING_CACHE_MAX_BYTES,
+    disk_path=settings.EMBEDDING_CACHE_PATH,
+)
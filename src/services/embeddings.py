@@ -0,0 +1,171 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from langchain_huggingface import HuggingFaceEmbeddings
+from src.core.config import settings
+from src.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+@lru_cache(maxsize=1)
+def get_embedding_model():
+    """Carga el modelo de embeddings (singleton)"""
+    logger.info("loading_embedding_model")
+    return HuggingFaceEmbeddings(
+        model_name="sentence-transformers/all-MiniLM-L6-v2",
+        model_kwargs={'device': 'cpu'},
+        encode_kwargs={'normalize_embeddings': True}
+    )
+
+class _LoopBatcher:
+    """Cola y tarea de micro-lotes ligadas a un event loop"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_queue: int, workers: int):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.slots = asyncio.Semaphore(workers)
+        self.task: Optional[asyncio.Task] = None
+
+class EmbeddingExecutor:
+    """Ejecuta el modelo de embeddings fuera del event loop.
+
+    Las consultas concurrentes se acumulan durante una ventana corta y se
+    resuelven con una única pasada del modelo en un pool de hilos dedicado
+    (la inferencia de torch libera el GIL). Los lotes grandes de la ingesta
+    van a otro pool, así que una subida no retrasa los embeddings de las
+    consultas del chat. Cada event loop que lo usa
+    (el de la API y el del puente síncrono de los retrievers) tiene su
+    propia cola y batcher.
+    """
+
+    def __init__(self,
+                 max_batch_size: int = 32,
+                 batch_window_ms: float = 3.0,
+                 max_queue: int = 1024,
+                 workers: int = 1,
+                 bulk_workers: int = 1):
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window_ms / 1000
+        self.max_queue = max_queue
+        self.workers = workers
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="embedding")
+        self._bulk_pool = ThreadPoolExecutor(max_workers=bulk_workers,
+                                             thread_name_prefix="embedding-bulk")
+        self._batchers: Dict[asyncio.AbstractEventLoop, _LoopBatcher] = {}
+        self._batchers_lock = threading.Lock()
+        # Métricas
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _ensure_started(self) -> _LoopBatcher:
+        loop = asyncio.get_running_loop()
+        batcher = self._batchers.get(loop)
+        if batcher is None or batcher.task.done():
+            with self._batchers_lock:
+                # Olvidar los loops que ya se cerraron
+                for closed in [other for other in list(self._batchers) if other.is_closed()]:
+                    del self._batchers[closed]
+                batcher = _LoopBatcher(loop, self.max_queue, self.workers)
+                batcher.task = loop.create_task(self._run(batcher))
+                self._batchers[loop] = batcher
+        return batcher
+
+    async def embed_query(self, text: str) -> List[float]:
+        """Embedding de una consulta (agrupado en micro-lotes)"""
+        batcher = self._ensure_started()
+        future = batcher.loop.create_future()
+        # Cola acotada: si está llena, el llamante espera (back-pressure)
+        await batcher.queue.put((text, future, time.perf_counter()))
+        return await future
+
+    async def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embeddings de un lote grande (ingesta): una sola llamada al pool de ingesta"""
+        if not texts:
+            return []
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._bulk_pool, get_embedding_model().embed_documents, texts
+        )
+
+    async def _run(self, batcher: _LoopBatcher):
+        while True:
+            batch = [await batcher.queue.get()]
+            if self.batch_window > 0:
+                await asyncio.sleep(self.batch_window)
+            while len(batch) < self.max_batch_size and not batcher.queue.empty():
+                batch.append(batcher.queue.get_nowait())
+
+            # Descartar llamantes que ya se cancelaron
+            batch = [item for item in batch if not item[1].done()]
+            if not batch:
+                continue
+
+            await batcher.slots.acquire()
+            batcher.loop.create_task(self._run_batch(batcher, batch))
+
+    async def _run_batch(self,
+                         batcher: _LoopBatcher,
+                         batch: List[Tuple[str, asyncio.Future, float]]):
+        try:
+            started = time.perf_counter()
+            for _, _, enqueued in batch:
+                wait = started - enqueued
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+            self.batches += 1
+            self.items += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+
+            try:
+                vectors = await batcher.loop.run_in_executor(
+                    self._pool,
+                    get_embedding_model().embed_documents,
+                    [text for text, _, _ in batch]
+                )
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+            for (_, future, _), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+        finally:
+            batcher.slots.release()
+
+    def close(self):
+        """Detiene los batchers y los pools de hilos"""
+        for batcher in list(self._batchers.values()):
+            if not batcher.loop.is_closed():
+                batcher.loop.call_soon_threadsafe(batcher.task.cancel)
+        self._batchers.clear()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._bulk_pool.shutdown(wait=False, cancel_futures=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Métricas de tamaño de lote, profundidad de cola y espera"""
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "queue_depth": sum(batcher.queue.qsize() for batcher in list(self._batchers.values())),
+            "avg_wait_ms": round(1000 * self.total_wait / self.items, 3) if self.items else 0.0,
+            "max_wait_ms": round(1000 * self.max_wait, 3),
+        }
+
+# Instancia global
+embedding_executor = EmbeddingExecutor(
+    max_batch_size=settings.EMBEDDING_MAX_BATCH_SIZE,
+    batch_window_ms=settings.EMBEDDING_BATCH_WINDOW_MS,
+    max_queue=settings.EMBEDDING_MAX_QUEUE,
+    workers=settings.EMBEDDING_WORKERS,
+    bulk_workers=settings.EMBEDDING_BULK_WORKERS,
+)
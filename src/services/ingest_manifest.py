@@ -0,0 +1,89 @@
+import asyncio
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional
+from src.core.config import settings
+
+def file_digest(file_path: str) -> str:
+    """SHA-256 del contenido de un archivo"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def chunk_id(source: str, text: str) -> str:
+    """Id de chunk derivado de su contenido (y del documento de origen)"""
+    return hashlib.sha256(f"{source}\0{text}".encode("utf-8")).hexdigest()[:32]
+
+# Metadatos que dependen de la posición del chunk en el documento (no de su texto)
+POSITION_FIELDS = ("chunk_index", "total_chunks", "page")
+
+def chunk_position(metadata: Dict[str, Any]) -> List[Any]:
+    """Campos posicionales de un chunk, en el orden de POSITION_FIELDS"""
+    return [metadata.get(name) for name in POSITION_FIELDS]
+
+class IngestManifest:
+    """Manifiesto por colección: digest de cada archivo, los ids de sus chunks
+    y la posición de cada uno (para detectar chunks conservados que se movieron)"""
+
+    def __init__(self, base_dir: str):
+        self.base_dir = base_dir
+        self._manifests: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._lock = asyncio.Lock()
+
+    def _path(self, collection_name: str) -> str:
+        return os.path.join(self.base_dir, f"{collection_name}.json")
+
+    def _load(self, collection_name: str) -> Dict[str, Dict[str, Any]]:
+        manifest = self._manifests.get(collection_name)
+        if manifest is None:
+            path = self._path(collection_name)
+            manifest = {}
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    manifest = json.load(f)
+            self._manifests[collection_name] = manifest
+        return manifest
+
+    def get(self, collection_name: str, source: str) -> Optional[Dict[str, Any]]:
+        """Entrada {"digest", "chunk_ids", "positions"} de un archivo, si se ingestó antes"""
+        return self._load(collection_name).get(source)
+
+    def _save(self, collection_name: str, data: Dict[str, Any]):
+        os.makedirs(self.base_dir, exist_ok=True)
+        path = self._path(collection_name)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(path + ".tmp", path)
+
+    @staticmethod
+    def entry(digest: str,
+              chunk_ids: List[str],
+              positions: Optional[List[List[Any]]] = None) -> Dict[str, Any]:
+        """Entrada de manifiesto de un archivo"""
+        entry = {"digest": digest, "chunk_ids": chunk_ids}
+        if positions is not None:
+            entry["positions"] = positions
+        return entry
+
+    async def set(self,
+                  collection_name: str,
+                  source: str,
+                  digest: str,
+                  chunk_ids: List[str],
+                  positions: Optional[List[List[Any]]] = None):
+        await self.set_many(collection_name, {source: self.entry(digest, chunk_ids, positions)})
+
+    async def set_many(self, collection_name: str, entries: Dict[str, Dict[str, Any]]):
+        """Registra varios archivos con una sola escritura del manifiesto"""
+        if not entries:
+            return
+        async with self._lock:
+            manifest = self._load(collection_name)
+            manifest.update(entries)
+            await asyncio.to_thread(self._save, collection_name, dict(manifest))
+
+# Instancia global
+ingest_manifest = IngestManifest(settings.INGEST_MANIFEST_DIR)
@@ -0,0 +1,143 @@
+import asyncio
+import os
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from src.services.vector_store import vector_store_service
+from src.core.config import settings
+from src.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+class IngestionQueueFull(Exception):
+    """La cola de ingesta está llena"""
+
+@dataclass
+class IngestionJob:
+    id: str
+    filename: str
+    collection: str
+    file_path: str
+    status: str = "queued"  # queued | running | completed | failed
+    stage: Optional[str] = None
+    chunks_total: Optional[int] = None
+    chunks_added: Optional[int] = None
+    chunks_removed: Optional[int] = None
+    error: Optional[str] = None
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data.pop("file_path")
+        return data
+
+class IngestionJobManager:
+    """Cola acotada de trabajos de ingesta con concurrencia limitada"""
+
+    def __init__(self, max_concurrent: int, max_queued: int, history: int = 1000):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.history = history
+        self.jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+
+    async def start(self):
+        """Arranca los workers (en el startup de la app)"""
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._workers = [
+            asyncio.create_task(self._worker(i)) for i in range(self.max_concurrent)
+        ]
+        logger.info("ingestion_workers_started", workers=self.max_concurrent)
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, file_path: str, filename: str, collection: str) -> IngestionJob:
+        """Encola un trabajo; lanza IngestionQueueFull si no hay hueco"""
+        if self._queue is None:
+            raise RuntimeError("Ingestion job manager not started")
+        job = IngestionJob(
+            id=uuid.uuid4().hex,
+            filename=filename,
+            collection=collection,
+            file_path=file_path,
+        )
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise IngestionQueueFull()
+
+        self.jobs[job.id] = job
+        # Conservar solo el historial reciente
+        while len(self.jobs) > self.history:
+            self.jobs.popitem(last=False)
+        logger.info("ingestion_job_queued", job_id=job.id, file=filename)
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        return self.jobs.get(job_id)
+
+    async def _worker(self, worker_id: int):
+        while True:
+            job = await self._queue.get()
+            job.status = "running"
+            job.started_at = datetime.utcnow()
+
+            def on_progress(stage: str, **counts):
+                job.stage = stage
+                if "chunks_total" in counts:
+                    job.chunks_total = counts["chunks_total"]
+
+            try:
+                result = await vector_store_service.ingest_document(
+                    file_path=job.file_path,
+                    collection_name=job.collection,
+                    source=job.filename,
+                    progress=on_progress
+                )
+                if result["status"] == "error":
+                    job.status = "failed"
+                    job.error = result["message"]
+                else:
+                    job.status = "completed"
+                    job.chunks_total = result["total_chunks"]
+                    job.chunks_added = result["chunks_added"]
+                    job.chunks_removed = result["chunks_removed"]
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e)
+            finally:
+                job.finished_at = datetime.utcnow()
+                # Limpiar archivo temporal
+                if os.path.exists(job.file_path):
+                    os.remove(job.file_path)
+                self._queue.task_done()
+                logger.info("ingestion_job_finished",
+                           job_id=job.id,
+                           worker=worker_id,
+                           status=job.status,
+                           chunks_added=job.chunks_added)
+
+    def get_stats(self) -> Dict[str, Any]:
+        statuses: Dict[str, int] = {}
+        for job in self.jobs.values():
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_concurrent": self.max_concurrent,
+            "jobs": statuses,
+        }
+
+# Instancia global
+ingestion_job_manager = IngestionJobManager(
+    max_concurrent=settings.INGEST_MAX_CONCURRENT_JOBS,
+    max_queued=settings.INGEST_MAX_QUEUED_JOBS,
+)
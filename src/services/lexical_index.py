@@ -0,0 +1,183 @@
+import asyncio
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from src.utils.text import normalize_text
+from src.core.config import settings
+from src.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Términos que no aportan al ranking léxico (tras normalizar tildes)
+SPANISH_STOPWORDS = frozenset("""
+a al algo como con cual cuando de del donde el en entre era es esta este esto
+ha hay la las le les lo los me mi mis mas muy no nos o para pero por que se
+si sin sobre su sus te tu un una uno unos unas y ya yo
+""".split())
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+
+def tokenize(text: str) -> List[str]:
+    """Tokens normalizados; conserva códigos como 'err-404' o 'v2.1'"""
+    return [
+        token for token in _TOKEN.findall(normalize_text(text))
+        if token not in SPANISH_STOPWORDS
+    ]
+
+class BM25Index:
+    """Índice invertido con puntuación BM25 y actualizaciones incrementales.
+
+    Las búsquedas de `search_sync` llegan desde otro hilo mientras el loop
+    principal actualiza el índice: un lock protege los diccionarios.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self.postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self.doc_terms: Dict[str, Counter] = {}
+        self.doc_length: Dict[str, int] = {}
+        self.docs: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def add(self, ids: Sequence[str], texts: Sequence[str], metadatas: Sequence[Dict[str, Any]]):
+        """Añade o reemplaza documentos"""
+        # Tokenizar fuera del lock: es la parte cara
+        tokenized = [Counter(tokenize(text)) for text in texts]
+        with self._lock:
+            self.remove([doc_id for doc_id in ids if doc_id in self.docs])
+            for doc_id, text, metadata, terms in zip(ids, texts, metadatas, tokenized):
+                self.doc_terms[doc_id] = terms
+                self.doc_length[doc_id] = sum(terms.values())
+                self.docs[doc_id] = (text, metadata)
+                self.total_length += self.doc_length[doc_id]
+                for term, tf in terms.items():
+                    self.postings[term][doc_id] = tf
+
+    def remove(self, ids: Iterable[str]):
+        """Elimina documentos del índice"""
+        with self._lock:
+            for doc_id in ids:
+                terms = self.doc_terms.pop(doc_id, None)
+                if terms is None:
+                    continue
+                self.docs.pop(doc_id, None)
+                self.total_length -= self.doc_length.pop(doc_id)
+                for term in terms:
+                    self.postings[term].pop(doc_id, None)
+                    if not self.postings[term]:
+                        del self.postings[term]
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """Top-k documentos por BM25"""
+        query_terms = set(tokenize(query))
+        scores: Dict[str, float] = defaultdict(float)
+        with self._lock:
+            n_docs = len(self.docs)
+            if not n_docs:
+                return []
+            avg_length = self.total_length / n_docs
+
+            for term in query_terms:
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_length[doc_id] / avg_length)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def get(self, doc_id: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        with self._lock:
+            return self.docs.get(doc_id)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"docs": {doc_id: [text, meta] for doc_id, (text, meta) in self.docs.items()}}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "BM25Index":
+        index = cls()
+        docs = data.get("docs", {})
+        index.add(list(docs), [d[0] for d in docs.values()], [d[1] for d in docs.values()])
+        return index
+
+class LexicalIndexService:
+    """Índices BM25 por colección, persistidos junto a la colección vectorial"""
+
+    def __init__(self, base_dir: str):
+        self.base_dir = base_dir
+        self._indexes: Dict[str, BM25Index] = {}
+        self._lock = asyncio.Lock()
+        # La carga perezosa también ocurre desde el hilo de `search_sync`
+        self._load_lock = threading.Lock()
+
+    def _path(self, collection_name: str) -> str:
+        return os.path.join(self.base_dir, f"{collection_name}.json")
+
+    def get_index(self, collection_name: str) -> BM25Index:
+        index = self._indexes.get(collection_name)
+        if index is None:
+            with self._load_lock:
+                index = self._indexes.get(collection_name)
+                if index is None:
+                    path = self._path(collection_name)
+                    if os.path.exists(path):
+                        with open(path, encoding="utf-8") as f:
+                            index = BM25Index.from_dict(json.load(f))
+                    else:
+                        index = BM25Index()
+                    self._indexes[collection_name] = index
+        return index
+
+    def _save(self, collection_name: str, data: Dict[str, Any]):
+        os.makedirs(self.base_dir, exist_ok=True)
+        path = self._path(collection_name)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+
+    async def update(self,
+                     collection_name: str,
+                     add_ids: Sequence[str] = (),
+                     texts: Sequence[str] = (),
+                     metadatas: Sequence[Dict[str, Any]] = (),
+                     remove_ids: Sequence[str] = ()):
+        """Actualiza el índice de una colección de forma incremental"""
+        async with self._lock:
+            index = self.get_index(collection_name)
+            index.remove(remove_ids)
+            index.add(add_ids, texts, metadatas)
+            await asyncio.to_thread(self._save, collection_name, index.to_dict())
+        logger.info("lexical_index_updated",
+                   collection=collection_name,
+                   added=len(add_ids),
+                   removed=len(remove_ids),
+                   documents=len(index))
+
+    def search(self, collection_name: str, query: str, k: int) -> List[Tuple[str, float]]:
+        return self.get_index(collection_name).search(query, k)
+
+    def get_document(self, collection_name: str, doc_id: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        return self.get_index(collection_name).get(doc_id)
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fusiona rankings: score(d) = sum(1 / (k + rank))"""
+    scores: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, 1):
+            scores[doc_id] += 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+# Instancia global
+lexical_index_service = LexicalIndexService(settings.LEXICAL_INDEX_DIR)
@@ -0,0 +1,77 @@
+from dataclasses import dataclass, fields
+from typing import Any, List, Optional, Sequence
+import numpy as np
+from src.core.config import settings
+
+@dataclass(frozen=True)
+class RetrievalProfile:
+    """Parámetros de recuperación de una colección"""
+    mmr: bool = True
+    fetch_k: int = 20
+    lambda_mult: float = 0.7
+    max_per_source: Optional[int] = None
+
+def retrieval_profile(collection_name: str) -> RetrievalProfile:
+    """Perfil por defecto con los overrides de RETRIEVAL_PROFILES[colección]"""
+    defaults = RetrievalProfile(
+        mmr=settings.RERANK_ENABLED,
+        fetch_k=settings.RERANK_FETCH_K,
+        lambda_mult=settings.RERANK_LAMBDA,
+        max_per_source=settings.RERANK_MAX_PER_SOURCE,
+    )
+    overrides = settings.RETRIEVAL_PROFILES.get(collection_name, {})
+    known = {f.name for f in fields(RetrievalProfile)}
+    return RetrievalProfile(**{
+        **defaults.__dict__,
+        **{key: value for key, value in overrides.items() if key in known},
+    })
+
+def mmr_select(relevance: np.ndarray,
+               embeddings: np.ndarray,
+               k: int,
+               lambda_mult: float = 0.7,
+               groups: Optional[Sequence[Any]] = None,
+               max_per_group: Optional[int] = None) -> List[int]:
+    """Selección por máxima relevancia marginal (MMR).
+
+    `relevance` es la puntuación de cada candidato frente a la consulta y
+    `embeddings` sus vectores normalizados (N x d); una fila de ceros
+    equivale a un candidato sin redundancia conocida. Con `max_per_group`
+    no se eligen más de ese número de candidatos del mismo grupo (fuente).
+    Devuelve las posiciones elegidas, en orden de selección.
+    """
+    n = len(relevance)
+    k = min(k, n)
+    if k <= 0:
+        return []
+
+    relevance = np.asarray(relevance, dtype=np.float32)
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    pairwise = embeddings @ embeddings.T
+    # Máxima similitud de cada candidato con los ya elegidos
+    redundancy = np.zeros(n, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+
+    if groups is not None and max_per_group is not None:
+        _, group_ids = np.unique([str(group) for group in groups], return_inverse=True)
+        group_counts = np.zeros(group_ids.max() + 1, dtype=np.int32)
+    else:
+        group_ids = None
+
+    selected: List[int] = []
+    for _ in range(k):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        if not np.isfinite(scores[best]):
+            break
+        selected.append(best)
+        available[best] = False
+        np.maximum(redundancy, pairwise[best], out=redundancy)
+
+        if group_ids is not None:
+            group = group_ids[best]
+            group_counts[group] += 1
+            if group_counts[group] >= max_per_group:
+                available[group_ids == group] = False
+    return selected
@@ -0,0 +1,203 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, Mapping, Optional, Tuple
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from src.core.config import settings
+from src.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Cliente para las llamadas sin petición HTTP (ingesta, scripts...)
+INTERNAL_CLIENT = "internal"
+
+_client_id: ContextVar[str] = ContextVar("usage_client_id", default=INTERNAL_CLIENT)
+_session_id: ContextVar[Optional[str]] = ContextVar("usage_session_id", default=None)
+
+@contextmanager
+def usage_context(client_id: Optional[str] = None, session_id: Optional[str] = None):
+    """Atribuye el uso de tokens de las llamadas al LLM de este contexto.
+
+    Solo cambia los valores que se pasan; las tareas creadas dentro del
+    bloque los heredan.
+    """
+    tokens = []
+    if client_id is not None:
+        tokens.append((_client_id, _client_id.set(client_id)))
+    if session_id is not None:
+        tokens.append((_session_id, _session_id.set(session_id)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+@dataclass
+class TokenUsage:
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    calls: int = 0
+
+    def add(self, prompt: int, completion: int, total: int):
+        self.prompt_tokens += prompt
+        self.completion_tokens += completion
+        self.total_tokens += total
+        self.calls += 1
+
+def _today() -> str:
+    return datetime.utcnow().date().isoformat()
+
+def seconds_until_reset() -> int:
+    """Segundos hasta la medianoche UTC, cuando se reinician los presupuestos"""
+    now = datetime.utcnow()
+    tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    return int((tomorrow - now).total_seconds()) + 1
+
+def extract_usage(response: LLMResult) -> Optional[Tuple[int, int, int]]:
+    """(prompt, completion, total) de una respuesta, si el proveedor lo informa"""
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return usage["input_tokens"], usage["output_tokens"], usage["total_tokens"]
+    usage = (response.llm_output or {}).get("token_usage")
+    if usage:
+        prompt = usage.get("prompt_tokens", 0)
+        completion = usage.get("completion_tokens", 0)
+        return prompt, completion, usage.get("total_tokens", prompt + completion)
+    return None
+
+class TokenUsageTracker:
+    """Uso real de tokens por cliente (día UTC) y por sesión.
+
+    También guarda las últimas cabeceras x-ratelimit-* de cada proveedor,
+    para ver cuánto margen queda en la cuota upstream.
+    """
+
+    def __init__(self, daily_budget: int, max_sessions: int):
+        self.daily_budget = daily_budget
+        self.max_sessions = max_sessions
+        self.day = _today()
+        self.clients: Dict[str, TokenUsage] = {}
+        self.sessions: "OrderedDict[str, TokenUsage]" = OrderedDict()
+        self.upstream: Dict[str, Dict[str, Any]] = {}
+        self.unreported = 0
+
+    def _rollover(self):
+        today = _today()
+        if today != self.day:
+            logger.info("token_usage_day_closed",
+                       day=self.day,
+                       clients=len(self.clients),
+                       total_tokens=sum(usage.total_tokens for usage in self.clients.values()))
+            self.day = today
+            self.clients.clear()
+
+    def record(self, prompt: int, completion: int, total: int):
+        """Anota una llamada en el cliente y la sesión del contexto actual"""
+        self._rollover()
+        client_id = _client_id.get()
+        self.clients.setdefault(client_id, TokenUsage()).add(prompt, completion, total)
+
+        session_id = _session_id.get()
+        if session_id is not None:
+            usage = self.sessions.pop(session_id, None) or TokenUsage()
+            usage.add(prompt, completion, total)
+            self.sessions[session_id] = usage
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+
+    def used_today(self, client_id: str) -> int:
+        self._rollover()
+        usage = self.clients.get(client_id)
+        return usage.total_tokens if usage else 0
+
+    def remaining(self, client_id: str) -> Optional[int]:
+        """Tokens que le quedan hoy al cliente (None = sin presupuesto)"""
+        if not self.daily_budget:
+            return None
+        return max(self.daily_budget - self.used_today(client_id), 0)
+
+    def within_budget(self, client_id: str) -> bool:
+        return self.remaining(client_id) != 0
+
+    def record_rate_limits(self, provider: str, headers: Mapping[str, str]):
+        """Guarda las cabeceras x-ratelimit-* de una respuesta del proveedor"""
+        limits = {
+            name[len("x-ratelimit-"):]: value
+            for name, value in headers.items()
+            if name.lower().startswith("x-ratelimit-")
+        }
+        if not limits:
+            return
+        limits["updated_at"] = datetime.utcnow().isoformat()
+        self.upstream[provider] = limits
+
+        remaining = limits.get("remaining-tokens-minute")
+        if remaining is not None and remaining.isdigit() and int(remaining) < settings.TOKEN_USAGE_UPSTREAM_WARNING:
+            logger.warning("llm_upstream_quota_low", provider=provider, **limits)
+
+    def get_client(self, client_id: str) -> Dict[str, Any]:
+        self._rollover()
+        usage = self.clients.get(client_id) or TokenUsage()
+        return {
+            "date": self.day,
+            "client_id": client_id,
+            **asdict(usage),
+            "daily_budget": self.daily_budget or None,
+            "remaining": self.remaining(client_id),
+        }
+
+    def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        usage = self.sessions.get(session_id)
+        return asdict(usage) if usage else None
+
+    def get_usage(self) -> Dict[str, Any]:
+        """Detalle de hoy por cliente, más las cuotas upstream"""
+        self._rollover()
+        return {
+            "date": self.day,
+            "daily_budget": self.daily_budget or None,
+            "clients": {client_id: asdict(usage) for client_id, usage in self.clients.items()},
+            "upstream": dict(self.upstream),
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        self._rollover()
+        return {
+            "date": self.day,
+            "clients": len(self.clients),
+            "sessions": len(self.sessions),
+            "total_tokens": sum(usage.total_tokens for usage in self.clients.values()),
+            "calls": sum(usage.calls for usage in self.clients.values()),
+            "unreported_calls": self.unreported,
+            "upstream": dict(self.upstream),
+        }
+
+class TokenUsageCallbackHandler(BaseCallbackHandler):
+    """Registra el uso de tokens que devuelve cada llamada al LLM"""
+
+    # Síncrono y en línea: se ejecuta en el contexto de quien llama, donde
+    # están el cliente y la sesión
+    run_inline = True
+
+    def __init__(self, tracker: TokenUsageTracker):
+        self.tracker = tracker
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        usage = extract_usage(response)
+        if usage is None:
+            self.tracker.unreported += 1
+            return
+        self.tracker.record(*usage)
+
+# Instancias globales
+token_usage_tracker = TokenUsageTracker(
+    daily_budget=settings.RATE_LIMIT_TOKENS_PER_DAY,
+    max_sessions=settings.TOKEN_USAGE_MAX_SESSIONS,
+)
+token_usage_callback = TokenUsageCallbackHandler(token_usage_tracker)
@@ -0,0 +1,563 @@
+import asyncio
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+import numpy as np
+from src.core.config import settings
+from src.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+@dataclass
+class SearchHit:
+    """Resultado de una búsqueda vectorial"""
+    id: str
+    text: str
+    metadata: Dict[str, Any]
+    score: float  # similitud coseno
+    embedding: Optional[np.ndarray] = None
+
+class VectorBackend:
+    """Interfaz común de los backends de VectorStoreService"""
+
+    name = "base"
+
+    async def query(self,
+                    collection_name: str,
+                    embedding: np.ndarray,
+                    k: int,
+                    include_embeddings: bool = False) -> List[SearchHit]:
+        raise NotImplementedError
+
+    async def upsert(self,
+                     collection_name: str,
+                     ids: List[str],
+                     embeddings: List[List[float]],
+                     texts: List[str],
+                     metadatas: List[Dict[str, Any]]):
+        raise NotImplementedError
+
+    async def update_metadata(self,
+                              collection_name: str,
+                              ids: List[str],
+                              metadatas: List[Dict[str, Any]]):
+        """Reemplaza los metadatos de ids existentes (sin tocar embeddings)"""
+        raise NotImplementedError
+
+    async def delete(self, collection_name: str, ids: List[str]):
+        raise NotImplementedError
+
+    async def heartbeat(self) -> int:
+        raise NotImplementedError
+
+    def invalidate(self, collection_name: str):
+        """Descarta handles cacheados de una colección"""
+
+class _ChromaLoopState:
+    """Cliente, semáforo y handles de Chroma ligados a un event loop"""
+
+    def __init__(self):
+        self.client = None
+        self.client_lock = asyncio.Lock()
+        # Limita las peticiones HTTP simultáneas contra Chroma
+        self.pool = asyncio.Semaphore(settings.CHROMA_MAX_CONNECTIONS)
+        self.collections: Dict[str, Any] = {}
+
+class ChromaBackend(VectorBackend):
+    """Backend remoto: servidor Chroma vía cliente HTTP asíncrono.
+
+    El cliente asíncrono y sus handles solo valen en el event loop que los
+    creó: cada loop (el de la API y el del puente síncrono de los
+    retrievers) tiene su propio estado.
+    """
+
+    name = "chroma"
+
+    def __init__(self):
+        self._states: Dict[asyncio.AbstractEventLoop, _ChromaLoopState] = {}
+
+    def _state(self) -> _ChromaLoopState:
+        loop = asyncio.get_running_loop()
+        state = self._states.get(loop)
+        if state is None:
+            # Olvidar los loops que ya se cerraron
+            for closed in [other for other in list(self._states) if other.is_closed()]:
+                del self._states[closed]
+            state = self._states[loop] = _ChromaLoopState()
+        return state
+
+    @property
+    def _pool(self) -> asyncio.Semaphore:
+        return self._state().pool
+
+    async def get_client(self):
+        """Devuelve el cliente HTTP asíncrono de Chroma (uno por event loop)"""
+        state = self._state()
+        if state.client is None:
+            async with state.client_lock:
+                if state.client is None:
+                    # Import diferido: el backend local no requiere chromadb
+                    import chromadb
+                    from chromadb.config import Settings as ChromaSettings
+                    state.client = await chromadb.AsyncHttpClient(
+                        host=settings.CHROMA_HOST,
+                        port=settings.CHROMA_PORT,
+                        settings=ChromaSettings(anonymized_telemetry=False)
+                    )
+        return state.client
+
+    async def heartbeat(self) -> int:
+        client = await self.get_client()
+        async with self._pool:
+            return await client.heartbeat()
+
+    async def get_collection(self, collection_name: str):
+        """Obtiene (y cachea) el handle de una colección"""
+        state = self._state()
+        collection = state.collections.get(collection_name)
+        if collection is None:
+            client = await self.get_client()
+            async with state.pool:
+                collection = await client.get_or_create_collection(collection_name)
+            state.collections[collection_name] = collection
+        return collection
+
+    def invalidate(self, collection_name: str):
+        for state in list(self._states.values()):
+            state.collections.pop(collection_name, None)
+
+    async def _query(self, collection_name: str, embedding: List[float], k: int, include: List[str]):
+        collection = await self.get_collection(collection_name)
+        async with self._pool:
+            return await collection.query(
+                query_embeddings=[embedding],
+                n_results=k,
+                include=include
+            )
+
+    async def query(self, collection_name, embedding, k, include_embeddings=False):
+        include = ["documents", "metadatas", "distances"]
+        if include_embeddings:
+            include.append("embeddings")
+        embedding = np.asarray(embedding, dtype=np.float32).tolist()
+
+        try:
+            result = await self._query(collection_name, embedding, k, include)
+        except Exception:
+            # Handle obsoleto (p. ej. colección recreada): reintentar una vez
+            self.invalidate(collection_name)
+            result = await self._query(collection_name, embedding, k, include)
+
+        vectors = result.get("embeddings") if include_embeddings else None
+        hits = []
+        for i, doc_id in enumerate(result["ids"][0]):
+            hits.append(SearchHit(
+                id=doc_id,
+                text=result["documents"][0][i] or "",
+                metadata=result["metadatas"][0][i] or {},
+                # Distancia L2 al cuadrado entre vectores normalizados
+                score=1.0 - float(result["distances"][0][i]) / 2,
+                embedding=(np.asarray(vectors[0][i], dtype=np.float32)
+                           if vectors is not None else None),
+            ))
+        return hits
+
+    async def upsert(self, collection_name, ids, embeddings, texts, metadatas):
+        collection = await self.get_collection(collection_name)
+        batch_size = settings.CHROMA_WRITE_BATCH_SIZE
+        for start in range(0, len(ids), batch_size):
+            end = start + batch_size
+            async with self._pool:
+                await collection.upsert(
+                    ids=ids[start:end],
+                    embeddings=[list(map(float, e)) for e in embeddings[start:end]],
+                    documents=texts[start:end],
+                    metadatas=metadatas[start:end]
+                )
+
+    async def update_metadata(self, collection_name, ids, metadatas):
+        collection = await self.get_collection(collection_name)
+        batch_size = settings.CHROMA_WRITE_BATCH_SIZE
+        for start in range(0, len(ids), batch_size):
+            end = start + batch_size
+            async with self._pool:
+                await collection.update(ids=ids[start:end], metadatas=metadatas[start:end])
+
+    async def delete(self, collection_name, ids):
+        if not ids:
+            return
+        collection = await self.get_collection(collection_name)
+        async with self._pool:
+            await collection.delete(ids=ids)
+
+QUANTIZATION_MODES = ("none", "float16", "int8")
+
+# Filas por bloque al puntuar vectores cuantizados (acota la memoria temporal)
+_SCORE_BLOCK_ROWS = 65536
+
+def quantize(vectors: np.ndarray, mode: str):
+    """Cuantización escalar; devuelve (códigos, escala por vector o None)"""
+    if mode == "float16":
+        return vectors.astype(np.float16), None
+    if mode == "int8":
+        scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127
+        codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+    raise ValueError(f"Quantization '{mode}' not supported")
+
+def dequantize(codes: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+    vectors = codes.astype(np.float32)
+    if scales is not None:
+        vectors *= scales[:, None]
+    return vectors
+
+def top_k(scores: np.ndarray, k: int):
+    """Posiciones y puntuaciones de los k mayores, ordenadas"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    return top, scores[top]
+
+def quantized_top_k(query: np.ndarray,
+                    k: int,
+                    codes: np.ndarray,
+                    scales: Optional[np.ndarray] = None,
+                    full: Optional[np.ndarray] = None,
+                    rescore_factor: int = 4):
+    """Top-k sobre vectores cuantizados.
+
+    Puntúa todos los códigos por bloques y, si se dispone de la matriz en
+    float32, re-puntúa exactamente una preselección de k * rescore_factor.
+    """
+    scores = np.empty(len(codes), dtype=np.float32)
+    for start in range(0, len(codes), _SCORE_BLOCK_ROWS):
+        block = codes[start:start + _SCORE_BLOCK_ROWS]
+        scores[start:start + len(block)] = block.astype(np.float32) @ query
+    if scales is not None:
+        scores *= scales
+    if full is None:
+        return top_k(scores, k)
+
+    shortlist, _ = top_k(scores, k * rescore_factor)
+    shortlist = np.sort(shortlist)  # lectura secuencial del memmap
+    positions, exact = top_k(np.asarray(full[shortlist]) @ query, k)
+    return shortlist[positions], exact
+
+@dataclass(frozen=True)
+class IndexSnapshot:
+    """Estado de un LocalIndex en un instante: nunca se modifica.
+
+    Las escrituras construyen uno nuevo aparte y lo sustituyen con una
+    sola asignación; quien lee toma la referencia una vez y ve siempre
+    ids, textos y vectores coherentes entre sí.
+    """
+    ids: List[str] = field(default_factory=list)
+    texts: List[str] = field(default_factory=list)
+    metadatas: List[Dict[str, Any]] = field(default_factory=list)
+    matrix: Optional[np.ndarray] = None
+    codes: Optional[np.ndarray] = None
+    scales: Optional[np.ndarray] = None
+
+    def vectors(self, rows=None) -> Optional[np.ndarray]:
+        """Vectores en float32: exactos si se conservan, si no reconstruidos"""
+        if self.matrix is not None:
+            return np.array(self.matrix if rows is None else self.matrix[rows], dtype=np.float32)
+        if self.codes is None:
+            return None
+        if rows is None:
+            return dequantize(self.codes, self.scales)
+        return dequantize(self.codes[rows], None if self.scales is None else self.scales[rows])
+
+class LocalIndex:
+    """Índice exacto en memoria de una colección.
+
+    Los embeddings normalizados viven en una matriz NumPy mapeada en memoria
+    (embeddings.npy) y los textos/metadatos en un fichero JSON adjunto.
+    Con `quantization` ("float16" | "int8") la búsqueda recorre una copia
+    compacta (codes.npy, y scales.npy para int8) y solo lee de la matriz
+    float32 la preselección a re-puntuar; con `rescore=False` la matriz
+    float32 no se guarda.
+
+    El estado vigente es un `IndexSnapshot` inmutable (`self.snapshot`):
+    las escrituras (en un hilo aparte) no alteran el que estén usando las
+    búsquedas en curso.
+    """
+
+    def __init__(self,
+                 path: str,
+                 quantization: str = "none",
+                 rescore: bool = True,
+                 rescore_factor: int = 4):
+        if quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"Quantization '{quantization}' not supported")
+        self.path = path
+        self.quantization = quantization
+        self.rescore = rescore or quantization == "none"
+        self.rescore_factor = rescore_factor
+        self.snapshot = IndexSnapshot()
+        # Cuantización de los ficheros en disco (puede diferir de la configurada)
+        self._stored_quantization = "none"
+        self.load()
+
+    @property
+    def ids(self) -> List[str]:
+        return self.snapshot.ids
+
+    @property
+    def texts(self) -> List[str]:
+        return self.snapshot.texts
+
+    @property
+    def metadatas(self) -> List[Dict[str, Any]]:
+        return self.snapshot.metadatas
+
+    @property
+    def matrix(self) -> Optional[np.ndarray]:
+        return self.snapshot.matrix
+
+    @property
+    def codes(self) -> Optional[np.ndarray]:
+        return self.snapshot.codes
+
+    @property
+    def scales(self) -> Optional[np.ndarray]:
+        return self.snapshot.scales
+
+    @property
+    def _matrix_path(self) -> str:
+        return os.path.join(self.path, "embeddings.npy")
+
+    @property
+    def _codes_path(self) -> str:
+        return os.path.join(self.path, "codes.npy")
+
+    @property
+    def _scales_path(self) -> str:
+        return os.path.join(self.path, "scales.npy")
+
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.path, "meta.json")
+
+    def load(self):
+        """Lee el índice de disco y lo publica como snapshot vigente"""
+        self.snapshot = self._read()
+
+    def _read(self) -> IndexSnapshot:
+        if not os.path.exists(self._meta_path):
+            return IndexSnapshot()
+        with open(self._meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        stored = self._stored_quantization = meta.get("quantization", "none")
+        ids, texts, metadatas = meta["ids"], meta["texts"], meta["metadatas"]
+        if not ids:
+            return IndexSnapshot(ids, texts, metadatas)
+
+        matrix = codes = scales = None
+        if os.path.exists(self._matrix_path):
+            matrix = np.load(self._matrix_path, mmap_mode="r")
+        if stored != "none":
+            codes = np.load(self._codes_path, mmap_mode="r")
+            if stored == "int8":
+                scales = np.load(self._scales_path)
+
+        if stored != self.quantization:
+            # Cambio de configuración: recalcular en memoria; se persiste en la próxima escritura
+            vectors = IndexSnapshot(matrix=matrix, codes=codes, scales=scales).vectors()
+            if self.quantization == "none":
+                matrix, codes, scales = vectors, None, None
+            else:
+                codes, scales = quantize(vectors, self.quantization)
+        return IndexSnapshot(ids, texts, metadatas, matrix, codes, scales)
+
+    def vectors(self, rows=None) -> Optional[np.ndarray]:
+        """Vectores en float32 del snapshot vigente"""
+        return self.snapshot.vectors(rows)
+
+    def _write_array(self, path: str, array: np.ndarray):
+        tmp = path + ".tmp.npy"
+        np.save(tmp, np.ascontiguousarray(array))
+        os.replace(tmp, path)
+
+    def save(self,
+             ids: List[str],
+             texts: List[str],
+             metadatas: List[Dict[str, Any]],
+             matrix: Optional[np.ndarray]):
+        """Escritura atómica (fichero temporal + rename) y cambio de snapshot.
+
+        El snapshot anterior sigue siendo válido hasta la sustitución: los
+        memmaps abiertos apuntan a los ficheros reemplazados, no a los nuevos.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        if matrix is not None and len(matrix):
+            matrix = np.asarray(matrix, dtype=np.float32)
+            if self.rescore:
+                self._write_array(self._matrix_path, matrix)
+            elif os.path.exists(self._matrix_path):
+                os.remove(self._matrix_path)
+            if self.quantization != "none":
+                codes, scales = quantize(matrix, self.quantization)
+                self._write_array(self._codes_path, codes)
+                if scales is not None:
+                    self._write_array(self._scales_path, scales)
+        tmp = self._meta_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"ids": ids, "texts": texts, "metadatas": metadatas,
+                       "quantization": self.quantization},
+                      f, ensure_ascii=False)
+        os.replace(tmp, self._meta_path)
+        self.snapshot = self._read()
+
+    def search(self, query: np.ndarray, k: int, snapshot: Optional[IndexSnapshot] = None):
+        """Top-k por producto escalar; devuelve (posiciones, puntuaciones).
+
+        Las posiciones se refieren a `snapshot` (por defecto, el vigente).
+        """
+        if snapshot is None:
+            snapshot = self.snapshot
+        if not snapshot.ids or (snapshot.matrix is None and snapshot.codes is None):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        if snapshot.codes is None:
+            return top_k(snapshot.matrix @ query, k)
+        return quantized_top_k(
+            query, k, snapshot.codes, snapshot.scales,
+            full=snapshot.matrix if self.rescore else None,
+            rescore_factor=self.rescore_factor
+        )
+
+    def upsert(self, ids, embeddings, texts, metadatas):
+        # Copia: no normalizar en sitio el array del llamante
+        vectors = np.array(embeddings, dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+        current = self.snapshot
+        matrix = current.vectors()
+        if matrix is None:
+            matrix = np.empty((0, vectors.shape[1]), np.float32)
+        all_ids, all_texts, all_metadatas = (
+            list(current.ids), list(current.texts), list(current.metadatas)
+        )
+        positions = {doc_id: i for i, doc_id in enumerate(all_ids)}
+        new_rows = []
+        for doc_id, vector, text, metadata in zip(ids, vectors, texts, metadatas):
+            if doc_id in positions:
+                i = positions[doc_id]
+                matrix[i] = vector
+                all_texts[i] = text
+                all_metadatas[i] = metadata
+            else:
+                positions[doc_id] = len(all_ids)
+                all_ids.append(doc_id)
+                all_texts.append(text)
+                all_metadatas.append(metadata)
+                new_rows.append(vector)
+        if new_rows:
+            matrix = np.vstack([matrix, np.vstack(new_rows)])
+        self.save(all_ids, all_texts, all_metadatas, matrix)
+
+    def update_metadata(self, ids, metadatas):
+        current = self.snapshot
+        positions = {doc_id: i for i, doc_id in enumerate(current.ids)}
+        all_metadatas = list(current.metadatas)
+        for doc_id, metadata in zip(ids, metadatas):
+            if doc_id in positions:
+                all_metadatas[positions[doc_id]] = metadata
+        # Mismos ids y vectores: los arrays en disco siguen valiendo salvo
+        # que haya que reescribirlos con otra cuantización
+        matrix = None if self._stored_quantization == self.quantization else current.vectors()
+        self.save(list(current.ids), list(current.texts), all_metadatas, matrix)
+
+    def delete(self, ids):
+        current = self.snapshot
+        drop = set(ids)
+        keep = [i for i, doc_id in enumerate(current.ids) if doc_id not in drop]
+        if len(keep) == len(current.ids):
+            return
+        self.save(
+            [current.ids[i] for i in keep],
+            [current.texts[i] for i in keep],
+            [current.metadatas[i] for i in keep],
+            current.vectors(keep),
+        )
+
+class LocalIndexBackend(VectorBackend):
+    """Backend embebido: índices NumPy en disco, sin salto de red"""
+
+    name = "local"
+
+    def __init__(self, base_dir: str):
+        self.base_dir = base_dir
+        self._indexes: Dict[str, LocalIndex] = {}
+        # Ordena las escrituras entre sí; las lecturas no lo necesitan (snapshots)
+        self._write_lock = asyncio.Lock()
+
+    def get_index(self, collection_name: str) -> LocalIndex:
+        index = self._indexes.get(collection_name)
+        if index is None:
+            index = LocalIndex(
+                os.path.join(self.base_dir, collection_name),
+                quantization=settings.LOCAL_INDEX_QUANTIZATION,
+                rescore=settings.LOCAL_INDEX_RESCORE,
+                rescore_factor=settings.LOCAL_INDEX_RESCORE_FACTOR,
+            )
+            self._indexes[collection_name] = index
+        return index
+
+    def invalidate(self, collection_name: str):
+        # Sin efecto: las escrituras pasan por este backend y publican su
+        # snapshot al terminar. Recargar desde disco a mitad de un save()
+        # mezclaría arrays nuevos con un meta.json antiguo (o al revés).
+        pass
+
+    async def heartbeat(self) -> int:
+        return 1
+
+    async def query(self, collection_name, embedding, k, include_embeddings=False):
+        index = self.get_index(collection_name)
+        # Una sola lectura del snapshot: una escritura concurrente no lo altera
+        snapshot = index.snapshot
+        query = np.asarray(embedding, dtype=np.float32)
+        positions, scores = index.search(query, k, snapshot)
+        return [
+            SearchHit(
+                id=snapshot.ids[i],
+                text=snapshot.texts[i],
+                metadata=snapshot.metadatas[i],
+                score=float(score),
+                embedding=snapshot.vectors([i])[0] if include_embeddings else None,
+            )
+            for i, score in zip(positions, scores)
+        ]
+
+    async def upsert(self, collection_name, ids, embeddings, texts, metadatas):
+        if not ids:
+            return
+        async with self._write_lock:
+            index = self.get_index(collection_name)
+            await asyncio.to_thread(index.upsert, ids, embeddings, texts, metadatas)
+
+    async def update_metadata(self, collection_name, ids, metadatas):
+        if not ids:
+            return
+        async with self._write_lock:
+            index = self.get_index(collection_name)
+            await asyncio.to_thread(index.update_metadata, ids, metadatas)
+
+    async def delete(self, collection_name, ids):
+        if not ids:
+            return
+        async with self._write_lock:
+            index = self.get_index(collection_name)
+            await asyncio.to_thread(index.delete, ids)
+
+def create_vector_backend() -> VectorBackend:
+    """Crea el backend configurado en VECTOR_BACKEND"""
+    if settings.VECTOR_BACKEND == "chroma":
+        return ChromaBackend()
+    if settings.VECTOR_BACKEND == "local":
+        return LocalIndexBackend(settings.LOCAL_INDEX_DIR)
+    raise ValueError(f"Vector backend '{settings.VECTOR_BACKEND}' not supported")
@@ -1,112 +1,189 @@
-import chromadb
-from chromadb.config import Settings as ChromaSettings
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_chroma import Chroma
+import asyncio
+import threading
+import numpy as np
 from langchain_core.documents import Document
-from langchain_community.document_loaders import PyPDFLoader, UnstructuredMarkdownLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from functools import lru_cache
-from typing import List, Dict, Any
+from langchain_core.retrievers import BaseRetriever
+from typing import Callable, List, Dict, Any, NamedTuple, Optional, Tuple
+from src.services.document_processing import document_parser
+from src.services.ingest_manifest import ingest_manifest, chunk_id, chunk_position, file_digest
+from src.services.embeddings import get_embedding_model, embedding_executor
+from src.services.embedding_cache import query_embedding_cache
+from src.services.vector_backends import SearchHit, VectorBackend, create_vector_backend
+from src.services.answer_cache import answer_cache
+from src.services.lexical_index import lexical_index_service, reciprocal_rank_fusion
+from src.services.reranking import mmr_select, retrieval_profile
 from src.core.config import settings
 from src.core.logging import get_logger
 
 logger = get_logger(__name__)
 
-@lru_cache(maxsize=1)
-def get_embedding_model():
-    """Carga el modelo de embeddings (singleton)"""
-    logger.info("loading_embedding_model")
-    return HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L6-v2",
-        model_kwargs={'device': 'cpu'},
-        encode_kwargs={'normalize_embeddings': True}
-    )
+class ServiceRetriever(BaseRetriever):
+    """Retriever asíncrono respaldado por VectorStoreService.
+
+    `invoke` síncrono también funciona: delega en `search_sync`.
+    """
+    
+    service: Any
+    collection_name: str
+    k: int = 3
+    
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        return self.service.search_sync(query, self.collection_name, self.k)
+    
+    async def _aget_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        return await self.service.search(query, self.collection_name, self.k)
+
+class ChunkPlan(NamedTuple):
+    """Resultado de comparar los chunks de un archivo con el manifiesto"""
+    ids: List[str]                                # ids actuales, en orden
+    positions: List[List[Any]]                    # posición de cada id (para el manifiesto)
+    new_parts: List[Tuple[str, Dict[str, Any]]]   # chunks sin embedding: (id, part)
+    stale: List[str]                              # ids que ya no están en el archivo
+    moved: List[Tuple[str, Dict[str, Any]]]       # conservados con otra posición: (id, part)
 
 class VectorStoreService:
-    """Servicio para gestionar ChromaDB"""
+    """Servicio para gestionar la base vectorial (Chroma o índice local)"""
     
-    def __init__(self):
-        self.client = chromadb.HttpClient(
-            host=settings.CHROMA_HOST,
-            port=settings.CHROMA_PORT,
-            settings=ChromaSettings(anonymized_telemetry=False)
-        )
+    def __init__(self, backend: Optional[VectorBackend] = None):
+        self.backend = backend or create_vector_backend()
+        self._retrievers: Dict[Tuple[str, int], ServiceRetriever] = {}
         self.embedding_function = get_embedding_model()
+        # Event loop en segundo plano para las llamadas síncronas
+        self._sync_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._sync_lock = threading.Lock()
         logger.info("vector_store_initialized", 
+                   backend=self.backend.name,
                    host=settings.CHROMA_HOST, 
                    port=settings.CHROMA_PORT)
     
-    def get_retriever(self, collection_name: str, k: int = 3):
-        """Obtiene un retriever para una colección"""
-        try:
-            vector_store = Chroma(
-                client=self.client,
-                collection_name=collection_name,
-                embedding_function=self.embedding_function,
-            )
-            return vector_store.as_retriever(
-                search_type="similarity",
-                search_kwargs={"k": k}
-            )
-        except Exception as e:
-            logger.error("retriever_creation_failed", 
-                        collection=collection_name, 
-                        error=str(e))
-            raise
+    async def heartbeat(self) -> int:
+        """Comprueba la conexión con el backend"""
+        return await self.backend.heartbeat()
+    
+    def invalidate_collection(self, collection_name: str):
+        """Descarta los handles cacheados de una colección modificada"""
+        self.backend.invalidate(collection_name)
+        answer_cache.invalidate_collection(collection_name)
+        for key in [key for key in self._retrievers if key[0] == collection_name]:
+            del self._retrievers[key]
+    
+    def get_retriever(self, collection_name: str, k: int = 3) -> ServiceRetriever:
+        """Obtiene un retriever (cacheado) para una colección"""
+        key = (collection_name, k)
+        retriever = self._retrievers.get(key)
+        if retriever is None:
+            retriever = ServiceRetriever(service=self, collection_name=collection_name, k=k)
+            self._retrievers[key] = retriever
+        return retriever
+    
+    def bulk_writer(self, collection_name: str) -> "BulkWriter":
+        """Escrituras diferidas para ingestas masivas (ver BulkWriter)"""
+        return BulkWriter(self, collection_name)
+    
+    def plan_chunks(self,
+                    collection_name: str,
+                    source: str,
+                    parts: List[Dict[str, Any]]) -> ChunkPlan:
+        """Compara los chunks de un archivo con el manifiesto.
+
+        Los chunks repetidos dentro del archivo se deduplican por id. Un
+        chunk conservado cuya posición cambió (chunk_index, total_chunks,
+        page) va a `moved`: su embedding sigue valiendo, sus metadatos no.
+        """
+        previous = ingest_manifest.get(collection_name, source)
+        known: Dict[str, Optional[List[Any]]] = {}
+        if previous:
+            # Manifiestos antiguos sin posiciones: se refrescan todos una vez
+            old_positions = previous.get("positions") or [None] * len(previous["chunk_ids"])
+            known = dict(zip(previous["chunk_ids"], old_positions))
+        
+        ids, positions, new_parts, moved, seen = [], [], [], [], set()
+        for part in parts:
+            part_id = chunk_id(source, part["text"])
+            if part_id in seen:
+                continue
+            seen.add(part_id)
+            ids.append(part_id)
+            position = chunk_position(part["metadata"])
+            positions.append(position)
+            if part_id not in known:
+                new_parts.append((part_id, part))
+            elif known[part_id] != position:
+                moved.append((part_id, part))
+        
+        stale = [part_id for part_id in known if part_id not in seen]
+        return ChunkPlan(ids, positions, new_parts, stale, moved)
     
     async def ingest_document(self, 
                             file_path: str, 
                             collection_name: str,
                             chunk_size: int = 1000,
-                            chunk_overlap: int = 200) -> Dict[str, Any]:
-        """Ingesta un documento en ChromaDB"""
+                            chunk_overlap: int = 200,
+                            source: Optional[str] = None,
+                            progress: Optional[Callable[..., None]] = None) -> Dict[str, Any]:
+        """Ingesta incremental de un documento en la base vectorial.
+
+        Un archivo sin cambios (mismo digest) no genera trabajo; si cambió,
+        solo se calculan embeddings de los chunks nuevos, se borran los obsoletos
+        y se actualizan los metadatos de los conservados que cambiaron de posición.
+        `progress(stage, **counts)` recibe el avance de cada etapa.
+        """
+        report = progress or (lambda stage, **counts: None)
         try:
-            # Cargar documento según tipo
-            if file_path.endswith('.pdf'):
-                loader = PyPDFLoader(file_path)
-            elif file_path.endswith('.md'):
-                loader = UnstructuredMarkdownLoader(file_path)
-            else:
-                raise ValueError(f"Unsupported file type: {file_path}")
-            
-            documents = await loader.aload()
-            
-            # Dividir en chunks
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=chunk_size,
-                chunk_overlap=chunk_overlap,
-                separators=["\n\n", "\n", ". ", " ", ""]
-            )
-            chunks = text_splitter.split_documents(documents)
+            source = source or file_path
+            report("hashing")
+            digest = await asyncio.to_thread(file_digest, file_path)
+            previous = ingest_manifest.get(collection_name, source)
+            if previous and previous["digest"] == digest:
+                logger.info("document_unchanged", file=source, collection=collection_name)
+                return {
+                    "status": "success",
+                    "chunks_added": 0,
+                    "chunks_removed": 0,
+                    "total_chunks": len(previous["chunk_ids"]),
+                    "collection": collection_name,
+                    "document_ids": previous["chunk_ids"]
+                }
             
-            # Añadir metadata
-            for i, chunk in enumerate(chunks):
-                chunk.metadata.update({
-                    "source": file_path,
-                    "chunk_index": i,
-                    "total_chunks": len(chunks)
-                })
+            # Cargar y dividir en chunks en el pool de procesos de parseo
+            report("parsing")
+            parts = await document_parser.parse(file_path, chunk_size, chunk_overlap, source)
+            plan = self.plan_chunks(collection_name, source, parts)
+            report("embedding", chunks_total=len(plan.ids), chunks_new=len(plan.new_parts))
             
-            # Crear o actualizar colección
-            vector_store = Chroma(
-                client=self.client,
-                collection_name=collection_name,
-                embedding_function=self.embedding_function
+            # Añadir solo los chunks nuevos y eliminar los obsoletos
+            if plan.new_parts:
+                await self.add_chunks(
+                    collection_name,
+                    [part_id for part_id, _ in plan.new_parts],
+                    [Document(page_content=part["text"], metadata=part["metadata"])
+                     for _, part in plan.new_parts]
+                )
+            report("finalizing")
+            await self.delete_chunks(collection_name, plan.stale)
+            await self.update_chunk_metadata(
+                collection_name,
+                [part_id for part_id, _ in plan.moved],
+                [part["text"] for _, part in plan.moved],
+                [part["metadata"] for _, part in plan.moved]
             )
-            
-            # Añadir documentos
-            ids = await vector_store.aadd_documents(chunks)
+            await ingest_manifest.set(collection_name, source, digest, plan.ids, plan.positions)
             
             logger.info("document_ingested", 
-                       file=file_path, 
+                       file=source, 
                        collection=collection_name, 
-                       chunks=len(chunks))
+                       chunks=len(plan.ids),
+                       added=len(plan.new_parts),
+                       removed=len(plan.stale),
+                       moved=len(plan.moved))
             
             return {
                 "status": "success",
-                "chunks_added": len(chunks),
+                "chunks_added": len(plan.new_parts),
+                "chunks_removed": len(plan.stale),
+                "total_chunks": len(plan.ids),
                 "collection": collection_name,
-                "document_ids": ids
+                "document_ids": plan.ids
             }
             
         except Exception as e:
@@ -118,13 +195,294 @@ class VectorStoreService:
                 "message": str(e)
             }
     
+    async def add_chunks(self,
+                        collection_name: str,
+                        ids: List[str],
+                        chunks: List[Document]):
+        """Calcula embeddings y escribe los chunks en el backend"""
+        texts = [chunk.page_content for chunk in chunks]
+        embeddings = await embedding_executor.embed_documents(texts)
+        await self.write_chunks(
+            collection_name, ids, texts, [chunk.metadata for chunk in chunks], embeddings
+        )
+    
+    async def write_chunks(self,
+                          collection_name: str,
+                          ids: List[str],
+                          texts: List[str],
+                          metadatas: List[Dict[str, Any]],
+                          embeddings: List[List[float]]):
+        """Escribe chunks con embeddings ya calculados (ingesta masiva)"""
+        try:
+            await self.backend.upsert(collection_name, ids, embeddings, texts, metadatas)
+            # Índice léxico (BM25) en paralelo a la colección vectorial
+            await lexical_index_service.update(
+                collection_name, add_ids=ids, texts=texts, metadatas=metadatas
+            )
+        finally:
+            # La colección ha cambiado: refrescar handles cacheados
+            self.invalidate_collection(collection_name)
+    
+    async def update_chunk_metadata(self,
+                                    collection_name: str,
+                                    ids: List[str],
+                                    texts: List[str],
+                                    metadatas: List[Dict[str, Any]]):
+        """Reescribe los metadatos de chunks existentes sin recalcular embeddings"""
+        if not ids:
+            return
+        try:
+            await self.backend.update_metadata(collection_name, ids, metadatas)
+            await lexical_index_service.update(
+                collection_name, add_ids=ids, texts=texts, metadatas=metadatas
+            )
+        finally:
+            self.invalidate_collection(collection_name)
+    
+    async def delete_chunks(self, collection_name: str, ids: List[str]):
+        """Elimina chunks del backend y del índice léxico"""
+        if not ids:
+            return
+        try:
+            await self.backend.delete(collection_name, ids)
+            await lexical_index_service.update(collection_name, remove_ids=ids)
+        finally:
+            self.invalidate_collection(collection_name)
+    
+    async def _candidates(self,
+                          query: str,
+                          embedding: np.ndarray,
+                          collection_name: str,
+                          k: int,
+                          include_embeddings: bool = False) -> Tuple[List[SearchHit], np.ndarray]:
+        """Candidatos (vectoriales o híbridos BM25 + vectorial) y su relevancia"""
+        if not settings.HYBRID_SEARCH_ENABLED:
+            hits = await self.backend.query(
+                collection_name, embedding, k, include_embeddings=include_embeddings
+            )
+            return hits, np.array([hit.score for hit in hits], dtype=np.float32)
+        
+        candidates = max(k, settings.HYBRID_CANDIDATES)
+        vector_hits = await self.backend.query(
+            collection_name, embedding, candidates, include_embeddings=include_embeddings
+        )
+        lexical_hits = lexical_index_service.search(collection_name, query, candidates)
+        if not lexical_hits:
+            hits = vector_hits[:k]
+            return hits, np.array([hit.score for hit in hits], dtype=np.float32)
+        
+        # Fusión por rango recíproco (RRF)
+        by_id = {hit.id: hit for hit in vector_hits}
+        fused = reciprocal_rank_fusion(
+            [[hit.id for hit in vector_hits], [doc_id for doc_id, _ in lexical_hits]],
+            k=settings.HYBRID_RRF_K
+        )
+        
+        hits, scores = [], []
+        for doc_id, score in fused:
+            hit = by_id.get(doc_id)
+            if hit is None:
+                document = lexical_index_service.get_document(collection_name, doc_id)
+                if document is None:
+                    continue
+                hit = SearchHit(id=doc_id, text=document[0], metadata=document[1], score=0.0)
+            hits.append(hit)
+            scores.append(score)
+            if len(hits) == k:
+                break
+        # Puntuación RRF reescalada a [0, 1] para combinarla con similitudes coseno
+        relevance = np.array(scores, dtype=np.float32)
+        if len(relevance):
+            relevance /= relevance.max()
+        return hits, relevance
+    
+    async def search_hits(self,
+                         query: str,
+                         collection_name: str,
+                         k: int = 3,
+                         include_embeddings: bool = False) -> List[SearchHit]:
+        """Búsqueda con puntuaciones; sobre-recupera y re-ordena con MMR según el perfil"""
+        embedding = await query_embedding_cache.embed_query(query)
+        profile = retrieval_profile(collection_name)
+        if not profile.mmr:
+            hits, _ = await self._candidates(
+                query, embedding, collection_name, k, include_embeddings
+            )
+            return hits
+        
+        hits, relevance = await self._candidates(
+            query, embedding, collection_name, max(k, profile.fetch_k), include_embeddings=True
+        )
+        if len(hits) <= k and profile.max_per_source is None:
+            return hits
+        
+        # Los candidatos solo léxicos no traen vector: sin redundancia conocida
+        dim = len(embedding)
+        vectors = np.stack([
+            hit.embedding if hit.embedding is not None else np.zeros(dim, dtype=np.float32)
+            for hit in hits
+        ]) if hits else np.empty((0, dim), dtype=np.float32)
+        selected = mmr_select(
+            relevance,
+            vectors,
+            k,
+            lambda_mult=profile.lambda_mult,
+            groups=[hit.metadata.get("source") for hit in hits],
+            max_per_group=profile.max_per_source,
+        )
+        return [hits[i] for i in selected]
+    
     async def search(self, 
                     query: str, 
                     collection_name: str, 
                     k: int = 3) -> List[Document]:
         """Busca documentos similares"""
-        retriever = self.get_retriever(collection_name, k)
-        return await retriever.aget_relevant_documents(query)
+        hits = await self.search_hits(query, collection_name, k)
+        return [
+            Document(id=hit.id, page_content=hit.text, metadata=hit.metadata)
+            for hit in hits
+        ]
+    
+    def search_sync(self, 
+                    query: str, 
+                    collection_name: str, 
+                    k: int = 3) -> List[Document]:
+        """Versión bloqueante de search para código síncrono.
+
+        La búsqueda corre en un event loop propio en un hilo de fondo, así
+        que funciona tanto sin loop como desde un hilo que ya tiene uno
+        (sin bloquear ese loop no se puede: el llamante espera el resultado).
+        """
+        future = asyncio.run_coroutine_threadsafe(
+            self.search(query, collection_name, k), self._get_sync_loop()
+        )
+        return future.result()
+    
+    def _get_sync_loop(self) -> asyncio.AbstractEventLoop:
+        with self._sync_lock:
+            if self._sync_loop is None or self._sync_loop.is_closed():
+                loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=loop.run_forever, name="vector-store-sync", daemon=True
+                ).start()
+                self._sync_loop = loop
+            return self._sync_loop
+
+class BulkWriter:
+    """Acumula en memoria las escrituras de una ingesta masiva.
+
+    Cada `flush()` aplica de una vez lo pendiente: un borrado, un upsert y
+    una actualización de metadatos en el backend, una reescritura del
+    índice BM25 y del manifiesto, y una sola invalidación de cachés. Así
+    el coste de E/S depende del número de flushes y no del de lotes o
+    archivos (el índice local y el BM25 se reescriben enteros en cada
+    escritura).
+    """
+
+    def __init__(self, service: VectorStoreService, collection_name: str):
+        self.service = service
+        self.collection_name = collection_name
+        self._lock = asyncio.Lock()
+        self._reset()
+        # Métricas
+        self.flushes = 0
+
+    def _reset(self):
+        self._upserts: Dict[str, Tuple[str, Dict[str, Any], List[float]]] = {}
+        self._deletes: set = set()
+        self._metadata: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        self._manifest: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def pending(self) -> int:
+        """Operaciones (chunks y entradas de manifiesto) sin escribir"""
+        return (len(self._upserts) + len(self._deletes)
+                + len(self._metadata) + len(self._manifest))
+
+    def add(self,
+            ids: List[str],
+            texts: List[str],
+            metadatas: List[Dict[str, Any]],
+            embeddings: List[List[float]]):
+        for doc_id, text, metadata, embedding in zip(ids, texts, metadatas, embeddings):
+            self._deletes.discard(doc_id)
+            self._metadata.pop(doc_id, None)
+            self._upserts[doc_id] = (text, metadata, embedding)
+
+    def delete(self, ids: List[str]):
+        for doc_id in ids:
+            self._upserts.pop(doc_id, None)
+            self._metadata.pop(doc_id, None)
+            self._deletes.add(doc_id)
+
+    def update_metadata(self,
+                        ids: List[str],
+                        texts: List[str],
+                        metadatas: List[Dict[str, Any]]):
+        for doc_id, text, metadata in zip(ids, texts, metadatas):
+            if doc_id in self._upserts:
+                self._upserts[doc_id] = (text, metadata, self._upserts[doc_id][2])
+            else:
+                self._metadata[doc_id] = (text, metadata)
+
+    def set_manifest(self,
+                     source: str,
+                     digest: str,
+                     chunk_ids: List[str],
+                     positions: Optional[List[List[Any]]] = None):
+        self._manifest[source] = ingest_manifest.entry(digest, chunk_ids, positions)
+
+    async def flush(self):
+        """Escribe lo pendiente (el manifiesto, al final: si algo falla, se rehace)"""
+        async with self._lock:
+            upserts, deletes, metadata, manifest = (
+                self._upserts, self._deletes, self._metadata, self._manifest
+            )
+            self._reset()
+            if not (upserts or deletes or metadata or manifest):
+                return
+            
+            backend = self.service.backend
+            collection_name = self.collection_name
+            try:
+                if deletes:
+                    await backend.delete(collection_name, list(deletes))
+                if upserts:
+                    ids = list(upserts)
+                    await backend.upsert(
+                        collection_name,
+                        ids,
+                        [upserts[doc_id][2] for doc_id in ids],
+                        [upserts[doc_id][0] for doc_id in ids],
+                        [upserts[doc_id][1] for doc_id in ids]
+                    )
+                if metadata:
+                    await backend.update_metadata(
+                        collection_name,
+                        list(metadata),
+                        [meta for _, meta in metadata.values()]
+                    )
+                changed = {doc_id: (text, meta) for doc_id, (text, meta, _) in upserts.items()}
+                changed.update(metadata)
+                if changed or deletes:
+                    await lexical_index_service.update(
+                        collection_name,
+                        add_ids=list(changed),
+                        texts=[text for text, _ in changed.values()],
+                        metadatas=[meta for _, meta in changed.values()],
+                        remove_ids=list(deletes)
+                    )
+                await ingest_manifest.set_many(collection_name, manifest)
+            finally:
+                self.service.invalidate_collection(collection_name)
+            
+            self.flushes += 1
+            logger.info("bulk_writes_flushed",
+                       collection=collection_name,
+                       upserted=len(upserts),
+                       deleted=len(deletes),
+                       metadata_updated=len(metadata),
+                       files=len(manifest))
 
 # Instancia global
 vector_store_service = VectorStoreService()
@@ -132,4 +490,4 @@ vector_store_service = VectorStoreService()
 # Función standalone para usar en chains.py
 def get_retriever(collection_name: str, k: int = 3):
     """Función standalone para obtener retriever - usada en chains.py"""
-    return vector_store_service.get_retriever(collection_name, k)
\ No newline at end of file
+    return vector_store_service.get_retriever(collection_name, k)
@@ -0,0 +1,97 @@
+"""Caché en memoria con TTL y expulsión LRU"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
+
+class LRUCache(Generic[V]):
+    """Caché acotada por número de entradas (y opcionalmente bytes), con TTL y métricas.
+
+    Thread-safe: `search_sync` usa las mismas cachés desde el event loop de
+    su hilo de fondo, y hasta un `get` reordena el OrderedDict.
+    """
+
+    def __init__(self,
+                 max_entries: int = 1024,
+                 ttl_seconds: Optional[float] = None,
+                 max_bytes: Optional[int] = None,
+                 sizeof: Optional[Callable[[V], int]] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or (lambda value: 0)
+        self.bytes = 0
+        self._data: "OrderedDict[Hashable, Tuple[float, V]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[V]:
+        """Devuelve el valor o None; refresca su posición LRU"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            stored_at, value = entry
+            if self.ttl_seconds is not None and time.monotonic() - stored_at > self.ttl_seconds:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: V):
+        """Inserta o reemplaza un valor, expulsando las entradas menos usadas"""
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (time.monotonic(), value)
+            self.bytes += self.sizeof(value)
+            while self._data and (
+                len(self._data) > self.max_entries
+                or (self.max_bytes is not None and self.bytes > self.max_bytes)
+            ):
+                self._remove(next(iter(self._data)))
+                self.evictions += 1
+
+    def _remove(self, key: Hashable) -> V:
+        _, value = self._data.pop(key)
+        self.bytes -= self.sizeof(value)
+        return value
+
+    def pop(self, key: Hashable) -> Optional[V]:
+        with self._lock:
+            return self._remove(key) if key in self._data else None
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Métricas de uso de la caché"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "bytes": self.bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
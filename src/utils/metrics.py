@@ -0,0 +1,21 @@
+from collections import deque
+from typing import Any, Deque, Dict
+
+class LatencyStats:
+    """Latencias recientes (ventana deslizante) para percentiles"""
+
+    def __init__(self, window: int = 512):
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.count = 0
+
+    def observe(self, seconds: float):
+        self.samples.append(seconds)
+        self.count += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        if not self.samples:
+            return {"count": 0}
+        ordered = sorted(self.samples)
+        def percentile(q: float) -> float:
+            return round(ordered[min(int(q * len(ordered)), len(ordered) - 1)] * 1000, 1)
+        return {"count": self.count, "p50_ms": percentile(0.5), "p95_ms": percentile(0.95)}
@@ -0,0 +1,19 @@
+"""Utilidades de normalización de texto"""
+
+import re
+import unicodedata
+
+_NON_WORD = re.compile(r"[^\w\s@.\[\]-]+")
+_SPACES = re.compile(r"\s+")
+
+def strip_accents(text: str) -> str:
+    """Elimina tildes y diacríticos (á -> a, ñ -> n)"""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+def normalize_text(text: str) -> str:
+    """Normaliza un mensaje: minúsculas, sin tildes, sin signos y espacios colapsados"""
+    text = strip_accents(text.lower())
+    text = _NON_WORD.sub(" ", text)
+    text = _SPACES.sub(" ", text)
+    return text.strip(" .-")
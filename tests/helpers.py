@@ -0,0 +1,17 @@
+"""Utilidades compartidas por los tests de embeddings y búsqueda"""
+
+import numpy as np
+
+def unit(vector):
+    """Vector float32 normalizado (norma 1)"""
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+class StubQueryCache:
+    """Sustituto de query_embedding_cache: `embed(texto)` da el vector, sin modelo"""
+
+    def __init__(self, embed):
+        self.embed = embed
+
+    async def embed_query(self, text):
+        return unit(self.embed(text))
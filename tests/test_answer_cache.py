@@ -0,0 +1,124 @@
+from types import SimpleNamespace
+import pytest
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
+import src.agents.nodes as nodes
+import src.services.answer_cache as answer_cache_module
+import src.services.vector_store as vector_store
+from src.agents.speculation import SpeculativeRetrieval
+from src.core.config import settings
+from src.services.answer_cache import SemanticAnswerCache
+from src.services.lexical_index import LexicalIndexService
+from src.services.vector_backends import VectorBackend
+from src.services.vector_store import VectorStoreService
+from tests.helpers import StubQueryCache, unit
+
+def _cache(threshold=0.95, ttl_seconds=60):
+    return SemanticAnswerCache(threshold=threshold, ttl_seconds=ttl_seconds, max_bytes=1 << 20)
+
+def test_hit_within_similarity_and_same_chunks():
+    """Test consulta casi idéntica con los mismos chunks: se reutiliza la respuesta"""
+    cache = _cache()
+    cache.store(unit([1, 0, 0]), "faq", ["a", "b"], "respuesta", tokens=120)
+
+    entry = cache.lookup(unit([1, 0.1, 0]), "faq", ["a", "b"])
+
+    assert entry is not None and entry.answer == "respuesta"
+    assert cache.get_stats()["hits"] == 1
+    assert cache.get_stats()["saved_tokens"] == 120
+
+def test_miss_below_similarity():
+    """Test consulta parecida pero bajo ANSWER_CACHE_SIMILARITY: fallo"""
+    cache = _cache()
+    cache.store(unit([1, 0, 0]), "faq", ["a", "b"], "respuesta")
+
+    assert cache.lookup(unit([1, 0.5, 0]), "faq", ["a", "b"]) is None
+    assert cache.get_stats()["misses"] == 1
+
+def test_miss_when_chunk_ids_differ():
+    """Test misma consulta con otros chunks recuperados: fallo"""
+    cache = _cache()
+    cache.store(unit([1, 0, 0]), "faq", ["a", "b"], "respuesta")
+
+    assert cache.lookup(unit([1, 0, 0]), "faq", ["a", "c"]) is None
+    assert cache.lookup(unit([1, 0, 0]), "faq", ["b", "a"]) is None
+    assert cache.lookup(unit([1, 0, 0]), "otra", ["a", "b"]) is None
+
+def test_ttl_expiry(monkeypatch):
+    """Test las respuestas caducan pasado el TTL"""
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache_module, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    cache = _cache(ttl_seconds=60)
+    cache.store(unit([1, 0, 0]), "faq", ["a"], "respuesta")
+
+    now[0] += 59
+    assert cache.lookup(unit([1, 0, 0]), "faq", ["a"]) is not None
+    now[0] += 2
+    assert cache.lookup(unit([1, 0, 0]), "faq", ["a"]) is None
+    assert cache.get_stats()["entries"] == 0
+
+class _MemoryBackend(VectorBackend):
+    name = "memory"
+
+    async def upsert(self, collection_name, ids, embeddings, texts, metadatas):
+        pass
+
+    async def delete(self, collection_name, ids):
+        pass
+
+@pytest.mark.asyncio
+async def test_collection_write_invalidates(tmp_path, monkeypatch):
+    """Test escribir o borrar en una colección descarta sus respuestas, no las de otras"""
+    cache = _cache()
+    monkeypatch.setattr(vector_store, "answer_cache", cache)
+    monkeypatch.setattr(vector_store, "lexical_index_service",
+                        LexicalIndexService(str(tmp_path)))
+    service = VectorStoreService(backend=_MemoryBackend())
+    cache.store(unit([1, 0, 0]), "faq", ["a"], "respuesta faq")
+    cache.store(unit([1, 0, 0]), "otra", ["a"], "respuesta otra")
+
+    await service.write_chunks("faq", ["b"], ["texto"], [{}], [[1.0, 0.0]])
+
+    assert cache.lookup(unit([1, 0, 0]), "faq", ["a"]) is None
+    assert cache.lookup(unit([1, 0, 0]), "otra", ["a"]) is not None
+    assert cache.get_stats()["invalidations"] == 1
+
+    await service.delete_chunks("otra", ["a"])
+
+    assert cache.lookup(unit([1, 0, 0]), "otra", ["a"]) is None
+    assert cache.get_stats()["invalidations"] == 2
+
+@pytest.mark.asyncio
+async def test_support_query_node_reuses_answer(monkeypatch):
+    """Test support_query_node solo llama al LLM la primera vez"""
+    llm_calls = []
+
+    def fake_llm(prompt):
+        llm_calls.append(prompt)
+        return AIMessage(content="Ve a Configuración > Seguridad.")
+
+    async def fake_retrieve(query):
+        return "contexto", [Document(id="a", page_content="contexto")]
+
+    cache = _cache()
+    monkeypatch.setattr(nodes, "answer_cache", cache)
+    monkeypatch.setattr(nodes, "query_embedding_cache", StubQueryCache(
+        lambda text: [1, 0, 0] if "contraseña" in text else [0, 1, 0]
+    ))
+    monkeypatch.setattr(nodes, "retrieve_faq_context", fake_retrieve)
+    monkeypatch.setattr(nodes, "speculative_retrieval", SpeculativeRetrieval())
+    monkeypatch.setattr(nodes, "get_profile_llm", lambda profile: RunnableLambda(fake_llm))
+    monkeypatch.setattr(settings, "ANSWER_CACHE_ENABLED", True)
+
+    def state(message):
+        return {"messages": [HumanMessage(content=message)], "session_id": "s1"}
+
+    first = await nodes.support_query_node(state("¿Cómo cambio mi contraseña?"))
+    second = await nodes.support_query_node(state("¿Cómo cambio la contraseña?"))
+    other = await nodes.support_query_node(state("¿Cuánto cuesta?"))
+
+    assert first["messages"][0].content == second["messages"][0].content
+    assert other["messages"][0].content == "Ve a Configuración > Seguridad."
+    assert len(llm_calls) == 2
+    assert cache.get_stats()["hits"] == 1
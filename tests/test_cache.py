@@ -0,0 +1,70 @@
+import sys
+import threading
+import time
+from src.utils.cache import LRUCache
+
+def test_lru_eviction():
+    """Test expulsión de la entrada menos usada"""
+    cache = LRUCache(max_entries=2)
+    cache.set("hola", "greeting")
+    cache.set("precio", "support_query")
+    assert cache.get("hola") == "greeting"
+    
+    cache.set("gracias", "out_of_scope")
+    
+    assert cache.get("precio") is None
+    assert cache.get("hola") == "greeting"
+    assert cache.evictions == 1
+
+def test_ttl_expiration():
+    """Test expiración por TTL"""
+    cache = LRUCache(max_entries=10, ttl_seconds=0.01)
+    cache.set("ayuda", "support_query")
+    time.sleep(0.02)
+    
+    assert cache.get("ayuda") is None
+    stats = cache.get_stats()
+    assert stats["expirations"] == 1
+    assert stats["hit_rate"] == 0.0
+
+def test_byte_budget():
+    """Test expulsión por presupuesto de memoria"""
+    cache = LRUCache(max_entries=100, max_bytes=10, sizeof=len)
+    cache.set("a", "12345")
+    cache.set("b", "12345")
+    cache.set("c", "123")
+    
+    assert cache.get("a") is None
+    assert cache.get("c") == "123"
+    assert cache.bytes == 8
+
+def test_concurrent_threads_keep_cache_consistent():
+    """Test accesos desde varios hilos (p.ej. el de search_sync) sin corromper la caché"""
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    cache = LRUCache(max_entries=8, max_bytes=40, sizeof=len)
+    errors = []
+
+    def worker(offset):
+        try:
+            for i in range(3000):
+                key = (offset + i) % 16
+                cache.set(key, "x" * (key % 5 + 1))
+                cache.get((key + 3) % 16)
+                if i % 7 == 0:
+                    cache.pop(key)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+    assert errors == []
+    assert len(cache) <= 8
+    assert cache.bytes == sum(len(value) for _, value in cache._data.values())
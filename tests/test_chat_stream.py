@@ -0,0 +1,69 @@
+import json
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from langchain_core.documents import Document
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langgraph.checkpoint.memory import MemorySaver
+import src.agents.nodes as nodes
+import src.agents.support_graph as graph_module
+from src.api.routers import router
+from src.core.config import settings
+
+ANSWER = "Ve a Ajustes y pulsa Cambiar contraseña"
+
+@pytest.fixture
+def client(monkeypatch):
+    """API con el grafo real y modelos de chat simulados que emiten tokens"""
+    models = {
+        "classifier": GenericFakeChatModel(messages=iter([AIMessage(content="support_query")])),
+        "answerer": GenericFakeChatModel(messages=iter([AIMessage(content=ANSWER)])),
+    }
+
+    async def fake_retrieve(query):
+        return "Contexto", [Document(page_content="Ajustes > Cambiar contraseña", id="c1")]
+
+    monkeypatch.setattr(nodes, "get_profile_llm", lambda profile: models[profile])
+    monkeypatch.setattr(nodes, "retrieve_faq_context", fake_retrieve)
+    monkeypatch.setattr(settings, "INTENT_CACHE_ENABLED", False)
+    monkeypatch.setattr(settings, "INTENT_CLASSIFIER_MODE", "llm")
+    monkeypatch.setattr(settings, "ANSWER_CACHE_ENABLED", False)
+    monkeypatch.setattr(settings, "SPECULATIVE_RETRIEVAL_ENABLED", False)
+    monkeypatch.setattr(graph_module, "support_agent_graph",
+                        graph_module.create_support_graph(checkpointer=MemorySaver()))
+
+    app = FastAPI()
+    app.include_router(router)
+    return AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+
+async def _events(client, message, session_id):
+    response = await client.post("/api/v1/chat/stream",
+                                 json={"message": message, "session_id": session_id})
+    assert response.status_code == 200
+    return [json.loads(line[len("data: "):])
+            for line in response.text.splitlines() if line.startswith("data: ")]
+
+@pytest.mark.asyncio
+async def test_stream_forwards_only_answer_tokens(client):
+    """Test solo se reenvían los tokens de STREAMING_NODES, no los del clasificador"""
+    async with client:
+        events = await _events(client, "¿Cómo cambio mi contraseña?", "stream_support")
+
+    chunks = [event["chunk"] for event in events if "chunk" in event]
+    assert len(chunks) > 1
+    assert "".join(chunks) == ANSWER
+    assert "support_query" not in chunks
+    assert events[-1]["done"] is True
+    assert events[-1]["intent"] == "support_query"
+
+@pytest.mark.asyncio
+async def test_stream_sends_canned_response_as_one_chunk(client):
+    """Test las respuestas fijas se envían en un único chunk"""
+    async with client:
+        events = await _events(client, "Hola", "stream_greeting")
+
+    chunks = [event["chunk"] for event in events if "chunk" in event]
+    assert len(chunks) == 1
+    assert "[FAQ]" in chunks[0]
+    assert events[-1]["intent"] == "greeting"
@@ -0,0 +1,40 @@
+from langchain_core.documents import Document
+from src.services.context_packing import ContextPacker, merge_overlap, get_token_counter
+
+def _doc(text, source="faq.md", index=0):
+    return Document(page_content=text, metadata={"source": source, "chunk_index": index})
+
+def test_merge_overlap():
+    """Test eliminación del solapamiento entre chunks consecutivos"""
+    left = "El envío tarda de 3 a 5 días hábiles en la península."
+    right = "5 días hábiles en la península. Las islas requieren 7 días."
+
+    merged = merge_overlap(left, right, max_overlap=200)
+
+    assert merged == "El envío tarda de 3 a 5 días hábiles en la península. Las islas requieren 7 días."
+
+def test_adjacent_chunks_merged_in_order():
+    """Test fusión de chunks vecinos de la misma fuente"""
+    packer = ContextPacker(max_tokens=1000)
+    documents = [
+        _doc("Segunda parte del texto de devoluciones.", index=1),
+        _doc("Política de devoluciones. Segunda parte del texto", index=0),
+        _doc("Horario de atención de 9 a 18.", source="horario.md"),
+    ]
+
+    context = packer.pack(documents)
+
+    assert context.count("Segunda parte") == 1
+    assert context.index("[Fuente 1: faq.md]") < context.index("[Fuente 2: horario.md]")
+
+def test_token_budget():
+    """Test recorte al presupuesto de tokens"""
+    count_tokens = get_token_counter()
+    packer = ContextPacker(max_tokens=40)
+    long_text = " ".join(f"Frase número {i} sobre facturación." for i in range(50))
+
+    context = packer.pack([_doc(long_text), _doc("Otra fuente.", source="otra.md")])
+
+    assert count_tokens(context) <= 40
+    assert "otra.md" not in context
+    assert packer.get_stats()["trimmed"] == 1
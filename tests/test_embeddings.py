@@ -0,0 +1,62 @@
+import asyncio
+import threading
+import pytest
+import src.services.embeddings as embeddings
+from src.services.embeddings import EmbeddingExecutor
+
+class _FakeModel:
+    """Modelo simulado: anota cada llamada; los textos "bulk" esperan a `release`"""
+
+    def __init__(self):
+        self.calls = []
+        self.release = threading.Event()
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        if texts and texts[0].startswith("bulk"):
+            self.release.wait(timeout=5)
+        return [[float(len(text)), 1.0] for text in texts]
+
+@pytest.fixture
+def model(monkeypatch):
+    fake = _FakeModel()
+    monkeypatch.setattr(embeddings, "get_embedding_model", lambda: fake)
+    yield fake
+    fake.release.set()
+
+@pytest.mark.asyncio
+async def test_concurrent_queries_share_one_batch(model):
+    """Test las consultas concurrentes se resuelven con una sola llamada al modelo"""
+    executor = EmbeddingExecutor(max_batch_size=8, batch_window_ms=5)
+    try:
+        vectors = await asyncio.gather(*[
+            executor.embed_query(text) for text in ["a", "bb", "ccc"]
+        ])
+    finally:
+        executor.close()
+
+    assert vectors == [[1.0, 1.0], [2.0, 1.0], [3.0, 1.0]]
+    assert model.calls == [["a", "bb", "ccc"]]
+    stats = executor.get_stats()
+    assert stats["batches"] == 1
+    assert stats["items"] == 3
+    assert stats["largest_batch"] == 3
+    assert stats["avg_batch_size"] == 3.0
+    assert stats["queue_depth"] == 0
+
+@pytest.mark.asyncio
+async def test_bulk_ingestion_does_not_block_queries(model):
+    """Test un lote de ingesta en curso no retrasa los embeddings de consultas"""
+    executor = EmbeddingExecutor(batch_window_ms=0)
+    try:
+        bulk = asyncio.ensure_future(executor.embed_documents(["bulk 1", "bulk 2"]))
+        await asyncio.sleep(0.01)
+
+        vector = await asyncio.wait_for(executor.embed_query("hola"), timeout=1)
+        assert vector == [4.0, 1.0]
+        assert not bulk.done()
+
+        model.release.set()
+        assert len(await bulk) == 2
+    finally:
+        executor.close()
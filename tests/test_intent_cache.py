@@ -0,0 +1,47 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+import src.agents.nodes as nodes
+from src.agents.intent_cache import intent_cache_key
+from src.core.config import settings
+from src.utils.cache import LRUCache
+
+def test_intent_cache_key_normalization_and_history():
+    """Test la clave ignora mayúsculas, tildes y signos, pero separa historiales"""
+    history = "Usuario: hola...\nAsistente: ¡Hola! ¿En qué te ayudo?..."
+
+    key = intent_cache_key("¿Cómo cambio mi contraseña?", history)
+
+    assert key == intent_cache_key("como cambio mi CONTRASEÑA", history)
+    assert key != intent_cache_key("¿Cómo cambio mi contraseña?", "Sin historial previo")
+    assert key != intent_cache_key("¿Cómo cambio mi email?", history)
+
+@pytest.mark.asyncio
+async def test_classify_intent_node_skips_llm_on_cache_hit(monkeypatch):
+    """Test un acierto de caché no llama al LLM; otro historial sí"""
+    llm_calls = []
+
+    async def fake_llm(history, message):
+        llm_calls.append(message)
+        return "support_query"
+
+    monkeypatch.setattr(nodes, "intent_cache", LRUCache(max_entries=10))
+    monkeypatch.setattr(nodes, "_classify_with_llm", fake_llm)
+    monkeypatch.setattr(settings, "INTENT_CACHE_ENABLED", True)
+    monkeypatch.setattr(settings, "INTENT_FAST_PATH_ENABLED", False)
+    monkeypatch.setattr(settings, "INTENT_CLASSIFIER_MODE", "llm")
+    monkeypatch.setattr(settings, "SPECULATIVE_RETRIEVAL_ENABLED", False)
+
+    def state(message, *previous):
+        return {"messages": [*previous, HumanMessage(content=message)], "session_id": "s1"}
+
+    first = await nodes.classify_intent_node(state("¿Cómo cambio mi contraseña?"))
+    second = await nodes.classify_intent_node(state("como cambio mi contraseña"))
+    other_history = await nodes.classify_intent_node(state(
+        "como cambio mi contraseña",
+        HumanMessage(content="Hola"),
+        AIMessage(content="¡Hola! ¿En qué te ayudo?"),
+    ))
+
+    assert first == second == other_history == {"current_intent": "support_query"}
+    assert len(llm_calls) == 2
+    assert nodes.intent_cache.get_stats()["hits"] == 1
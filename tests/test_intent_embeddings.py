@@ -0,0 +1,87 @@
+import pytest
+from langchain_core.messages import HumanMessage
+import src.agents.intent_embeddings as intent_embeddings
+import src.agents.nodes as nodes
+from src.agents.intent_embeddings import EmbeddingIntentClassifier
+from src.core.config import settings
+from tests.helpers import StubQueryCache, unit
+
+# Vectores fijos: cada texto de ejemplo o consulta tiene su embedding
+_VECTORS = {
+    "hola": [1.0, 0.0, 0.0],
+    "buenas": [0.9, 0.1, 0.0],
+    "mi pedido no llega": [0.0, 1.0, 0.0],
+    "error al pagar": [0.1, 0.9, 0.0],
+    # Consultas
+    "hola que tal": [0.95, 0.05, 0.0],
+    "algo raro": [0.0, 0.0, 1.0],
+    "hola, mi pedido": [0.7, 0.7, 0.1],
+}
+
+class _StubExecutor:
+    async def embed_documents(self, texts):
+        return [unit(_VECTORS[text]).tolist() for text in texts]
+
+@pytest.fixture
+def classifier(monkeypatch):
+    monkeypatch.setattr(intent_embeddings, "embedding_executor", _StubExecutor())
+    monkeypatch.setattr(intent_embeddings, "query_embedding_cache", StubQueryCache(lambda text: _VECTORS[text]))
+    return EmbeddingIntentClassifier(
+        {"greeting": ["hola", "buenas"], "support_query": ["mi pedido no llega", "error al pagar"]},
+        min_score=0.5,
+        min_margin=0.2,
+    )
+
+@pytest.mark.asyncio
+async def test_confident_match_returns_intent(classifier):
+    """Test puntuación y margen suficientes: se resuelve sin LLM"""
+    result = await classifier.classify("hola que tal")
+
+    assert result.intent == "greeting"
+    assert result.score >= 0.5
+    assert result.margin >= 0.2
+    assert classifier.get_stats()["confident"] == 1
+
+@pytest.mark.asyncio
+async def test_low_score_is_ambiguous(classifier):
+    """Test puntuación baja: intent None para derivar al LLM"""
+    result = await classifier.classify("algo raro")
+
+    assert result.intent is None
+    assert result.score < 0.5
+
+@pytest.mark.asyncio
+async def test_low_margin_is_ambiguous(classifier):
+    """Test dos intenciones casi empatadas: intent None aunque la puntuación sea alta"""
+    result = await classifier.classify("hola, mi pedido")
+
+    assert result.intent is None
+    assert result.score >= 0.5
+    assert result.margin < 0.2
+    assert classifier.get_stats()["ambiguous"] == 1
+
+@pytest.mark.asyncio
+async def test_ambiguous_falls_back_to_llm(classifier, monkeypatch):
+    """Test classify_intent_node llama al LLM solo en los casos ambiguos"""
+    llm_calls = []
+
+    async def fake_llm(history, message):
+        llm_calls.append(message)
+        return "support_query"
+
+    monkeypatch.setattr(nodes, "intent_embedding_classifier", classifier)
+    monkeypatch.setattr(nodes, "_classify_with_llm", fake_llm)
+    monkeypatch.setattr(settings, "INTENT_CLASSIFIER_MODE", "embedding")
+    monkeypatch.setattr(settings, "INTENT_FAST_PATH_ENABLED", False)
+    monkeypatch.setattr(settings, "INTENT_CACHE_ENABLED", False)
+
+    confident = await nodes.classify_intent_node(
+        {"messages": [HumanMessage(content="hola que tal")], "session_id": "s1"}
+    )
+    ambiguous = await nodes.classify_intent_node(
+        {"messages": [HumanMessage(content="hola, mi pedido")], "session_id": "s1"}
+    )
+
+    assert confident == {"current_intent": "greeting"}
+    assert ambiguous == {"current_intent": "support_query"}
+    assert llm_calls == ["hola, mi pedido"]
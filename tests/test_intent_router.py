@@ -0,0 +1,48 @@
+import json
+import pytest
+from src.agents.intent_router import FastPathIntentRouter
+from src.core.config import settings
+
+@pytest.mark.parametrize("message,state,expected", [
+    ("[FAQ]", {}, "faq_request"),
+    ("  [ faq ] por favor", {}, "faq_request"),
+    ("Preguntas frecuentes", {}, "faq_request"),
+    ("[Agente]", {}, "agent_request"),
+    ("Quiero hablar con un agente", {}, "agent_request"),
+    ("Hola", {}, "greeting"),
+    ("¡Buenos días!", {}, "greeting"),
+    ("usuario@example.com", {}, None),
+    ("Hola, ¿cómo cambio mi contraseña?", {}, None),
+    ("¿Cuánto cuesta el plan premium?", {}, None),
+])
+def test_fast_path_rules(message, state, expected):
+    """Test tabla de reglas: coincidencias y casos que pasan al LLM"""
+    router = FastPathIntentRouter()
+
+    assert router.match(message, state) == expected
+
+def test_fast_path_stats():
+    """Test contadores de aciertos y fallos"""
+    router = FastPathIntentRouter()
+    router.match("[FAQ]")
+    router.match("¿Cómo exporto mis datos?")
+
+    stats = router.get_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hits_by_intent"] == {"faq_request": 1}
+
+def test_rules_path_override(tmp_path, monkeypatch):
+    """Test la tabla de INTENT_RULES_PATH sustituye a la de por defecto"""
+    rules_path = tmp_path / "rules.json"
+    rules_path.write_text(json.dumps({"rules": [
+        {"intent": "faq_request", "exact": ["ayuda rápida"]},
+        {"intent": "agent_request", "patterns": [r"\bsoporte humano\b"]},
+    ]}), encoding="utf-8")
+    monkeypatch.setattr(settings, "INTENT_RULES_PATH", str(rules_path))
+
+    router = FastPathIntentRouter.from_settings()
+
+    assert router.match("Ayuda rápida") == "faq_request"
+    assert router.match("necesito soporte humano ya") == "agent_request"
+    assert router.match("Hola") is None
@@ -0,0 +1,67 @@
+import sys
+import threading
+from src.services.lexical_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+def test_tokenize_keeps_codes():
+    """Test tokens normalizados conservando códigos de error"""
+    assert tokenize("¿Qué significa el Error ERR-404 en la versión v2.1?") == [
+        "significa", "error", "err-404", "version", "v2.1"
+    ]
+
+def test_bm25_exact_keyword_and_incremental_update():
+    """Test BM25 prioriza coincidencias exactas y admite altas/bajas"""
+    index = BM25Index()
+    index.add(
+        ["a", "b"],
+        ["El código ERR-404 indica que el recurso no existe",
+         "Para cambiar la contraseña ve a configuración"],
+        [{}, {}]
+    )
+    assert index.search("err-404", k=3)[0][0] == "a"
+    
+    index.add(["c"], ["Contraseña olvidada: usa el enlace de recuperación"], [{}])
+    index.remove(["b"])
+    
+    assert [doc_id for doc_id, _ in index.search("contraseña", k=3)] == ["c"]
+
+def test_reciprocal_rank_fusion():
+    """Test RRF favorece documentos presentes en ambos rankings"""
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "d"]])
+    assert fused[0][0] == "c"
+
+def test_search_while_updating_from_another_thread():
+    """Test buscar mientras otro hilo actualiza el índice (search_sync frente al loop principal)"""
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    index = BM25Index()
+    index.add(["base"], ["cambiar contraseña en configuración"], [{}])
+    stop = threading.Event()
+    errors = []
+
+    def writer():
+        try:
+            for i in range(2000):
+                ids = [f"d{i}-{j}" for j in range(5)]
+                index.add(ids, [f"contraseña olvidada número {j}" for j in range(5)], [{}] * 5)
+                index.remove(ids)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            stop.set()
+
+    thread = threading.Thread(target=writer)
+    try:
+        thread.start()
+        while not stop.is_set():
+            try:
+                index.search("contraseña olvidada", k=3)
+                index.to_dict()
+            except Exception as e:
+                errors.append(e)
+                break
+        thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+    assert errors == []
+    assert list(index.docs) == ["base"]
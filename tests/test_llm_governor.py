@@ -0,0 +1,70 @@
+import asyncio
+import time
+import pytest
+from src.llms.governor import (
+    PRIORITY_BATCH, PRIORITY_INTERACTIVE, GovernorRejected, LLMGovernor, Permit, llm_request_context
+)
+
+class _RateLimitError(Exception):
+    status_code = 429
+
+@pytest.mark.asyncio
+async def test_interactive_requests_go_first():
+    """Test con el límite agotado, las peticiones interactivas adelantan a las batch"""
+    governor = LLMGovernor("test", initial_limit=1)
+    await governor.acquire(10)
+    order = []
+
+    async def call(name, priority):
+        with llm_request_context(priority):
+            async with governor.slot(10):
+                order.append(name)
+
+    batch = asyncio.create_task(call("batch", PRIORITY_BATCH))
+    await asyncio.sleep(0)
+    interactive = asyncio.create_task(call("interactive", PRIORITY_INTERACTIVE))
+    await asyncio.sleep(0)
+    assert governor.get_stats()["queued"] == 2
+
+    governor.release(Permit(10))
+    await asyncio.gather(batch, interactive)
+
+    assert order == ["interactive", "batch"]
+    assert governor.get_stats()["queue_wait"]["interactive"]["count"] == 1
+
+@pytest.mark.asyncio
+async def test_rate_limit_halves_concurrency():
+    """Test un 429 reduce el límite a la mitad"""
+    governor = LLMGovernor("test", initial_limit=8)
+
+    with pytest.raises(_RateLimitError):
+        async with governor.slot(10):
+            raise _RateLimitError()
+
+    stats = governor.get_stats()
+    assert stats["limit"] == 4
+    assert stats["rate_limited"] == 1
+    assert stats["in_flight"] == 0
+
+@pytest.mark.asyncio
+async def test_unreachable_deadline_is_rejected():
+    """Test una petición que no llegaría a tiempo se rechaza sin encolarse"""
+    governor = LLMGovernor("test", initial_limit=1, latency_target=5.0)
+    await governor.acquire(10)
+
+    with llm_request_context(PRIORITY_INTERACTIVE, deadline=time.monotonic() + 1.0):
+        with pytest.raises(GovernorRejected) as error:
+            await governor.acquire(10)
+
+    assert error.value.reason == "deadline"
+    assert governor.get_stats()["queued"] == 0
+
+@pytest.mark.asyncio
+async def test_token_bucket_delays_until_refill():
+    """Test sin tokens disponibles la llamada espera a la recarga del cubo"""
+    governor = LLMGovernor("test", tokens_per_minute=600)
+    await governor.acquire(600)
+
+    waited = await asyncio.wait_for(governor.acquire(5), timeout=2)
+
+    assert waited > 0.3
@@ -0,0 +1,215 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from langchain_core.messages import HumanMessage
+from src.llms.providers import ProviderRegistry, ProviderSpec
+from src.services.token_usage import token_usage_tracker, usage_context
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    """Servidor local compatible con /chat/completions de OpenAI"""
+
+    protocol_version = "HTTP/1.1"
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.server.requests.append(("GET", self.path))
+        self._send_json(200, {"object": "list", "data": []})
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append(("POST", self.path))
+        self.server.bodies.append(request)
+        if self.server.fail:
+            self._send_json(500, {"error": {"message": "boom", "type": "server_error"}})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("x-ratelimit-remaining-tokens-minute", "59000")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for token in self.server.reply.split(" "):
+            self._event({"role": "assistant", "content": token + " "}, None, request)
+        self._event({}, "stop", request)
+        if request.get("stream_options", {}).get("include_usage"):
+            self._event(None, None, request, usage={
+                "prompt_tokens": 12, "completion_tokens": 3, "total_tokens": 15
+            })
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+    def _event(self, delta, finish_reason, request, usage=None):
+        chunk = {
+            "id": "chatcmpl-test",
+            "object": "chat.completion.chunk",
+            "created": 0,
+            "model": request["model"],
+            "choices": [] if delta is None else [
+                {"index": 0, "delta": delta, "finish_reason": finish_reason}
+            ],
+        }
+        if usage:
+            chunk["usage"] = usage
+        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+
+    def log_message(self, *args):
+        pass
+
+def _start_server(reply="", fail=False):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StandInHandler)
+    server.reply, server.fail, server.requests, server.bodies = reply, fail, [], []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+@pytest.fixture
+def servers():
+    primary = _start_server(fail=True)
+    backup = _start_server(reply="respuesta del respaldo")
+    yield primary, backup
+    primary.shutdown()
+    backup.shutdown()
+
+def _registry(primary, backup):
+    return ProviderRegistry({
+        "cerebras": ProviderSpec("cerebras", "test-key",
+                                 f"http://127.0.0.1:{primary.server_port}/v1", "primary-model"),
+        "openai": ProviderSpec("openai", "test-key",
+                               f"http://127.0.0.1:{backup.server_port}/v1", "backup-model"),
+    })
+
+def test_registry_reuses_clients(servers):
+    """Test un cliente por clave y pool HTTP compartido por proveedor"""
+    registry = _registry(*servers)
+
+    llm = registry.get("cerebras")
+    assert registry.get("cerebras") is llm
+
+    variant = registry.get("cerebras", temperature=0.7)
+    assert variant is not llm
+    assert variant.http_async_client is llm.http_async_client
+
+@pytest.mark.asyncio
+async def test_failover_to_backup_provider(servers):
+    """Test conmutación al proveedor de respaldo cuando el principal falla"""
+    primary, backup = servers
+    registry = _registry(primary, backup)
+    llm = registry.get_failover()
+
+    result = await llm.ainvoke([HumanMessage(content="hola")])
+    streamed = "".join([chunk.content async for chunk in llm.astream([HumanMessage(content="hola")])])
+
+    assert result.content.strip() == "respuesta del respaldo"
+    assert streamed.strip() == "respuesta del respaldo"
+    stats = registry.get_stats()["providers"]
+    assert stats["cerebras"]["failures"] == 2
+    assert stats["openai"]["failures"] == 0
+    assert stats["openai"]["latency_ewma_ms"] is not None
+    await registry.aclose()
+
+@pytest.mark.asyncio
+async def test_warmup_opens_connections(servers):
+    """Test el precalentamiento contacta con cada proveedor"""
+    primary, backup = servers
+    registry = _registry(primary, backup)
+
+    await registry.warmup()
+
+    assert ("GET", "/v1/models") in primary.requests
+    assert ("GET", "/v1/models") in backup.requests
+    await registry.aclose()
+
+@pytest.mark.asyncio
+async def test_profile_parameters_and_latency(servers):
+    """Test un perfil aplica su modelo, límites y stop, y registra su latencia"""
+    primary, backup = servers
+    primary.fail = False
+    primary.reply = "greeting"
+    registry = _registry(primary, backup)
+    classifier = registry.get_profile("classifier")
+
+    result = await classifier.ainvoke([HumanMessage(content="hola")])
+
+    request = primary.bodies[-1]
+    assert result.content.strip() == "greeting"
+    assert request["model"] == "llama3.1-8b"
+    assert request["max_tokens"] == 8
+    assert request["stop"] == ["\n"]
+    assert registry.get_profile("classifier") is classifier
+    assert registry.get_stats()["profiles"]["classifier"]["total"]["count"] == 1
+    await registry.aclose()
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_calls_are_coalesced(servers):
+    """Test peticiones idénticas simultáneas generan una sola llamada upstream"""
+    primary, backup = servers
+    primary.fail = False
+    primary.reply = "respuesta compartida"
+    registry = _registry(primary, backup)
+    llm = registry.get_failover()
+
+    results = await asyncio.gather(*[llm.ainvoke([HumanMessage(content="hola")]) for _ in range(4)])
+    streams = await asyncio.gather(*[
+        _collect(llm.astream([HumanMessage(content="adiós")])) for _ in range(3)
+    ])
+
+    assert all(result.content.strip() == "respuesta compartida" for result in results)
+    assert all(streamed.strip() == "respuesta compartida" for streamed in streams)
+    assert len(primary.bodies) == 2
+    stats = registry.get_stats()["single_flight"]
+    assert stats["invoke"]["coalesced"] == 3
+    assert stats["stream"]["coalesced"] == 2
+    await registry.aclose()
+
+async def _collect(stream):
+    return "".join([chunk.content async for chunk in stream])
+
+@pytest.mark.asyncio
+async def test_token_usage_attributed_to_client_and_session(servers):
+    """Test el uso real de tokens se anota por cliente y sesión, con la cuota upstream"""
+    primary, backup = servers
+    primary.fail = False
+    primary.reply = "hola"
+    registry = _registry(primary, backup)
+    llm = registry.get_failover()
+
+    with usage_context(client_id="10.0.0.7", session_id="session_usage_test"):
+        await llm.ainvoke([HumanMessage(content="¿cuántos tokens?")])
+
+    assert token_usage_tracker.get_session("session_usage_test")["total_tokens"] == 15
+    client = token_usage_tracker.get_client("10.0.0.7")
+    assert client["prompt_tokens"] == 12
+    assert client["completion_tokens"] == 3
+    assert token_usage_tracker.upstream["cerebras"]["remaining-tokens-minute"] == "59000"
+    await registry.aclose()
+
+@pytest.mark.asyncio
+async def test_stream_reports_used_tokens_to_governor(servers, monkeypatch):
+    """Test en streaming el consumo real del último chunk corrige el presupuesto del governor"""
+    primary, backup = servers
+    primary.fail = False
+    primary.reply = "hola"
+    registry = _registry(primary, backup)
+    llm = registry.get_failover()
+    governor = registry.governor_for("cerebras")
+    released = []
+    release = governor.release
+
+    def record_release(permit):
+        released.append(permit.used_tokens)
+        release(permit)
+
+    monkeypatch.setattr(governor, "release", record_release)
+
+    await _collect(llm.astream([HumanMessage(content="¿cuántos tokens en streaming?")]))
+
+    assert released == [15]
+    await registry.aclose()
@@ -0,0 +1,26 @@
+import numpy as np
+from src.services.reranking import mmr_select
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def test_mmr_skips_near_duplicates():
+    """Test MMR prefiere un candidato distinto a un casi-duplicado"""
+    vectors = _normalize([[1.0, 0.0], [0.99, 0.01], [0.6, 0.8]])
+    relevance = np.array([0.95, 0.94, 0.80])
+
+    assert mmr_select(relevance, vectors, k=2, lambda_mult=0.5) == [0, 2]
+    # Sin penalización por redundancia equivale al top-k por relevancia
+    assert mmr_select(relevance, vectors, k=2, lambda_mult=1.0) == [0, 1]
+
+def test_mmr_per_source_cap():
+    """Test límite de chunks por fuente"""
+    vectors = _normalize([[1.0, 0.0], [0.0, 1.0], [0.7, 0.7], [0.6, 0.8]])
+    relevance = np.array([0.9, 0.85, 0.8, 0.5])
+    groups = ["faq.md", "faq.md", "faq.md", "envios.md"]
+
+    selected = mmr_select(relevance, vectors, k=3, lambda_mult=1.0,
+                          groups=groups, max_per_group=2)
+
+    assert selected == [0, 1, 3]
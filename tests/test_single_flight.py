@@ -0,0 +1,86 @@
+import asyncio
+import pytest
+from src.llms.singleflight import SingleFlight
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_upstream():
+    """Test llamadas idénticas concurrentes comparten una sola petición"""
+    flight = SingleFlight()
+    calls = 0
+
+    async def upstream():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"answer": "ok"}
+
+    results = await asyncio.gather(*[flight.run("same", upstream) for _ in range(5)])
+    other = await flight.run("other", upstream)
+
+    assert calls == 2
+    assert all(result == {"answer": "ok"} for result in results)
+    assert results[0] is not results[1]
+    assert other == {"answer": "ok"}
+    stats = flight.get_stats()
+    assert stats["invoke"] == {"upstream": 2, "coalesced": 4}
+    assert stats["in_flight"] == 0
+
+@pytest.mark.asyncio
+async def test_stream_fan_out_replays_to_late_joiners():
+    """Test el stream se reparte a todos, incluidos los que llegan a mitad"""
+    flight = SingleFlight()
+    calls = 0
+    started = asyncio.Event()
+
+    async def upstream():
+        nonlocal calls
+        calls += 1
+        for token in ["a", "b", "c"]:
+            yield token
+            started.set()
+            await asyncio.sleep(0.01)
+
+    async def consume():
+        return [token async for token in flight.stream("same", upstream)]
+
+    first = asyncio.create_task(consume())
+    await started.wait()
+    second = asyncio.create_task(consume())
+
+    assert await first == ["a", "b", "c"]
+    assert await second == ["a", "b", "c"]
+    assert calls == 1
+    assert flight.get_stats()["stream"] == {"upstream": 1, "coalesced": 1}
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_cancel_shared_call():
+    """Test cancelar a un solicitante no corta la petición de los demás"""
+    flight = SingleFlight()
+
+    async def upstream():
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    leader = asyncio.create_task(flight.run("same", upstream))
+    follower = asyncio.create_task(flight.run("same", upstream))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await follower == "ok"
+    assert leader.cancelled()
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_waiter():
+    """Test un fallo upstream se propaga a todos los que esperaban"""
+    flight = SingleFlight()
+
+    async def upstream():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    results = await asyncio.gather(
+        *[flight.run("same", upstream) for _ in range(3)], return_exceptions=True
+    )
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert flight.get_stats()["invoke"]["upstream"] == 1
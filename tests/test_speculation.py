@@ -0,0 +1,70 @@
+import asyncio
+import pytest
+from langchain_core.messages import HumanMessage
+import src.agents.nodes as nodes
+from src.agents.speculation import SpeculativeRetrieval
+from src.core.config import settings
+
+@pytest.fixture
+def speculative(monkeypatch):
+    """Turno con clasificación por LLM (simulada) y recuperación especulativa activa"""
+    retrievals = {"started": 0, "cancelled": 0}
+
+    async def fake_retrieve(query):
+        retrievals["started"] += 1
+        try:
+            await asyncio.sleep(0.05)
+        except asyncio.CancelledError:
+            retrievals["cancelled"] += 1
+            raise
+        return "Sin contexto", []
+
+    registry = SpeculativeRetrieval()
+    monkeypatch.setattr(nodes, "speculative_retrieval", registry)
+    monkeypatch.setattr(nodes, "retrieve_faq_context", fake_retrieve)
+    monkeypatch.setattr(settings, "SPECULATIVE_RETRIEVAL_ENABLED", True)
+    monkeypatch.setattr(settings, "INTENT_FAST_PATH_ENABLED", False)
+    monkeypatch.setattr(settings, "INTENT_CACHE_ENABLED", False)
+    monkeypatch.setattr(settings, "INTENT_CLASSIFIER_MODE", "llm")
+    return registry, retrievals
+
+def _state(message):
+    return {"messages": [HumanMessage(content=message)], "session_id": "s1"}
+
+@pytest.mark.asyncio
+async def test_support_query_uses_speculative_task(speculative, monkeypatch):
+    """Test support_query recoge la búsqueda lanzada durante la clasificación"""
+    registry, retrievals = speculative
+
+    async def fake_llm(history, message):
+        return "support_query"
+
+    monkeypatch.setattr(nodes, "_classify_with_llm", fake_llm)
+    state = _state("¿Cómo cambio mi contraseña?")
+
+    assert await nodes.classify_intent_node(state) == {"current_intent": "support_query"}
+    result = await nodes.support_query_node(state)
+
+    assert "No encontré información" in result["messages"][0].content
+    assert retrievals == {"started": 1, "cancelled": 0}
+    assert registry.get_stats() == {"started": 1, "used": 1, "wasted": 0, "pending": 0}
+
+@pytest.mark.asyncio
+async def test_other_intent_cancels_speculative_task(speculative, monkeypatch):
+    """Test otra intención cancela la búsqueda y la cuenta como desperdiciada"""
+    registry, retrievals = speculative
+
+    async def fake_llm(history, message):
+        # Deja arrancar la tarea especulativa antes de decidir
+        await asyncio.sleep(0)
+        return "out_of_scope"
+
+    monkeypatch.setattr(nodes, "_classify_with_llm", fake_llm)
+
+    assert await nodes.classify_intent_node(_state("Cuéntame un chiste")) == {
+        "current_intent": "out_of_scope"
+    }
+    await asyncio.sleep(0)
+
+    assert retrievals == {"started": 1, "cancelled": 1}
+    assert registry.get_stats() == {"started": 1, "used": 0, "wasted": 1, "pending": 0}
@@ -0,0 +1,46 @@
+import pytest
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+from src.agents.support_graph import create_support_graph
+
+async def _run_turn(graph, checkpointer, config, message):
+    """Ejecuta un turno y devuelve (nodos ejecutados, checkpoints escritos)"""
+    before = len([c async for c in checkpointer.alist(config)])
+    executed = []
+    async for update in graph.astream(
+        {
+            "messages": [HumanMessage(content=message)],
+            "session_id": config["configurable"]["thread_id"]
+        },
+        config,
+        stream_mode="updates"
+    ):
+        executed.extend(node for node in update if not node.startswith("__"))
+    after = len([c async for c in checkpointer.alist(config)])
+    return executed, after - before
+
+@pytest.mark.asyncio
+async def test_single_pass_per_turn():
+    """Test cada turno recorre una sola pasada: entrada -> respuesta -> END"""
+    checkpointer = MemorySaver()
+    graph = create_support_graph(checkpointer=checkpointer)
+    config = {"configurable": {"thread_id": "test_single_pass"}}
+    
+    turns = [
+        ("Hola", ["classify_intent", "greeting"]),
+        ("[FAQ]", ["classify_intent", "faq_redirect"]),
+        ("[Agente]", ["classify_intent", "request_email"]),
+        # Con awaiting_email se valida sin pasar por el clasificador
+        ("usuario@example.com", ["validate_email"]),
+    ]
+    
+    for message, expected_nodes in turns:
+        executed, checkpoints = await _run_turn(graph, checkpointer, config, message)
+        
+        assert executed == expected_nodes
+        # Checkpoint de entrada + __start__ + uno por nodo ejecutado
+        assert checkpoints == len(expected_nodes) + 2
+    
+    state = await graph.aget_state(config)
+    assert state.values["conversation_ended"] is True
+    assert len(state.values["messages"]) == 2 * len(turns)
@@ -0,0 +1,83 @@
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+from src.services.token_usage import (
+    INTERNAL_CLIENT, TokenUsageCallbackHandler, TokenUsageTracker, usage_context
+)
+
+def _result(input_tokens, output_tokens):
+    message = AIMessage(content="ok", usage_metadata={
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "total_tokens": input_tokens + output_tokens,
+    })
+    return LLMResult(generations=[[ChatGeneration(message=message)]])
+
+def test_usage_attributed_to_context():
+    """Test el consumo se anota en el cliente y la sesión del contexto"""
+    tracker = TokenUsageTracker(daily_budget=0, max_sessions=10)
+    handler = TokenUsageCallbackHandler(tracker)
+
+    with usage_context(client_id="1.2.3.4"):
+        with usage_context(session_id="s1"):
+            handler.on_llm_end(_result(100, 20))
+        handler.on_llm_end(_result(50, 5))
+    handler.on_llm_end(_result(10, 1))
+
+    client = tracker.get_client("1.2.3.4")
+    assert client["prompt_tokens"] == 150
+    assert client["completion_tokens"] == 25
+    assert client["calls"] == 2
+    assert client["remaining"] is None
+    assert tracker.get_session("s1")["total_tokens"] == 120
+    assert tracker.used_today(INTERNAL_CLIENT) == 11
+
+def test_daily_budget():
+    """Test al agotar el presupuesto diario el cliente queda fuera"""
+    tracker = TokenUsageTracker(daily_budget=200, max_sessions=10)
+    handler = TokenUsageCallbackHandler(tracker)
+
+    with usage_context(client_id="1.2.3.4"):
+        handler.on_llm_end(_result(150, 20))
+        assert tracker.within_budget("1.2.3.4")
+        handler.on_llm_end(_result(30, 10))
+
+    assert tracker.remaining("1.2.3.4") == 0
+    assert not tracker.within_budget("1.2.3.4")
+    assert tracker.within_budget("5.6.7.8")
+
+def test_day_rollover_resets_clients():
+    """Test el consumo por cliente se reinicia al cambiar el día UTC"""
+    tracker = TokenUsageTracker(daily_budget=100, max_sessions=10)
+    with usage_context(client_id="1.2.3.4"):
+        TokenUsageCallbackHandler(tracker).on_llm_end(_result(100, 0))
+    tracker.day = "2000-01-01"
+
+    assert tracker.remaining("1.2.3.4") == 100
+
+def test_sessions_are_bounded_and_unreported_counted():
+    """Test solo se guardan las sesiones más recientes; sin usage se cuenta aparte"""
+    tracker = TokenUsageTracker(daily_budget=0, max_sessions=2)
+    handler = TokenUsageCallbackHandler(tracker)
+    for session_id in ["a", "b", "c"]:
+        with usage_context(session_id=session_id):
+            handler.on_llm_end(_result(1, 1))
+    handler.on_llm_end(LLMResult(generations=[[ChatGeneration(message=AIMessage(content="x"))]]))
+
+    assert tracker.get_session("a") is None
+    assert tracker.get_session("c")["calls"] == 1
+    assert tracker.get_stats()["unreported_calls"] == 1
+
+def test_upstream_rate_limit_headers():
+    """Test se guardan las cabeceras x-ratelimit-* del proveedor"""
+    tracker = TokenUsageTracker(daily_budget=0, max_sessions=10)
+
+    tracker.record_rate_limits("cerebras", {
+        "x-ratelimit-remaining-requests-day": "14000",
+        "x-ratelimit-remaining-tokens-minute": "59000",
+        "content-type": "text/event-stream",
+    })
+    tracker.record_rate_limits("openai", {"content-type": "application/json"})
+
+    assert tracker.upstream["cerebras"]["remaining-requests-day"] == "14000"
+    assert "content-type" not in tracker.upstream["cerebras"]
+    assert "openai" not in tracker.upstream
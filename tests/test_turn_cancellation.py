@@ -0,0 +1,101 @@
+import asyncio
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+import src.agents.nodes as nodes
+import src.agents.support_graph as graph_module
+import src.api.routers as routers
+from src.agents.speculation import SpeculativeRetrieval
+from src.api.routers import router
+from src.core.config import settings
+from src.services.database import get_db
+
+class _FakeSession:
+    def add(self, row):
+        pass
+
+    async def commit(self):
+        pass
+
+async def _fake_db():
+    yield _FakeSession()
+
+@pytest.fixture
+def client(monkeypatch):
+    """API con el grafo real; la búsqueda de support_query no termina a tiempo"""
+    async def slow_retrieve(query):
+        await asyncio.sleep(5)
+
+    monkeypatch.setattr(nodes, "get_profile_llm", lambda profile: GenericFakeChatModel(
+        messages=iter([AIMessage(content="support_query")])
+    ))
+    monkeypatch.setattr(nodes, "retrieve_faq_context", slow_retrieve)
+    monkeypatch.setattr(settings, "INTENT_CACHE_ENABLED", False)
+    monkeypatch.setattr(settings, "INTENT_CLASSIFIER_MODE", "llm")
+    monkeypatch.setattr(settings, "SPECULATIVE_RETRIEVAL_ENABLED", False)
+    monkeypatch.setattr(settings, "CHAT_TURN_TIMEOUT_SECONDS", 0.3)
+    monkeypatch.setattr(graph_module, "support_agent_graph",
+                        graph_module.create_support_graph(checkpointer=MemorySaver()))
+
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_db] = _fake_db
+    return AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+
+def _config(session_id):
+    return {"configurable": {"thread_id": session_id}}
+
+@pytest.mark.asyncio
+async def test_cancelled_turn_restores_previous_state(client):
+    """Test tras cancelar un turno el hilo vuelve al último estado completo, sin mensaje huérfano"""
+    async with client:
+        greeting = await client.post("/api/v1/chat", json={"message": "Hola", "session_id": "s1"})
+        cancelled = await client.post("/api/v1/chat", json={
+            "message": "¿Cómo cambio mi contraseña?", "session_id": "s1"
+        })
+
+    assert greeting.status_code == 200
+    assert cancelled.status_code == 504
+    state = await graph_module.support_agent_graph.aget_state(_config("s1"))
+    assert state.next == ()
+    assert [type(message) for message in state.values["messages"]] == [HumanMessage, AIMessage]
+    assert state.values["messages"][0].content == "Hola"
+    assert state.values["current_intent"] == "greeting"
+
+@pytest.mark.asyncio
+async def test_cancelled_first_turn_leaves_empty_thread(client):
+    """Test cancelar el primer turno no deja el mensaje del usuario en el hilo"""
+    async with client:
+        response = await client.post("/api/v1/chat", json={
+            "message": "¿Cómo cambio mi contraseña?", "session_id": "s2"
+        })
+
+    assert response.status_code == 504
+    state = await graph_module.support_agent_graph.aget_state(_config("s2"))
+    assert not state.values.get("messages")
+    assert state.values.get("current_intent") is None
+
+@pytest.mark.asyncio
+async def test_cancelled_turn_discards_speculative_retrieval(client, monkeypatch):
+    """Test un turno cancelado entre classify y support_query no deja la búsqueda especulativa viva"""
+    async def stalled_support_query(state):
+        await asyncio.sleep(5)
+
+    registry = SpeculativeRetrieval()
+    monkeypatch.setattr(nodes, "speculative_retrieval", registry)
+    monkeypatch.setattr(routers, "speculative_retrieval", registry)
+    monkeypatch.setattr(nodes, "support_query_node", stalled_support_query)
+    monkeypatch.setattr(settings, "SPECULATIVE_RETRIEVAL_ENABLED", True)
+    monkeypatch.setattr(graph_module, "support_agent_graph",
+                        graph_module.create_support_graph(checkpointer=MemorySaver()))
+
+    async with client:
+        response = await client.post("/api/v1/chat", json={
+            "message": "¿Cómo cambio mi contraseña?", "session_id": "s3"
+        })
+
+    assert response.status_code == 504
+    assert registry.get_stats() == {"started": 1, "used": 0, "wasted": 1, "pending": 0}
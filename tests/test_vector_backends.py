@@ -0,0 +1,144 @@
+import asyncio
+import time
+import numpy as np
+import pytest
+from src.services.vector_backends import LocalIndex, LocalIndexBackend
+from tests.helpers import unit
+
+@pytest.mark.asyncio
+async def test_local_index_top_k(tmp_path):
+    """Test top-k exacto del índice local, sin red"""
+    backend = LocalIndexBackend(str(tmp_path))
+    await backend.upsert(
+        "faq",
+        ["a", "b", "c"],
+        [unit([1, 0, 0]), unit([0, 1, 0]), unit([1, 1, 0])],
+        ["reset password", "billing", "password billing"],
+        [{"source": "a.md"}, {"source": "b.md"}, {"source": "c.md"}]
+    )
+    
+    hits = await backend.query("faq", unit([1, 0.1, 0]), k=2)
+    
+    assert [hit.id for hit in hits] == ["a", "c"]
+    assert hits[0].score > hits[1].score
+    assert hits[0].metadata["source"] == "a.md"
+
+@pytest.mark.asyncio
+async def test_local_index_persists_and_deletes(tmp_path):
+    """Test recarga desde disco, upsert y borrado"""
+    backend = LocalIndexBackend(str(tmp_path))
+    await backend.upsert("faq", ["a", "b"], [unit([1, 0]), unit([0, 1])],
+                         ["uno", "dos"], [{}, {}])
+    await backend.upsert("faq", ["a"], [unit([0, 1])], ["uno v2"], [{}])
+    await backend.delete("faq", ["b"])
+    
+    reloaded = LocalIndexBackend(str(tmp_path))
+    hits = await reloaded.query("faq", unit([0, 1]), k=5, include_embeddings=True)
+    
+    assert [hit.id for hit in hits] == ["a"]
+    assert hits[0].text == "uno v2"
+    assert hits[0].embedding.shape == (2,)
+
+@pytest.mark.parametrize("quantization,rescore", [("float16", True), ("int8", True), ("int8", False)])
+def test_quantized_index_matches_exact(tmp_path, quantization, rescore):
+    """Test índice cuantizado: mismo top-k que float32 y recarga desde disco"""
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((200, 16)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [str(i) for i in range(200)]
+    query = unit(vectors[7] + 0.05 * rng.standard_normal(16))
+    
+    exact = LocalIndex(str(tmp_path / "exact"))
+    exact.upsert(ids, vectors, ids, [{}] * 200)
+    index = LocalIndex(str(tmp_path / "q"), quantization=quantization, rescore=rescore)
+    index.upsert(ids, vectors, ids, [{}] * 200)
+    index.delete(["199"])
+    
+    reloaded = LocalIndex(str(tmp_path / "q"), quantization=quantization, rescore=rescore)
+    positions, scores = reloaded.search(query, 5)
+    expected, _ = exact.search(query, 5)
+    
+    assert positions[0] == expected[0] == 7
+    assert len(reloaded.ids) == 199
+    assert reloaded.codes is not None
+    assert (reloaded.matrix is not None) == rescore
+    assert np.allclose(reloaded.vectors([7])[0], vectors[7], atol=0.02)
+
+def test_upsert_does_not_modify_caller_embeddings(tmp_path):
+    """Test upsert normaliza una copia, no el array recibido"""
+    embeddings = np.array([[3.0, 4.0]], dtype=np.float32)
+    
+    LocalIndex(str(tmp_path)).upsert(["a"], embeddings, ["uno"], [{}])
+    
+    assert embeddings.tolist() == [[3.0, 4.0]]
+
+@pytest.mark.asyncio
+async def test_query_during_writes_sees_consistent_snapshot(tmp_path):
+    """Test las búsquedas concurrentes con escrituras ven ids, textos y vectores coherentes"""
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((300, 8)).astype(np.float32)
+    ids = [str(i) for i in range(300)]
+    backend = LocalIndexBackend(str(tmp_path))
+    await backend.upsert("faq", ids, vectors, [f"t{i}" for i in ids], [{"id": i} for i in ids])
+    
+    async def write():
+        for start in range(0, 300, 30):
+            await backend.delete("faq", ids[start:start + 15])
+            await backend.upsert("faq", ids[start:start + 15], vectors[start:start + 15],
+                                 [f"t{i}" for i in ids[start:start + 15]],
+                                 [{"id": i} for i in ids[start:start + 15]])
+    
+    writer = asyncio.ensure_future(write())
+    while not writer.done():
+        query = unit(rng.standard_normal(8))
+        for hit in await backend.query("faq", query, k=5, include_embeddings=True):
+            assert hit.text == f"t{hit.id}"
+            assert hit.metadata["id"] == hit.id
+            assert np.allclose(hit.embedding, unit(vectors[int(hit.id)]), atol=1e-5)
+        await asyncio.sleep(0)
+    await writer
+
+@pytest.mark.parametrize("reopen_as", ["int8", "float16"])
+def test_update_metadata_keeps_vectors(tmp_path, reopen_as):
+    """Test actualizar metadatos conserva vectores, también si cambió la cuantización"""
+    vectors = np.stack([unit([1, 0, 0]), unit([0, 1, 0])])
+    LocalIndex(str(tmp_path), quantization="int8").upsert(["a", "b"], vectors, ["uno", "dos"],
+                                                          [{"chunk_index": 0}, {"chunk_index": 1}])
+    
+    LocalIndex(str(tmp_path), quantization=reopen_as).update_metadata(["b"], [{"chunk_index": 5}])
+    
+    reloaded = LocalIndex(str(tmp_path), quantization=reopen_as)
+    assert reloaded.metadatas == [{"chunk_index": 0}, {"chunk_index": 5}]
+    assert np.allclose(reloaded.vectors(), vectors, atol=0.02)
+    positions, _ = reloaded.search(unit([0, 1, 0]), 1)
+    assert reloaded.ids[positions[0]] == "b"
+
+@pytest.mark.asyncio
+async def test_invalidate_during_save_keeps_consistent_index(tmp_path, monkeypatch):
+    """Test invalidar mientras un save() reemplaza ficheros no mezcla ids y vectores"""
+    backend = LocalIndexBackend(str(tmp_path))
+    await backend.upsert("faq", ["a", "b"], [unit([1, 0]), unit([0, 1])],
+                         ["ta", "tb"], [{}, {}])
+    write_array = LocalIndex._write_array
+
+    def slow_write_array(self, path, array):
+        write_array(self, path, array)
+        time.sleep(0.05)
+
+    monkeypatch.setattr(LocalIndex, "_write_array", slow_write_array)
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((10, 2)).astype(np.float32)
+    ids = [f"n{i}" for i in range(10)]
+    writer = asyncio.ensure_future(
+        backend.upsert("faq", ids, vectors, [f"t{i}" for i in ids], [{}] * 10)
+    )
+    
+    while not writer.done():
+        backend.invalidate("faq")
+        for hit in await backend.query("faq", unit([1, 1]), k=12):
+            assert hit.text == f"t{hit.id}"
+        await asyncio.sleep(0.005)
+    await writer
+    
+    backend.invalidate("faq")
+    assert len(await backend.query("faq", unit([1, 1]), k=20)) == 12
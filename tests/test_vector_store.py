@@ -0,0 +1,237 @@
+import asyncio
+import pytest
+import src.services.vector_store as vector_store
+from src.services.document_processing import number_chunks
+from src.services.ingest_manifest import IngestManifest
+from src.services.lexical_index import LexicalIndexService
+from src.services.vector_backends import ChromaBackend, LocalIndexBackend
+from src.services.vector_store import VectorStoreService
+from tests.helpers import StubQueryCache, unit
+
+class _FakeCollection:
+    def __init__(self):
+        self.upserts = []
+
+    async def upsert(self, ids, embeddings, documents, metadatas):
+        self.upserts.append(ids)
+
+    async def delete(self, ids):
+        pass
+
+class _FakeChromaClient:
+    def __init__(self):
+        self.opened = []
+
+    async def get_or_create_collection(self, name):
+        self.opened.append(name)
+        return _FakeCollection()
+
+def _stub_query_cache():
+    return StubQueryCache(lambda text: [1, 0.1, 0])
+
+@pytest.fixture
+def chroma(monkeypatch):
+    """ChromaBackend con un cliente simulado (sin servidor)"""
+    backend = ChromaBackend()
+    client = _FakeChromaClient()
+
+    async def get_client():
+        return client
+
+    monkeypatch.setattr(backend, "get_client", get_client)
+    return backend, client
+
+@pytest.fixture
+def lexical(tmp_path, monkeypatch):
+    service = LexicalIndexService(str(tmp_path / "lexical"))
+    monkeypatch.setattr(vector_store, "lexical_index_service", service)
+    return service
+
+@pytest.mark.asyncio
+async def test_collection_handle_is_cached(chroma):
+    """Test el handle de la colección se abre una sola vez"""
+    backend, client = chroma
+
+    first = await backend.get_collection("faq")
+    second = await backend.get_collection("faq")
+
+    assert first is second
+    assert client.opened == ["faq"]
+
+@pytest.mark.asyncio
+async def test_write_invalidates_collection_handle(chroma, lexical):
+    """Test escribir o borrar chunks descarta el handle y los retrievers cacheados"""
+    backend, client = chroma
+    service = VectorStoreService(backend=backend)
+    retriever = service.get_retriever("faq")
+    await backend.get_collection("faq")
+
+    await service.write_chunks("faq", ["a"], ["texto"], [{}], [[1.0, 0.0]])
+
+    assert service.get_retriever("faq") is not retriever
+    await backend.get_collection("faq")
+    assert client.opened == ["faq", "faq"]
+
+    await service.delete_chunks("faq", ["a"])
+    await backend.get_collection("faq")
+    assert client.opened == ["faq", "faq", "faq"]
+
+def test_sync_invoke(tmp_path, lexical, monkeypatch):
+    """Test invoke síncrono del retriever, sin event loop en el llamante"""
+    monkeypatch.setattr(vector_store, "query_embedding_cache", _stub_query_cache())
+    backend = LocalIndexBackend(str(tmp_path / "index"))
+    service = VectorStoreService(backend=backend)
+    asyncio.run(service.write_chunks(
+        "faq",
+        ["a", "b"],
+        ["reset password", "billing"],
+        [{"source": "a.md"}, {"source": "b.md"}],
+        [unit([1, 0, 0]).tolist(), unit([0, 1, 0]).tolist()],
+    ))
+
+    documents = service.get_retriever("faq", k=1).invoke("reset password")
+
+    assert [document.id for document in documents] == ["a"]
+    assert documents[0].metadata["source"] == "a.md"
+
+@pytest.mark.asyncio
+async def test_sync_invoke_from_running_loop(tmp_path, lexical, monkeypatch):
+    """Test invoke síncrono desde un hilo con event loop en marcha"""
+    monkeypatch.setattr(vector_store, "query_embedding_cache", _stub_query_cache())
+    service = VectorStoreService(backend=LocalIndexBackend(str(tmp_path / "index")))
+    await service.write_chunks(
+        "faq", ["a"], ["reset password"], [{}], [unit([1, 0, 0]).tolist()]
+    )
+
+    documents = service.get_retriever("faq", k=1).invoke("reset password")
+
+    assert [document.id for document in documents] == ["a"]
+
+@pytest.mark.asyncio
+async def test_single_source_collection_returns_k(tmp_path, lexical, monkeypatch):
+    """Test con una sola fuente el re-ranking por defecto devuelve k chunks"""
+    monkeypatch.setattr(vector_store, "query_embedding_cache", _stub_query_cache())
+    service = VectorStoreService(backend=LocalIndexBackend(str(tmp_path / "index")))
+    await service.write_chunks(
+        "faq",
+        ["a", "b", "c", "d"],
+        ["uno", "dos", "tres", "cuatro"],
+        [{"source": "faq.md"}] * 4,
+        [unit([1, i, 0]).tolist() for i in range(4)],
+    )
+
+    hits = await service.search_hits("contraseña", "faq", k=3)
+
+    assert len(hits) == 3
+
+class _ParagraphParser:
+    """Parser simulado: un chunk por párrafo"""
+
+    async def parse(self, file_path, chunk_size=1000, chunk_overlap=200, source=None):
+        with open(file_path, encoding="utf-8") as f:
+            paragraphs = [p for p in f.read().split("\n\n") if p.strip()]
+        return number_chunks([{"text": p, "metadata": {}} for p in paragraphs],
+                             source or file_path)
+
+class _CountingExecutor:
+    def __init__(self):
+        self.embedded = []
+
+    async def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [unit([len(text), 1, 0]).tolist() for text in texts]
+
+@pytest.mark.asyncio
+async def test_edit_updates_retained_chunk_positions(tmp_path, lexical, monkeypatch):
+    """Test al editar un archivo los chunks conservados reciben chunk_index y total_chunks nuevos"""
+    executor = _CountingExecutor()
+    monkeypatch.setattr(vector_store, "document_parser", _ParagraphParser())
+    monkeypatch.setattr(vector_store, "embedding_executor", executor)
+    monkeypatch.setattr(vector_store, "ingest_manifest", IngestManifest(str(tmp_path / "manifest")))
+    backend = LocalIndexBackend(str(tmp_path / "index"))
+    service = VectorStoreService(backend=backend)
+    doc = tmp_path / "faq.md"
+
+    doc.write_text("Uno.\n\nDos.\n\nTres.", encoding="utf-8")
+    await service.ingest_document(str(doc), "faq", source="faq.md")
+    doc.write_text("Cero.\n\nUno.\n\nDos.\n\nTres.\n\nCuatro.", encoding="utf-8")
+    result = await service.ingest_document(str(doc), "faq", source="faq.md")
+
+    assert result["chunks_added"] == 2
+    assert executor.embedded == ["Uno.", "Dos.", "Tres.", "Cero.", "Cuatro."]
+    snapshot = backend.get_index("faq").snapshot
+    positions = {
+        text: (metadata["chunk_index"], metadata["total_chunks"])
+        for text, metadata in zip(snapshot.texts, snapshot.metadatas)
+    }
+    assert positions == {"Cero.": (0, 5), "Uno.": (1, 5), "Dos.": (2, 5),
+                         "Tres.": (3, 5), "Cuatro.": (4, 5)}
+    # El índice léxico (candidatos híbridos) también ve los metadatos nuevos
+    uno = snapshot.ids[snapshot.texts.index("Uno.")]
+    assert lexical.get_document("faq", uno)[1]["chunk_index"] == 1
+
+class _RecordingBackend(LocalIndexBackend):
+    """Índice local que anota las llamadas de escritura e invalidación"""
+
+    def __init__(self, base_dir):
+        super().__init__(base_dir)
+        self.calls = []
+
+    async def upsert(self, collection_name, ids, embeddings, texts, metadatas):
+        self.calls.append(("upsert", sorted(ids)))
+        await super().upsert(collection_name, ids, embeddings, texts, metadatas)
+
+    async def delete(self, collection_name, ids):
+        self.calls.append(("delete", sorted(ids)))
+        await super().delete(collection_name, ids)
+
+    async def update_metadata(self, collection_name, ids, metadatas):
+        self.calls.append(("update_metadata", sorted(ids)))
+        await super().update_metadata(collection_name, ids, metadatas)
+
+    def invalidate(self, collection_name):
+        self.calls.append(("invalidate", collection_name))
+        super().invalidate(collection_name)
+
+@pytest.mark.asyncio
+async def test_bulk_writer_defers_writes_until_flush(tmp_path, lexical, monkeypatch):
+    """Test BulkWriter acumula varios lotes y archivos y los escribe de una vez"""
+    manifest = IngestManifest(str(tmp_path / "manifest"))
+    monkeypatch.setattr(vector_store, "ingest_manifest", manifest)
+    backend = _RecordingBackend(str(tmp_path / "index"))
+    service = VectorStoreService(backend=backend)
+    await service.write_chunks("faq", ["old"], ["viejo"], [{"chunk_index": 0}],
+                               [unit([0, 0, 1]).tolist()])
+    backend.calls.clear()
+    writer = service.bulk_writer("faq")
+
+    writer.add(["a"], ["uno"], [{"chunk_index": 0}], [unit([1, 0, 0]).tolist()])
+    writer.add(["b"], ["dos"], [{"chunk_index": 1}], [unit([0, 1, 0]).tolist()])
+    writer.update_metadata(["old"], ["viejo"], [{"chunk_index": 7}])
+    writer.set_manifest("a.md", "d1", ["a", "old"], [[0, 2, None], [7, 2, None]])
+    writer.delete(["b"])
+    writer.set_manifest("b.md", "d2", [], [])
+
+    assert backend.calls == []
+    assert writer.pending == 5
+    assert manifest.get("faq", "a.md") is None
+
+    await writer.flush()
+
+    assert backend.calls == [
+        ("delete", ["b"]),
+        ("upsert", ["a"]),
+        ("update_metadata", ["old"]),
+        ("invalidate", "faq"),
+    ]
+    assert writer.pending == 0
+    snapshot = backend.get_index("faq").snapshot
+    assert sorted(snapshot.ids) == ["a", "old"]
+    assert snapshot.metadatas[snapshot.ids.index("old")] == {"chunk_index": 7}
+    assert lexical.get_document("faq", "a")[0] == "uno"
+    assert lexical.get_document("faq", "old")[1] == {"chunk_index": 7}
+    assert manifest.get("faq", "a.md")["chunk_ids"] == ["a", "old"]
+    assert manifest.get("faq", "b.md")["chunk_ids"] == []
+
+    await writer.flush()
+    assert len(backend.calls) == 4